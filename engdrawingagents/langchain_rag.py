@@ -1,35 +1,167 @@
+import hashlib
+import json
 import os
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-import os
+import uuid
 
-from langchain_groq import ChatGroq
+import numpy as np
+from langchain_core.documents import Document
 
-def langchain_rag(code_question:str) -> str:
-    llm = ChatGroq(model="llama3-8b-8192",api_key=os.environ["GROQ_API_KEY"])
 
+_embeddings = None
+_llm = None
+_indexes = {}
 
 
-    loader = PyPDFLoader("../data/Examples_small.pdf")
-    documents = loader.load()
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    all_splits = text_splitter.split_documents(documents)
-    vectorstore = InMemoryVectorStore.from_documents(
-        documents=all_splits, embedding=embeddings
-    )
-    retriever = vectorstore.as_retriever()
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        _embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
+    return _embeddings
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        from langchain_groq import ChatGroq
+        _llm = ChatGroq(model="llama3-8b-8192", api_key=os.environ["GROQ_API_KEY"])
+    return _llm
+
+
+class MmapVectorIndex:
+    """
+    Chunk embeddings stored as a float32 .npy matrix and opened memory-mapped.
+
+    The index directory holds:
+        embeddings-<build>.npy  L2-normalized chunk embeddings, one row per chunk
+        chunks-<build>.txt      UTF-8 chunk texts concatenated back to back
+        metadata.json           source hash, the two file names above plus byte
+                                offset, length and page of each chunk
+
+    Every process that opens the index shares the same page-cache copy, so
+    loading is near-instant and costs no private memory. A rebuild writes new
+    files and switches metadata.json to them last, so a process that has the
+    previous build mapped keeps reading consistent (and still existing) data.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "metadata.json")) as f:
+            self.metadata = json.load(f)
+        files = self.metadata.get("files", {"embeddings": "embeddings.npy", "chunks": "chunks.txt"})
+        self.matrix = np.load(os.path.join(index_dir, files["embeddings"]), mmap_mode="r")
+        self._text = np.memmap(os.path.join(index_dir, files["chunks"]), dtype=np.uint8, mode="r")
+
+    @staticmethod
+    def build(pdf_path: str, index_dir: str, embeddings, source_hash: str = None):
+        """Split and embed the PDF and write the index files."""
+        from langchain_community.document_loaders import PyPDFLoader
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+        all_splits = text_splitter.split_documents(PyPDFLoader(pdf_path).load())
+        MmapVectorIndex.write(index_dir, all_splits, embeddings, pdf_path, source_hash)
+
+    @staticmethod
+    def write(index_dir: str, splits, embeddings, source: str = None, source_hash: str = None):
+        """
+        Embed the chunks and write them as a new build of the index.
+
+        Raises:
+            ValueError: If there are no chunks, e.g. a scanned PDF without a text layer.
+        """
+        splits = [split for split in splits if split.page_content]
+        if not splits:
+            raise ValueError(f"No text to index in {source or 'the given chunks'}")
+        vectors = np.asarray(embeddings.embed_documents([split.page_content for split in splits]),
+                             dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
 
+        os.makedirs(index_dir, exist_ok=True)
+        build = uuid.uuid4().hex[:12]
+        files = {"embeddings": f"embeddings-{build}.npy", "chunks": f"chunks-{build}.txt"}
+        chunks = []
+        offset = 0
+        with open(os.path.join(index_dir, files["chunks"]), "wb") as f:
+            for split in splits:
+                data = split.page_content.encode("utf-8")
+                f.write(data)
+                chunks.append({"offset": offset, "length": len(data), "page": split.metadata.get("page")})
+                offset += len(data)
+        with open(os.path.join(index_dir, files["embeddings"]), "wb") as f:
+            np.save(f, vectors)
+        # Metadata goes last, it switches readers to the new files
+        metadata = {"source": source, "source_hash": source_hash, "dim": int(vectors.shape[1]),
+                    "files": files, "chunks": chunks}
+        metadata_path = os.path.join(index_dir, "metadata.json")
+        previous = {}
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                previous = json.load(f).get("files", {"embeddings": "embeddings.npy", "chunks": "chunks.txt"})
+        with open(f"{metadata_path}.{build}.tmp", "w") as f:
+            json.dump(metadata, f)
+        os.replace(f"{metadata_path}.{build}.tmp", metadata_path)
+        # The previous build stays readable through existing mappings after the unlink
+        for name in previous.values():
+            try:
+                os.remove(os.path.join(index_dir, name))
+            except OSError:
+                pass
+
+    def text(self, i: int) -> str:
+        chunk = self.metadata["chunks"][i]
+        return bytes(self._text[chunk["offset"]:chunk["offset"] + chunk["length"]]).decode("utf-8")
+
+    def search(self, query_vector, k: int = 4):
+        """Return [(chunk index, score)] of the k best chunks by cosine similarity."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def similarity_search(self, query: str, embeddings, k: int = 4):
+        return [
+            Document(page_content=self.text(i), metadata={"page": self.metadata["chunks"][i]["page"], "score": score})
+            for i, score in self.search(embeddings.embed_query(query), k)
+        ]
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_index(pdf_path="../data/Examples_small.pdf", index_dir="./Examples_index") -> MmapVectorIndex:
+    """Open the index for the PDF, building it first if missing or stale."""
+    key = os.path.abspath(index_dir)
+    if key in _indexes:
+        return _indexes[key]
+    source_hash = _file_hash(pdf_path)
+    metadata_path = os.path.join(index_dir, "metadata.json")
+    stale = True
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            stale = json.load(f).get("source_hash") != source_hash
+    if stale:
+        MmapVectorIndex.build(pdf_path, index_dir, get_embeddings(), source_hash)
+    _indexes[key] = MmapVectorIndex(index_dir)
+    return _indexes[key]
+
+
+def langchain_rag(code_question: str,
+                  pdf_path="../data/Examples_small.pdf",
+                  index_dir="./Examples_index") -> str:
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.prompts import ChatPromptTemplate
+
+    index = load_index(pdf_path, index_dir)
+    docs = index.similarity_search(code_question, get_embeddings())
 
     system_prompt = (
         "You are an assistant for question-answering tasks. "
@@ -48,10 +180,10 @@ def langchain_rag(code_question:str) -> str:
         ]
     )
 
-    question_answer_chain = create_stuff_documents_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(retriever, question_answer_chain)
-    response = rag_chain.invoke({"input": code_question})
-    return response["answer"]
+    question_answer_chain = create_stuff_documents_chain(get_llm(), prompt)
+    return question_answer_chain.invoke({"input": code_question, "context": docs})
+
 
-question = input("Enter your question: ")
-print(langchain_rag(question))
\ No newline at end of file
+if __name__ == "__main__":
+    question = input("Enter your question: ")
+    print(langchain_rag(question))
@@ -1,89 +1,112 @@
-from autogen import AssistantAgent, UserProxyAgent
-from autogen.agentchat.contrib.retrieve_user_proxy_agent import RetrieveUserProxyAgent
-from ocp_vscode import *
-from autogen.agentchat.contrib.multimodal_conversable_agent import MultimodalConversableAgent
-
 import os
+import threading
+from types import SimpleNamespace
 from typing_extensions import Annotated
-from langchain_rag import langchain_rag
-from llm import LLMConfigSelector
-
-#Definig default config list for llms. Add more llms if you want. By default
-#Autogen will select the first one until it can use it.
-config_list_selection = LLMConfigSelector()
-llm_config = {
-    "seed": 25,
-    "temperature": 0.3,
-    "config_list": [config_list_selection.get_model_config()],
-    # "request_timeout": 600,
-    # "retry_wait_time": 120,
-}
+
 
 #This is for terminating the chat. This can be passed as one line functin as well.
 def termination_msg(x):
     return isinstance(x, dict) and "TERMINATE" == str(x.get("content", ""))[-9:].upper()
 
-#Defining agents for designing
-#First we define designer userproxy agent which takes input from human
-
-User = UserProxyAgent(
-    name="User",
-    is_termination_msg=termination_msg,
-    human_input_mode="ALWAYS", # Use ALWAYS for human in the loop
-    max_consecutive_auto_reply=5, #Change it to limit the number of replies from this agent
-    #here we define the coding configuration for executing the code generated by agent 
-    # code_execution_config= {
-    #     "work_dir": "NewCADs",
-    #     "use_docker": False,
-    # },
-    code_execution_config= False,
-    # llm_config={"config_list": config_list}, #you can also select a particular model from the config list here for llm
-    system_message=""" A human designer who asks questions to create CAD models using CadQuery. Interact with Designer Expert
+
+def default_llm_config():
+    """Ask for the model to use (see llm.LLMConfigSelector) and build the llm config."""
+    from llm import LLMConfigSelector
+
+    #Definig default config list for llms. Add more llms if you want. By default
+    #Autogen will select the first one until it can use it.
+    config_list_selection = LLMConfigSelector()
+    return {
+        "seed": 25,
+        "temperature": 0.3,
+        "config_list": [config_list_selection.get_model_config()],
+        # "request_timeout": 600,
+        # "retry_wait_time": 120,
+    }
+
+
+def build_agents(llm_config=None):
+    """
+    Create the agent team.
+
+    Nothing heavy is imported and no model is selected until this is called,
+    so importing this module is cheap.
+
+    Args:
+        llm_config (dict): Config for the LLM agents, asked for interactively if None.
+
+    Returns:
+        SimpleNamespace: The agents by name, llm_config and reset().
+    """
+    from autogen import AssistantAgent, UserProxyAgent
+    from autogen.agentchat.contrib.retrieve_user_proxy_agent import RetrieveUserProxyAgent
+    from autogen.agentchat.contrib.multimodal_conversable_agent import MultimodalConversableAgent
+    from execution_server import CadQueryCodeExecutor
+
+    if llm_config is None:
+        llm_config = default_llm_config()
+
+    #Defining agents for designing
+    #First we define designer userproxy agent which takes input from human
+
+    User = UserProxyAgent(
+        name="User",
+        is_termination_msg=termination_msg,
+        human_input_mode="ALWAYS", # Use ALWAYS for human in the loop
+        max_consecutive_auto_reply=5, #Change it to limit the number of replies from this agent
+        #here we define the coding configuration for executing the code generated by agent 
+        # code_execution_config= {
+        #     "work_dir": "NewCADs",
+        #     "use_docker": False,
+        # },
+        code_execution_config= False,
+        # llm_config={"config_list": config_list}, #you can also select a particular model from the config list here for llm
+        system_message=""" A human designer who asks questions to create CAD models using CadQuery. Interact with Designer Expert
     on how to create the cad model. The Designer Expert's approach to create models needs to be
     approved by this Designer. """,
-    # description= "The designer who asks questions to create CAD models using CadQuery",
-    # default_auto_reply="Reply `TERMINATE` if the task is done.",
-)
-
-proxy_user = UserProxyAgent(
-    name="Proxy_User",
-    is_termination_msg=termination_msg,
-    human_input_mode="NEVER", # Use ALWAYS for human in the loop
-    max_consecutive_auto_reply=5, #Change it to limit the number of replies from this agent
-    #here we define the coding configuration for executing the code generated by agent 
-    # code_execution_config= {
-    #     "work_dir": "NewCADs",
-    #     "use_docker": False,
-    # },
-    code_execution_config= False,
-    # llm_config={"config_list": config_list}, #you can also select a particular model from the config list here for llm
-    # system_message=""" A human designer who asks questions to create CAD models using CadQuery. Interact with Designer Expert
-    # on how to create the cad model. The Designer Expert's approach to create models needs to be
-    # approved by this Designer. """,
-    # description= "The designer who asks questions to create CAD models using CadQuery",
-    # default_auto_reply="Reply `TERMINATE` if the task is done.",
-)
-
-functioncall_agent = AssistantAgent(
-    name = "Function_Call_Agent",
-    is_termination_msg=termination_msg,
-    human_input_mode="NEVER",
-    llm_config= llm_config,
-    system_message="You are cad function or tool calling agent. You are provided with functions"
-    "to create CAD models. Given the design problem for which a function is registered, call the function."
-    "If the parameters for the function are not specified by the user, give parameteres yourself."
-    "If you do not have the function registered with to create certain CAD model, pass the problem to Designer Expert explicitly."
-    "If the function is called successfully then TERMINATE the chat.",
-    description="The Function Call Agent that calls registered function to create cad models."
-
-)   
-
-designer_expert = AssistantAgent(
-    name="Designer_Expert",
-    is_termination_msg=termination_msg,
-    human_input_mode="NEVER", # Use ALWAYS for human in the loop
-    llm_config=llm_config, #you can also select a particular model from the config list here for llm
-    system_message="""You are a CAD Design Expert who provides concise plan and directions to support CAD modeling in CadQuery. 
+        # description= "The designer who asks questions to create CAD models using CadQuery",
+        # default_auto_reply="Reply `TERMINATE` if the task is done.",
+    )
+
+    proxy_user = UserProxyAgent(
+        name="Proxy_User",
+        is_termination_msg=termination_msg,
+        human_input_mode="NEVER", # Use ALWAYS for human in the loop
+        max_consecutive_auto_reply=5, #Change it to limit the number of replies from this agent
+        #here we define the coding configuration for executing the code generated by agent 
+        # code_execution_config= {
+        #     "work_dir": "NewCADs",
+        #     "use_docker": False,
+        # },
+        code_execution_config= False,
+        # llm_config={"config_list": config_list}, #you can also select a particular model from the config list here for llm
+        # system_message=""" A human designer who asks questions to create CAD models using CadQuery. Interact with Designer Expert
+        # on how to create the cad model. The Designer Expert's approach to create models needs to be
+        # approved by this Designer. """,
+        # description= "The designer who asks questions to create CAD models using CadQuery",
+        # default_auto_reply="Reply `TERMINATE` if the task is done.",
+    )
+
+    functioncall_agent = AssistantAgent(
+        name = "Function_Call_Agent",
+        is_termination_msg=termination_msg,
+        human_input_mode="NEVER",
+        llm_config= llm_config,
+        system_message="You are cad function or tool calling agent. You are provided with functions"
+        "to create CAD models. Given the design problem for which a function is registered, call the function."
+        "If the parameters for the function are not specified by the user, give parameteres yourself."
+        "If you do not have the function registered with to create certain CAD model, pass the problem to Designer Expert explicitly."
+        "If the function is called successfully then TERMINATE the chat.",
+        description="The Function Call Agent that calls registered function to create cad models."
+
+    )   
+
+    designer_expert = AssistantAgent(
+        name="Designer_Expert",
+        is_termination_msg=termination_msg,
+        human_input_mode="NEVER", # Use ALWAYS for human in the loop
+        llm_config=llm_config, #you can also select a particular model from the config list here for llm
+        system_message="""You are a CAD Design Expert who provides concise plan and directions to support CAD modeling in CadQuery. 
     You should also revise the approach based on feedback from designer. Explain in clear steps what
     needs to be done by CadQuery Code Writer. 
     For each design request:
@@ -96,52 +119,64 @@ designer_expert = AssistantAgent(
 
     Keep answers brief, direct, and strictly analytical to aid smooth CadQuery implementation.
     NEVER provide code.""",
-    description= "The designer expert who provides approach to answer questions to create CAD models in CadQuery",
-)
-
-#Here we define our RAG agent. 
-designer_aid  = RetrieveUserProxyAgent(
-    name="Designer_Assistant",
-    is_termination_msg=termination_msg,
-    human_input_mode="NEVER",
-    llm_config=llm_config,
-    default_auto_reply="Reply `TERMINATE` if the task is done.",
-    code_execution_config=False,
-    retrieve_config={
-        "task": "code",
-        "docs_path":[
-            "/home/niel77/MechanicalAgents/data/code_documentation.pdf",#change this to input any file you want for RAG
-            ],
-        "chunk_token_size" : 500,
-        "collection_name" : "groupchat",
-        "get_or_create": True,
-        "customized_prompt":'''You provide the relvant codes for creating the CAD models in CadQuery from the 
+        description= "The designer expert who provides approach to answer questions to create CAD models in CadQuery",
+    )
+
+    #Here we define our RAG agent. 
+    designer_aid  = RetrieveUserProxyAgent(
+        name="Designer_Assistant",
+        is_termination_msg=termination_msg,
+        human_input_mode="NEVER",
+        llm_config=llm_config,
+        default_auto_reply="Reply `TERMINATE` if the task is done.",
+        code_execution_config=False,
+        retrieve_config={
+            "task": "code",
+            "docs_path":[
+                "/home/niel77/MechanicalAgents/data/code_documentation.pdf",#change this to input any file you want for RAG
+                ],
+            "chunk_token_size" : 500,
+            "collection_name" : "groupchat",
+            "get_or_create": True,
+            "customized_prompt":'''You provide the relvant codes for creating the CAD models in CadQuery from the 
         documentation provided.''',
-    },
-)
-
-cad_coder_assistant = AssistantAgent(
-    name="CAD_coder_assistant",
-    system_message="Only use the function you have been provided with."
-    "First try to find the code for model to be created using the function provided."
-    "For example if a box has to be created search about creating the box with the function provided before moving to the next step."
-    "If nothing relevant code found for the model, search for the codes to perform tasks specified by Designer Expert, only use "
-    "the functions you have been provided with. Do not "
-    "reply with helpful tips. Once you've recommended functions and got the response pass the summarized result to the CAD coder agent ",
-    llm_config=llm_config,
-    description="The CAD coder assistant which uses function or tool call (calls call_rag function) to search the code for cad model generation"
-)
-
-@cad_coder_assistant.register_for_execution()
-@cad_coder_assistant.register_for_llm(description= "Code finder using Retrieval Augmented Generation")
-def call_rag(
-    question: Annotated[float, "Task for which code to be found"],
-) -> str:
-    return langchain_rag(question)
-
-cad_coder = AssistantAgent(
-    "CadQuery_Code_Writer",
-    system_message= """You follow the approved plan by Designer Expert.
+        },
+    )
+
+    cad_coder_assistant = AssistantAgent(
+        name="CAD_coder_assistant",
+        system_message="Only use the function you have been provided with."
+        "First try to find the code for model to be created using the function provided."
+        "For example if a box has to be created search about creating the box with the function provided before moving to the next step."
+        "If nothing relevant code found for the model, search for the codes to perform tasks specified by Designer Expert "
+        "in a single call_rag_batch call with one question per task, only use "
+        "the functions you have been provided with. Do not "
+        "reply with helpful tips. Once you've recommended functions and got the response pass the summarized result to the CAD coder agent ",
+        llm_config=llm_config,
+        description="The CAD coder assistant which uses function or tool call (calls call_rag function) to search the code for cad model generation"
+    )
+
+    @cad_coder_assistant.register_for_execution()
+    @cad_coder_assistant.register_for_llm(description= "Code finder using Retrieval Augmented Generation")
+    def call_rag(
+        question: Annotated[float, "Task for which code to be found"],
+    ) -> str:
+        from langchain_rag import stop_after_code_block, stream_rag
+        # Streams tokens to the console/UI sinks while generating, stops once the code is complete
+        return stream_rag(question, should_stop=stop_after_code_block)
+
+    @cad_coder_assistant.register_for_execution()
+    @cad_coder_assistant.register_for_llm(description= "Code finder using Retrieval Augmented Generation for several tasks at once")
+    def call_rag_batch(
+        questions: Annotated[list[str], "Tasks for which code to be found, one per design step"],
+    ) -> str:
+        from langchain_rag import rag_batch
+        answers = rag_batch(questions)
+        return "\n\n".join(f"### {question}\n{answer}" for question, answer in zip(questions, answers))
+
+    cad_coder = AssistantAgent(
+        "CadQuery_Code_Writer",
+        system_message= """You follow the approved plan by Designer Expert.
     You write python code to create CAD models using CadQuery.
     Wrap the code in a code block that specifies the script type. 
     The user can't modify your code. 
@@ -195,56 +230,88 @@ cad_coder = AssistantAgent(
         show(box) #always visualize the model
 ```
         Only use CadQuery’s predefined shapes and operations based on the analyst’s instructions.""",
-    llm_config=llm_config,
-    human_input_mode="NEVER",
-    description="CadQuery Code Writer who writes python code to create CAD models following the system message.",
-)
-
-
-executor = AssistantAgent(
-    name="Executor",
-    is_termination_msg=termination_msg,
-    system_message="You save and execute the code written by the CadQuery Code Writer and report and save the result and pass it to Reviewer.",
-    code_execution_config= {
-        "last_n_messages": 3,
-        "work_dir": "NewCADs",
-        "use_docker": False,
-        
-    },
-    description= "Executor who executes the code written by CadQuery Code Writer."
-)
-reviewer = AssistantAgent(
-    name="Reviewer",
-    is_termination_msg=termination_msg,
-    system_message=''' If code ran successfully, just pass message that it ran successfully to User for final feedback.
+        llm_config=llm_config,
+        human_input_mode="NEVER",
+        description="CadQuery Code Writer who writes python code to create CAD models following the system message.",
+    )
+
+
+    executor = AssistantAgent(
+        name="Executor",
+        is_termination_msg=termination_msg,
+        system_message="You save and execute the code written by the CadQuery Code Writer and report and save the result and pass it to Reviewer.",
+        # Runs the code in warm CadQuery workers instead of a new interpreter per script
+        code_execution_config= {
+            "last_n_messages": 3,
+            "executor": CadQueryCodeExecutor(work_dir="NewCADs"),
+        },
+        description= "Executor who executes the code written by CadQuery Code Writer."
+    )
+    reviewer = AssistantAgent(
+        name="Reviewer",
+        is_termination_msg=termination_msg,
+        system_message=''' If code ran successfully, just pass message that it ran successfully to User for final feedback.
     IF execution fails,then only you suggest changes to code written by CadQuery Code Writer
     making sure that CadQuery Code Writer is using methods and functions available within CadQuery library
     for recreating the cad model specified by User and using show method from ocp_vscode library to visualize the model.
     ''' ,
-    llm_config=llm_config,
-    description="Code Reviewer who can review python code written by CadQuery Code Writer after executed by Executor.",
-)
-
-cad_data_reviewer= MultimodalConversableAgent(
-    name= "CAD_Data_Reviewer",
-    # is_termination_msg=lambda x: x.get("content", "").rstrip().endswith("TERMINATE"),
-    human_input_mode="NEVER",
-    code_execution_config = False,
-    llm_config=llm_config,
-    system_message="""
+        llm_config=llm_config,
+        description="Code Reviewer who can review python code written by CadQuery Code Writer after executed by Executor.",
+    )
+
+    cad_data_reviewer= MultimodalConversableAgent(
+        name= "CAD_Data_Reviewer",
+        # is_termination_msg=lambda x: x.get("content", "").rstrip().endswith("TERMINATE"),
+        human_input_mode="NEVER",
+        code_execution_config = False,
+        llm_config=llm_config,
+        system_message="""
     You review the image of the 2D cad data provided to assist in the creation of 3D model.
     You will be provided image path by the User.
     """
-)
+    )
+
+    #clears the history of the old chats
+    def reset():
+        User.reset()
+        designer_aid.reset()
+        cad_coder_assistant.reset()
+        executor.reset()
+        cad_coder.reset()
+        reviewer.reset()
+        designer_expert.reset()
+
+    return SimpleNamespace(
+        llm_config=llm_config, User=User, proxy_user=proxy_user, functioncall_agent=functioncall_agent,
+        designer_expert=designer_expert, designer_aid=designer_aid, cad_coder_assistant=cad_coder_assistant,
+        cad_coder=cad_coder, executor=executor, reviewer=reviewer, cad_data_reviewer=cad_data_reviewer,
+        call_rag=call_rag, call_rag_batch=call_rag_batch, reset=reset,
+    )
+
+
+_agents = None
+_agents_lock = threading.Lock()
+
+
+def get_agents():
+    """The shared agent team, built on first use."""
+    global _agents
+    with _agents_lock:
+        if _agents is None:
+            _agents = build_agents()
+        return _agents
+
 
-#clears the history of the old chats
 def reset_agents():
-    User.reset()
-    designer_aid.reset()
-    cad_coder_assistant.reset()
-    executor.reset()
-    cad_coder.reset()
-    reviewer.reset()
-    designer_expert.reset()
+    get_agents().reset()
 
 
+def __getattr__(name):
+    # Keeps `agents.User` style access working, the team is built on first access
+    if name.startswith("__"):
+        raise AttributeError(name)
+    agents = get_agents()
+    try:
+        return getattr(agents, name)
+    except AttributeError:
+        raise AttributeError(f"module 'agents' has no attribute {name!r}") from None
@@ -1,101 +1,118 @@
-from autogen import AssistantAgent, UserProxyAgent
-from autogen.agentchat.contrib.retrieve_user_proxy_agent import RetrieveUserProxyAgent
 import os
+import threading
+from types import SimpleNamespace
 from typing_extensions import Annotated
-from langchain_rag import langchain_rag
-
-
-#Definig config list for llms. Add more llms if you want. By default
-#Autogen will select the first one until it can use it.
-config_list = [
-    {
-
-        "model": "llama-3.2-90b-text-preview",
-        "api_key":  os.environ["GROQ_API_KEY"],
-        "api_type": "groq", 
-    },
-    {
-        "model": 'gemini-pro',
-        "api_key": os.environ["GEMINI_API_KEY"],  # Replace with your API key variable
-        "api_type": "google",
-    },
-    {
-
-        "model": "llama3-8b-8192",
-        "api_key":  os.environ["GROQ_API_KEY"],
-        "api_type": "groq", 
-    },
-    
-]
-
-llm_config = {
-    "seed": 25,
-    "temperature": 0,
-    "config_list": config_list,
-    "request_timeout": 600,
-    "retry_wait_time": 120,
-}
 
 
 #This is for terminating the chat. This can be passed as one line functin as well.
 def termination_msg(x):
     return isinstance(x, dict) and "TERMINATE" == str(x.get("content", ""))[-9:].upper()
 
-#Defining agents for designing
-#First we define designer userproxy agent which takes input from human
 
-# Function Call Agent - Acts as first responder
-functioncall_agent = AssistantAgent(
-    name="Function Call Agent",
-    is_termination_msg=termination_msg,
-    human_input_mode="Never",
-    llm_config={"config_list": config_list},
-    system_message="""You are the first responder for all CAD design requests. Follow strictly:
+def default_config_list():
+    #Definig config list for llms. Add more llms if you want. By default
+    #Autogen will select the first one until it can use it.
+    config_list = [
+        {
+
+            "model": "llama-3.2-90b-text-preview",
+            "api_key":  os.environ["GROQ_API_KEY"],
+            "api_type": "groq", 
+        },
+        {
+            "model": 'gemini-pro',
+            "api_key": os.environ["GEMINI_API_KEY"],  # Replace with your API key variable
+            "api_type": "google",
+        },
+        {
+
+            "model": "llama3-8b-8192",
+            "api_key":  os.environ["GROQ_API_KEY"],
+            "api_type": "groq", 
+        },
+    
+    ]
+    return config_list
+
+
+def build_agents(config_list=None):
+    """
+    Create the function calling agent team used by the registered CAD templates.
+
+    Args:
+        config_list (list): LLM configs, see default_config_list().
+
+    Returns:
+        SimpleNamespace: The agents by name, llm_config, config_list and reset().
+    """
+    from autogen import AssistantAgent, UserProxyAgent
+    from execution_server import CadQueryCodeExecutor
+
+    if config_list is None:
+        config_list = default_config_list()
+    llm_config = {
+        "seed": 25,
+        "temperature": 0,
+        "config_list": config_list,
+        "request_timeout": 600,
+        "retry_wait_time": 120,
+    }
+
+    #Defining agents for designing
+    #First we define designer userproxy agent which takes input from human
+
+    # Function Call Agent - Acts as first responder
+    functioncall_agent = AssistantAgent(
+        name="Function Call Agent",
+        is_termination_msg=termination_msg,
+        human_input_mode="Never",
+        llm_config={"config_list": config_list},
+        system_message="""You are the first responder for all CAD design requests. Follow strictly:
 1. ALWAYS check for registered functions first for requested CAD model
 2. If function exists: Call it with provided parameters or reasonable defaults
 3. If successful: Forward to User for feedback with explicit message "Forwarding to User for feedback now" and skip the next step."""
-)
-
-proxy_user = UserProxyAgent(
-    name="Proxy User",
-    is_termination_msg=termination_msg,
-    human_input_mode="NEVER", # Use ALWAYS for human in the loop
-    max_consecutive_auto_reply=5, #Change it to limit the number of replies from this agent
-    code_execution_config= False,
-    system_message=" Proxy user who:"
-    "1. Executes the registered function"
-    "2. Forwards the execution to User with message 'Forwarding to User for feedback'."
     )
 
-# Designer Expert - Provides structured approach
-designer_expert = AssistantAgent(
-    name="Designer Expert",
-    is_termination_msg=termination_msg,
-    human_input_mode="NEVER",
-    llm_config={"config_list": config_list},
-    system_message="""You only respond when Function Call Agent explicitly forwards a request to you.
+    proxy_user = UserProxyAgent(
+        name="Proxy User",
+        is_termination_msg=termination_msg,
+        human_input_mode="NEVER", # Use ALWAYS for human in the loop
+        max_consecutive_auto_reply=5, #Change it to limit the number of replies from this agent
+        code_execution_config= False,
+        system_message=" Proxy user who:"
+        "1. Executes the registered function"
+        "2. Forwards the execution to User with message 'Forwarding to User for feedback'."
+        )
+
+    # Designer Expert - Provides structured approach
+    designer_expert = AssistantAgent(
+        name="Designer Expert",
+        is_termination_msg=termination_msg,
+        human_input_mode="NEVER",
+        llm_config={"config_list": config_list},
+        system_message="""You only respond when Function Call Agent explicitly forwards a request to you.
 When activated:
 1. List required parameters
 2. Provide single CadQuery-based approach in clear steps
 3. End with 'Forwarding to CAD Assistant for documentation search.'
 Keep responses analytical and never provide code."""
-)
+    )
 
-# CAD Coder Assistant - RAG-focused helper
-cad_coder_assistant = AssistantAgent(
-    name="CAD Coder Assistant",
-    system_message="""You only activate when Designer Expert forwards a request.
-1. Use provided RAG function to search CadQuery documentation
+    # CAD Coder Assistant - RAG-focused helper
+    cad_coder_assistant = AssistantAgent(
+        name="CAD Coder Assistant",
+        system_message="""You only activate when Designer Expert forwards a request.
+1. Use call_rag_batch once with one question per step listed by Designer Expert to search CadQuery documentation
 2. Find relevant code patterns and examples
 3. Summarize findings and forward to CAD Coder with message:
    'Documentation search complete. Providing patterns to CAD Coder:'""",
-    llm_config={"config_list": config_list}
-)
+        llm_config={"config_list": config_list}
+    )
 
-# CAD Coder - Implementer
-cad_coder = AssistantAgent(
-    name="CadQuery Code Writer",
-    system_message="""You only respond to input from CAD Coder Assistant and write python code to create CAD models using CadQuery  .
+    # CAD Coder - Implementer
+    cad_coder = AssistantAgent(
+        name="CadQuery Code Writer",
+        system_message="""You only respond to input from CAD Coder Assistant and write python code to create CAD models using CadQuery  .
 Create complete CadQuery implementation:
 1. Full imports (cadquery, ocp_vscode)
 2. All parameters
@@ -129,63 +146,111 @@ Strictly follow the structure of example below to write python code for CAD mode
 ```
         Only use CadQuery’s predefined shapes and operations based on the analyst’s instructions.
 """,
-    llm_config={"config_list": config_list}
-)
+        llm_config={"config_list": config_list}
+    )
 
-# Executor - Implementation
-executor = AssistantAgent(
-    name="Executor",
-    system_message="""You only activate when CAD Coder forwards code.
+    # Executor - Implementation
+    executor = AssistantAgent(
+        name="Executor",
+        system_message="""You only activate when CAD Coder forwards code.
 1. Execute provided code in work directory
 2. Capture all outputs
 3. Forward results to Reviewer with:
    Success: 'Execution successful. Reviewer, please verify:'
    Failure: 'Execution failed. Reviewer, please analyze:'""",
-    code_execution_config={
-        "last_n_messages": 3,
-        "work_dir": "NewCADs",
-        "use_docker": False,
-    }
-)
+        # Runs the code in warm CadQuery workers instead of a new interpreter per script
+        code_execution_config={
+            "last_n_messages": 3,
+            "executor": CadQueryCodeExecutor(work_dir="NewCADs"),
+        }
+    )
 
-# Reviewer - Final check
-reviewer = AssistantAgent(
-    name="Reviewer",
-    system_message="""You only respond to Executor's results.
+    # Reviewer - Final check
+    reviewer = AssistantAgent(
+        name="Reviewer",
+        system_message="""You only respond to Executor's results.
 On success: 
 - Confirm to User with 'Model created successfully.'
 On failure:
 - Send to CAD Coder: 'Code needs revision. Specific issues:'
   followed by CadQuery-specific fixes""",
-    llm_config=llm_config
-)
+        llm_config=llm_config
+    )
 
-# User Proxy - Human interface
-User = UserProxyAgent(
-    name="User",
-    system_message="""Design requester who:
+    # User Proxy - Human interface
+    User = UserProxyAgent(
+        name="User",
+        system_message="""Design requester who:
 1. Initiates with CAD design requests
 2. Receives final confirmation or results
 3. Can provide feedback if needed""",
-    human_input_mode="ALWAYS",
-    code_execution_config=False
-)
-
-@cad_coder_assistant.register_for_execution()
-@cad_coder_assistant.register_for_llm(description= "Code finder using Retrieval Augmented Generation")
-def call_rag(
-    question: Annotated[float, "Task for which code to be found"],
-) -> str:
-    return langchain_rag(question)
-
-#clears the history of the old chats
+        human_input_mode="ALWAYS",
+        code_execution_config=False
+    )
+
+    # The CAD templates the Function Call Agent checks first, User executes them
+    from designer_functions import register_cad_templates
+    register_cad_templates(User, functioncall_agent)
+
+    @cad_coder_assistant.register_for_execution()
+    @cad_coder_assistant.register_for_llm(description= "Code finder using Retrieval Augmented Generation")
+    def call_rag(
+        question: Annotated[float, "Task for which code to be found"],
+    ) -> str:
+        from langchain_rag import stop_after_code_block, stream_rag
+        # Streams tokens to the console/UI sinks while generating, stops once the code is complete
+        return stream_rag(question, should_stop=stop_after_code_block)
+
+    @cad_coder_assistant.register_for_execution()
+    @cad_coder_assistant.register_for_llm(description= "Code finder using Retrieval Augmented Generation for several tasks at once")
+    def call_rag_batch(
+        questions: Annotated[list[str], "Tasks for which code to be found, one per design step"],
+    ) -> str:
+        from langchain_rag import rag_batch
+        answers = rag_batch(questions)
+        return "\n\n".join(f"### {question}\n{answer}" for question, answer in zip(questions, answers))
+
+    #clears the history of the old chats
+    def reset():
+        User.reset()
+        # designer_aid.reset()
+        cad_coder_assistant.reset()
+        executor.reset()
+        cad_coder.reset()
+        reviewer.reset()
+        designer_expert.reset()
+
+    return SimpleNamespace(
+        config_list=config_list, llm_config=llm_config, User=User, proxy_user=proxy_user,
+        functioncall_agent=functioncall_agent, designer_expert=designer_expert,
+        cad_coder_assistant=cad_coder_assistant, cad_coder=cad_coder, executor=executor, reviewer=reviewer,
+        call_rag=call_rag, call_rag_batch=call_rag_batch, reset=reset,
+    )
+
+
+_agents = None
+_agents_lock = threading.Lock()
+
+
+def get_agents():
+    """The shared agent team, built on first use."""
+    global _agents
+    with _agents_lock:
+        if _agents is None:
+            _agents = build_agents()
+        return _agents
+
+
 def reset_agents():
-    User.reset()
-    # designer_aid.reset()
-    cad_coder_assistant.reset()
-    executor.reset()
-    cad_coder.reset()
-    reviewer.reset()
-    designer_expert.reset()
+    get_agents().reset()
 
 
+def __getattr__(name):
+    # Keeps `agents_v2.User` style access working, the team is built on first access
+    if name.startswith("__"):
+        raise AttributeError(name)
+    agents = get_agents()
+    try:
+        return getattr(agents, name)
+    except AttributeError:
+        raise AttributeError(f"module 'agents_v2' has no attribute {name!r}") from None
@@ -1,5 +1,5 @@
 from autogen import GroupChat, GroupChatManager
-# from designer_functions import *
+# CAD templates need a function-call agent, agents_v2.build_agents() registers them
 from agents_v3 import *
 from autogen.agentchat.contrib.capabilities.vision_capability import VisionCapability
 
@@ -0,0 +1,151 @@
+import contextlib
+import contextvars
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Session (or request) the current template call belongs to, see use_session()
+_session_id = contextvars.ContextVar("cad_session_id", default=None)
+_process_session_id = os.environ.get("CAD_SESSION_ID") or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def current_session_id() -> str:
+    return _session_id.get() or _process_session_id
+
+
+@contextlib.contextmanager
+def use_session(session_id: str):
+    """Write the artifacts of template calls made inside the block under session_id."""
+    token = _session_id.set(str(session_id))
+    try:
+        yield
+    finally:
+        _session_id.reset(token)
+
+
+def content_hash(path, length: int = 12) -> str:
+    """
+    Hash of an exported file, ignoring data that changes between identical exports.
+
+    STEP files carry a timestamp in the header and a per-process counter in the
+    product name, so only the DATA section is hashed with the counter removed.
+    A STEP file without a DATA section (truncated, non-standard) is hashed whole.
+    """
+    digest = hashlib.sha256()
+    suffix = Path(path).suffix.lower()
+    with open(path, "rb") as f:
+        if suffix in (".step", ".stp"):
+            data = f.read()
+            start = data.find(b"\nDATA;")
+            if start >= 0:
+                data = data[start:]
+            digest.update(re.sub(rb"(Open CASCADE STEP translator [\d.]+) \d+", rb"\1", data))
+        else:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:length]
+
+
+class ArtifactStore:
+    """
+    Collision-free, content-addressed storage for exported CAD files.
+
+    Every file is exported to a private temp file and hashed. The content lives
+    once under objects/ and each session gets a link named <stem>-<hash><suffix>
+    in its own directory. Identical geometry is stored once, concurrent sessions
+    never write the same path, and all files appear atomically via rename.
+
+    Args:
+        root (str): Base output directory.
+    """
+
+    def __init__(self, root="./NewCADs"):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.tmp = self.root / ".tmp"
+        self.deduplicated = 0
+        self.stored = 0
+
+    def temp_path(self, suffix: str) -> Path:
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        return self.tmp / f"{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex}{suffix}"
+
+    def session_dir(self, session_id=None) -> Path:
+        return self.root / (session_id or current_session_id())
+
+    def add_file(self, source, name: str, session_id=None, move=False) -> Path:
+        """
+        Store a finished file and link it into the session directory.
+
+        Args:
+            source: File to store.
+            name (str): Requested file name, e.g. "gear.stl".
+            session_id (str): Target session, the current one by default.
+            move (bool): Move source instead of copying it (used for private temp files).
+
+        Returns:
+            Path: Unique path of the artifact inside the session directory.
+        """
+        source = Path(source)
+        name = Path(name)
+        digest = content_hash(source)
+        suffix = name.suffix.lower()
+        blob = self.objects / digest[:2] / f"{digest}{suffix}"
+        if blob.exists():
+            self.deduplicated += 1
+            if move:
+                source.unlink()
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            if move:
+                os.replace(source, blob)
+            else:
+                temp = self.temp_path(suffix)
+                shutil.copyfile(source, temp)
+                os.replace(temp, blob)
+            self.stored += 1
+
+        # Names that already carry the hash (files restored from a cache) are kept
+        stem = name.stem if name.stem.endswith(f"-{digest}") else f"{name.stem}-{digest}"
+        target = self.session_dir(session_id) / f"{stem}{name.suffix}"
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.temp_path(suffix)
+            try:
+                os.link(blob, temp)
+            except OSError:
+                # Filesystems without hard links get a copy
+                shutil.copyfile(blob, temp)
+            os.replace(temp, target)
+        return target
+
+    def export(self, model, file_path, **kwargs) -> Path:
+        """Export a model through a temp file and store it, see add_file()."""
+        from cadquery import exporters
+
+        name = Path(file_path).name
+        temp = self.temp_path(Path(name).suffix)
+        try:
+            exporters.export(model, str(temp), **kwargs)
+            return self.add_file(temp, name, move=True)
+        finally:
+            if temp.exists():
+                temp.unlink()
+
+    def stats(self) -> dict:
+        return {"stored": self.stored, "deduplicated": self.deduplicated}
+
+
+_default_store = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = ArtifactStore(os.environ.get("CAD_OUTPUT_DIR", "./NewCADs"))
+    return _default_store
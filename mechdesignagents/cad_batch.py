@@ -0,0 +1,320 @@
+import argparse
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+TEMPLATE_MODULE = "designer_functions"
+# Extra seconds the parent waits past a task's timeout before killing its worker
+HARD_TIMEOUT_GRACE = 10.0
+# Seconds between checks for finished and overdue tasks
+POLL_SECONDS = 1.0
+
+
+# Queue on which workers announce when they start a task, and the pool generation
+# they belong to, set by _warm_up_worker()
+_started_queue = None
+_generation = 0
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+def parameter_grid(grid: dict) -> list:
+    """Full factorial design: every combination of the listed values."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def latin_hypercube(ranges: dict, samples: int, seed=None) -> list:
+    """
+    Space-filling random design over continuous parameter ranges.
+
+    Args:
+        ranges (dict): {name: (low, high)}.
+        samples (int): Number of variants.
+        seed (int): Random seed for reproducible catalogs.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(ranges)
+    # One stratum per sample in every dimension, strata shuffled independently
+    strata = np.stack([rng.permutation(samples) for _ in names], axis=1)
+    unit = (strata + rng.random((samples, len(names)))) / samples
+    low = np.array([ranges[name][0] for name in names], dtype=float)
+    high = np.array([ranges[name][1] for name in names], dtype=float)
+    values = low + unit * (high - low)
+    return [dict(zip(names, map(float, row))) for row in values]
+
+
+def resolve_template(name: str):
+    module = importlib.import_module(TEMPLATE_MODULE)
+    template = getattr(module, name, None)
+    if not callable(template):
+        raise ValueError(f"Unknown CAD template {name!r}")
+    return template
+
+
+def _warm_up_worker(session_id: str, started_queue=None, generation=0):
+    """Load OCCT, the exporters and the templates once per worker process."""
+    global _started_queue, _generation
+    _started_queue = started_queue
+    _generation = generation
+    os.environ.setdefault("CAD_VIEWER", "none")
+    import cadquery as cq
+    from artifact_store import _session_id
+
+    _session_id.set(session_id)
+    # A small build, mesh and STEP write pulls in the OCCT libraries and writer state
+    part = cq.Workplane("XY").box(1, 1, 1).edges().fillet(0.1)
+    part.val().tessellate(0.1)
+    with tempfile.TemporaryDirectory() as tmp:
+        cq.exporters.export(part, os.path.join(tmp, "warm_up.step"))
+    importlib.import_module(TEMPLATE_MODULE)
+
+
+def _raise_timeout(signum, frame):
+    raise TaskTimeout()
+
+
+def _run_variant(template_name: str, index: int, params: dict, timeout):
+    """Build one variant in a worker and describe the result."""
+    from cad_cache import recording_exports, to_shape
+
+    row = {"index": index, "template": template_name, "params": params, "status": "ok", "error": None,
+           "result": None, "artifacts": [], "volume": None, "bbox": None, "pid": os.getpid()}
+    start = time.perf_counter()
+    if _started_queue is not None:
+        # time.monotonic() is system wide, the parent compares it with its own clock
+        _started_queue.put((_generation, index, time.monotonic()))
+    if timeout:
+        # Interrupts Python-level work; a stuck OCCT call is killed by the parent instead
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        template = resolve_template(template_name)
+        with recording_exports() as exports:
+            row["result"] = template(**params)
+        row["artifacts"] = [str(path) for _, path in exports]
+        models = [model for model, _ in exports if model is not None]
+        if models:
+            shape = to_shape(models[0])
+            bbox = shape.BoundingBox()
+            row["volume"] = shape.Volume()
+            row["bbox"] = [bbox.xmin, bbox.ymin, bbox.zmin, bbox.xmax, bbox.ymax, bbox.zmax]
+    except TaskTimeout:
+        row["status"] = "timeout"
+        row["error"] = f"Exceeded {timeout} s"
+    except Exception as e:
+        row["status"] = "failed"
+        row["error"] = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}"
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    row["seconds"] = time.perf_counter() - start
+    return row
+
+
+class ManifestWriter:
+    """
+    Stream batch results to a .jsonl file (one row per line, flushed) or a .parquet file
+    (written in row groups, needs pyarrow).
+    """
+
+    def __init__(self, path, row_group_size=100):
+        self.path = path
+        self.parquet = str(path).endswith(".parquet")
+        self.row_group_size = row_group_size
+        self._rows = []
+        self._writer = None
+        if self.parquet:
+            import pyarrow as pa
+            self._pa = pa
+            self.schema = pa.schema([
+                ("index", pa.int64()), ("template", pa.string()), ("params", pa.string()),
+                ("status", pa.string()), ("error", pa.string()), ("result", pa.string()),
+                ("artifacts", pa.list_(pa.string())), ("volume", pa.float64()),
+                ("bbox", pa.list_(pa.float64())), ("seconds", pa.float64()), ("pid", pa.int64()),
+            ])
+        else:
+            self._file = open(path, "w")
+
+    def write(self, row: dict):
+        if not self.parquet:
+            self._file.write(json.dumps(row, default=str) + "\n")
+            self._file.flush()
+            return
+        self._rows.append({**row, "params": json.dumps(row["params"], default=str)})
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        import pyarrow.parquet as pq
+        table = self._pa.Table.from_pylist(self._rows, schema=self.schema)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def close(self):
+        if self.parquet:
+            self._flush()
+            if self._writer is not None:
+                self._writer.close()
+        else:
+            self._file.close()
+
+
+def _kill_workers(pool):
+    for process in list(getattr(pool, "_processes", {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_batch(template_name: str, variants, manifest_path: str, max_workers=None, timeout=300.0,
+              session_id=None, on_result=None):
+    """
+    Build many variants of one registered CAD template in parallel.
+
+    Workers report when they start a task. A task that overruns its timeout by
+    more than HARD_TIMEOUT_GRACE (stuck inside OCCT, where the in-worker alarm
+    cannot interrupt it) has its pool killed, and the unfinished tasks are
+    resubmitted to a fresh pool.
+
+    Args:
+        template_name (str): Name of a template in designer_functions, e.g. "create_pillow_block".
+        variants (list): Parameter dicts, see parameter_grid() and latin_hypercube().
+        manifest_path (str): .jsonl or .parquet file receiving one row per variant.
+        max_workers (int): Worker processes, the CPU count by default.
+        timeout (float): Seconds allowed per variant, None for no limit.
+        session_id (str): Artifact session for all outputs, "batch-<id>" by default.
+        on_result: Callback called with every row as it completes.
+
+    Returns:
+        dict: Counts per status, total time and the manifest path.
+    """
+    variants = list(variants)
+    max_workers = max_workers or os.cpu_count() or 1
+    session_id = session_id or f"batch-{uuid.uuid4().hex[:8]}"
+    pending = list(enumerate(variants))[::-1]
+    counts = {"ok": 0, "failed": 0, "timeout": 0}
+    writer = ManifestWriter(manifest_path)
+    start = time.perf_counter()
+
+    started_queue = multiprocessing.Queue()
+    started = {}
+    generation = 0
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=_warm_up_worker,
+                                   initargs=(session_id, started_queue, generation))
+
+    pool = new_pool()
+    in_flight = {}
+    try:
+        while pending or in_flight:
+            while pending and len(in_flight) < max_workers:
+                index, params = pending.pop()
+                future = pool.submit(_run_variant, template_name, index, params, timeout)
+                in_flight[future] = (index, params)
+            done, _ = wait(in_flight, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            while not started_queue.empty():
+                worker_generation, index, t0 = started_queue.get()
+                # Announcements of a killed pool can arrive after its tasks were resubmitted
+                if worker_generation == generation:
+                    started[index] = t0
+            for future in done:
+                index, params = in_flight.pop(future)
+                try:
+                    row = future.result()
+                except Exception as e:
+                    row = {"index": index, "template": template_name, "params": params, "status": "failed",
+                           "error": f"Worker crashed: {type(e).__name__}: {e}", "result": None,
+                           "artifacts": [], "volume": None, "bbox": None, "seconds": None, "pid": None}
+                counts[row["status"]] += 1
+                writer.write(row)
+                if on_result is not None:
+                    on_result(row)
+            if timeout:
+                now = time.monotonic()
+                overdue = [future for future, (index, _) in in_flight.items()
+                           if index in started and now - started[index] > timeout + HARD_TIMEOUT_GRACE]
+                if overdue:
+                    for future in overdue:
+                        index, params = in_flight.pop(future)
+                        t0 = started[index]
+                        row = {"index": index, "template": template_name, "params": params, "status": "timeout",
+                               "error": f"Worker killed after {now - t0:.0f} s", "result": None, "artifacts": [],
+                               "volume": None, "bbox": None, "seconds": now - t0, "pid": None}
+                        counts["timeout"] += 1
+                        writer.write(row)
+                        if on_result is not None:
+                            on_result(row)
+                    # The stuck worker cannot be cancelled on its own, restart the pool
+                    _kill_workers(pool)
+                    # Resubmitted tasks are timed from their start in the new pool
+                    for index, _ in in_flight.values():
+                        started.pop(index, None)
+                    pending.extend(in_flight.values())
+                    pending.sort(key=lambda item: item[0], reverse=True)
+                    in_flight = {}
+                    generation += 1
+                    pool = new_pool()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        writer.close()
+    return {**counts, "variants": len(variants), "seconds": time.perf_counter() - start,
+            "manifest": manifest_path, "session_id": session_id}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build many variants of a CAD template in parallel.")
+    parser.add_argument("template", help="Template name, e.g. create_pillow_block")
+    design = parser.add_mutually_exclusive_group(required=True)
+    design.add_argument("--grid", help="JSON file {param: [values]}, every combination is built")
+    design.add_argument("--samples", help="JSON file with a list of parameter dicts")
+    design.add_argument("--lhs", help="JSON file {param: [low, high]} for a Latin hypercube design")
+    parser.add_argument("--count", type=int, default=100, help="Variants drawn with --lhs")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fixed", default=None, help="JSON file with parameters shared by all variants")
+    parser.add_argument("--manifest", default="batch_manifest.jsonl", help=".jsonl or .parquet")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    def load(path):
+        with open(path) as f:
+            return json.load(f)
+
+    if args.grid:
+        variants = parameter_grid(load(args.grid))
+    elif args.samples:
+        variants = load(args.samples)
+    else:
+        variants = latin_hypercube(load(args.lhs), args.count, args.seed)
+    if args.fixed:
+        fixed = load(args.fixed)
+        variants = [{**fixed, **variant} for variant in variants]
+
+    def progress(row):
+        print(f"[{row['index']}] {row['status']} {row['seconds'] or 0:.2f} s {row['error'] or ''}".rstrip())
+
+    summary = run_batch(args.template, variants, args.manifest, max_workers=args.workers,
+                        timeout=args.timeout, on_result=progress)
+    print(f"{summary['ok']} ok, {summary['failed']} failed, {summary['timeout']} timed out "
+          f"in {summary['seconds']:.1f} s, manifest: {summary['manifest']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import contextlib
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cadquery as cq
+
+from artifact_store import get_artifact_store
+from visualization import get_visualization_sink
+
+# Exports made by the template currently being recorded, see record_export()
+_recording = contextvars.ContextVar("cad_cache_recording", default=None)
+
+
+def _library_versions() -> dict:
+    import OCP
+    return {"cadquery": cq.__version__, "ocp": getattr(OCP, "__version__", "unknown")}
+
+
+def canonicalize(value, digits: int = 9):
+    """
+    Turn template parameters into a stable, JSON-serializable form.
+
+    Floats are rounded to `digits` significant digits so values that differ only
+    by floating point noise (10.0 vs 10.000000001) share a cache entry.
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return float(value)
+    if isinstance(value, float):
+        return float(f"{value:.{digits}g}")
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v, digits) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v, digits) for v in value]
+    return repr(value)
+
+
+def to_shape(obj):
+    """Return the cq.Shape held by a Workplane (compounded if several) or the shape itself."""
+    if isinstance(obj, cq.Workplane):
+        shapes = [v for v in obj.vals() if isinstance(v, cq.Shape)]
+        return shapes[0] if len(shapes) == 1 else cq.Compound.makeCompound(shapes)
+    return obj
+
+
+@contextlib.contextmanager
+def recording_exports():
+    """Collect (model, path) of every export made inside the block, cached calls included."""
+    exports = []
+    token = _recording.set(exports)
+    try:
+        yield exports
+    finally:
+        _recording.reset(token)
+
+
+def record_export(obj, file_path):
+    """Register an exported model with the cache entry being recorded, if any."""
+    recording = _recording.get()
+    if recording is not None:
+        recording.append((obj, Path(file_path)))
+
+
+def code_version(func, root=None) -> str:
+    """
+    Hash of the source code a template's result depends on.
+
+    Covers the template itself, its module and every module of root (this
+    directory by default) that module uses, transitively, so editing a template
+    or a helper such as gear_engine invalidates its cache entries.
+    """
+    func = inspect.unwrap(func)
+    here = Path(root or Path(__file__).parent).resolve()
+    files = set()
+    pending = [sys.modules.get(func.__module__)]
+    while pending:
+        module = pending.pop()
+        path = getattr(module, "__file__", None)
+        if not path or Path(path).resolve().parent != here or path in files:
+            continue
+        files.add(path)
+        for value in vars(module).values():
+            if inspect.ismodule(value):
+                pending.append(value)
+            elif isinstance(getattr(value, "__module__", None), str):
+                pending.append(sys.modules.get(value.__module__))
+    digest = hashlib.sha256()
+    try:
+        digest.update(inspect.getsource(func).encode("utf-8"))
+    except (OSError, TypeError):
+        digest.update(func.__qualname__.encode("utf-8"))
+    for path in sorted(files):
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+class GeometryCache:
+    """
+    Content-addressed, size-bounded cache of template results.
+
+    Each entry is keyed on (function name, canonicalized parameters, template
+    code version, export settings, CadQuery/OCP version) and holds the model as BREP, copies of the exported artifacts and
+    the template's result string. The least recently used entries are evicted
+    once the cache exceeds max_bytes.
+
+    Args:
+        root (str): Cache directory.
+        max_bytes (int): Size limit of the cache directory.
+    """
+
+    def __init__(self, root="./NewCADs/.cad_cache", max_bytes=2 * 1024**3):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.versions = _library_versions()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, function_name: str, params: dict, code: str = None, export: dict = None) -> str:
+        payload = json.dumps(
+            {"function": function_name, "params": canonicalize(params), "code": code,
+             "export": canonicalize(export), "versions": self.versions},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, restored=None):
+        """
+        Restore the artifacts of a cached call into the current session and return its result string, or None.
+
+        Args:
+            key (str): Entry key, see key().
+            restored (list): Filled with the restored artifact paths if given.
+        """
+        entry_dir = self.root / key
+        entry_file = entry_dir / "entry.json"
+        if not entry_file.exists():
+            self.misses += 1
+            return None
+        with open(entry_file) as f:
+            entry = json.load(f)
+        if entry["artifacts"] and not (entry_dir / "shape.brep").exists():
+            # The model of the exports is needed by recording_exports() callers, rebuild the entry
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            self.misses += 1
+            return None
+        result = entry["result"]
+        store = get_artifact_store()
+        for artifact in entry["artifacts"]:
+            cached = entry_dir / artifact["name"]
+            if not cached.exists():
+                self.misses += 1
+                return None
+            # Link the artifact into the caller's session and point the result at it
+            target = store.add_file(cached, Path(artifact["path"]).name)
+            result = result.replace(artifact["path"], str(target))
+            if restored is not None:
+                restored.append(target)
+        # mtime of entry.json is the LRU clock
+        os.utime(entry_file)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, function_name: str, params: dict, result: str, exports, code: str = None,
+            export: dict = None):
+        entry_dir = self.root / key
+        tmp_dir = self.root / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        artifacts = []
+        for i, (obj, path) in enumerate(exports):
+            if not path.exists():
+                continue
+            name = f"{i}_{path.name}"
+            shutil.copyfile(path, tmp_dir / name)
+            artifacts.append({"name": name, "path": str(path)})
+        if exports:
+            to_shape(exports[0][0]).exportBrep(str(tmp_dir / "shape.brep"))
+        with open(tmp_dir / "entry.json", "w") as f:
+            json.dump({"function": function_name, "params": canonicalize(params), "code": code,
+                       "export": canonicalize(export), "versions": self.versions,
+                       "result": result, "artifacts": artifacts, "created": time.time()}, f)
+        with self._lock:
+            if entry_dir.exists():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            else:
+                os.replace(tmp_dir, entry_dir)
+            self.evict()
+
+    def load_shape(self, key: str):
+        """Return the cached model as a cq.Shape, or None."""
+        path = self.root / key / "shape.brep"
+        return cq.Shape.importBrep(str(path)) if path.exists() else None
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry_dir in self.root.iterdir():
+            entry_file = entry_dir / "entry.json"
+            if entry_dir.name.startswith(".") or not entry_file.exists():
+                continue
+            size = sum(p.stat().st_size for p in entry_dir.iterdir())
+            entries.append((entry_file.stat().st_mtime, size, entry_dir))
+            total += size
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else None}
+
+
+_default_cache = None
+
+
+def get_geometry_cache() -> GeometryCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = GeometryCache(os.environ.get("CAD_CACHE_DIR", "./NewCADs/.cad_cache"))
+    return _default_cache
+
+
+def cached_cad_function(func=None, *, version=None):
+    """
+    Serve repeat calls of a template from the geometry cache instead of rebuilding.
+
+    Args:
+        func: Template function.
+        version (str): Code version of the template, by default a hash of its
+            source, see code_version().
+    """
+    if func is None:
+        return functools.partial(cached_cad_function, version=version)
+    signature = inspect.signature(func)
+    # Hashed on the first call, once every module the template uses is imported
+    code = [version]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = get_geometry_cache()
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        if code[0] is None:
+            code[0] = code_version(func)
+        # Read per call, CAD_TRIANGLE_BUDGET may change while the process runs
+        from export_pipeline import export_policy
+        export = export_policy()
+        key = cache.key(func.__name__, params, code[0], export)
+        outer = _recording.get()
+        restored = []
+        result = cache.get(key, restored)
+        if result is not None:
+            sink = get_visualization_sink()
+            shape = cache.load_shape(key) if sink.enabled or outer is not None else None
+            # Evicted since get(), callers recording the exports need the model: rebuild
+            if shape is not None or not restored or outer is None:
+                if shape is not None and sink.enabled:
+                    sink.show(shape)
+                if outer is not None:
+                    outer.extend((shape, path) for path in restored)
+                return result
+        exports = []
+        token = _recording.set(exports)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _recording.reset(token)
+        cache.put(key, func.__name__, params, result, exports, code[0], export)
+        if outer is not None:
+            outer.extend(exports)
+        return result
+
+    return wrapper
@@ -1,27 +1,33 @@
-from autogen import AssistantAgent, UserProxyAgent
-from agents import *
+from agents import get_agents, termination_msg
 
 #for two agent system with just designer and cad coder.
 
-User = UserProxyAgent(
-    name="User",
-    is_termination_msg=termination_msg,
-    human_input_mode="Never", # Use ALWAYS for human in the loop
-    max_consecutive_auto_reply=1, #Change it to limit the number of replies from this agent
-    #here we define the coding configuration for executing the code generated by agent 
-    code_execution_config= {
-        "work_dir": "NewCADs",
-        "use_docker": False,
-    },
-    # llm_config={"config_list": config_list}, #you can also select a particular model from the config list here for llm
-    system_message=""" A human designer who asks questions to create CAD models using CadQuery. You execute
+_two_agents = None
+
+
+def build_two_agents(llm_config):
+    """Create the User proxy and CadQuery Code Writer of the two agent system."""
+    from autogen import AssistantAgent, UserProxyAgent
+
+    User = UserProxyAgent(
+        name="User",
+        is_termination_msg=termination_msg,
+        human_input_mode="Never", # Use ALWAYS for human in the loop
+        max_consecutive_auto_reply=1, #Change it to limit the number of replies from this agent
+        #here we define the coding configuration for executing the code generated by agent 
+        code_execution_config= {
+            "work_dir": "NewCADs",
+            "use_docker": False,
+        },
+        # llm_config={"config_list": config_list}, #you can also select a particular model from the config list here for llm
+        system_message=""" A human designer who asks questions to create CAD models using CadQuery. You execute
     the python code written by CAD code writer. Terminate after successful cad model creation """,
-    description= "The designer who asks questions to create CAD models using CadQuery",
-)
+        description= "The designer who asks questions to create CAD models using CadQuery",
+    )
 
-cad_coder = AssistantAgent(
-    "CadQuery Code Writer",
-    system_message= """You only create the CAD model requested by the User.
+    cad_coder = AssistantAgent(
+        "CadQuery Code Writer",
+        system_message= """You only create the CAD model requested by the User.
     You write python code to create CAD models using CadQuery.
     Wrap the code in a code block that specifies the script type. 
     The user can't modify your code. 
@@ -76,14 +82,24 @@ cad_coder = AssistantAgent(
 ```
         Only use CadQuery’s predefined shapes and operations based on the analyst’s instructions. And terminate after succesful creation of CAD model.
         """,
-    llm_config=llm_config,
-    is_termination_msg=termination_msg,
-    human_input_mode="NEVER",
-    description="CadQuery Code Writer who writes python code to create CAD models following the system message.",
-)
+        llm_config=llm_config,
+        is_termination_msg=termination_msg,
+        human_input_mode="NEVER",
+        description="CadQuery Code Writer who writes python code to create CAD models following the system message.",
+    )
+    return User, cad_coder
+
+
+def get_two_agents():
+    global _two_agents
+    if _two_agents is None:
+        _two_agents = build_two_agents(get_agents().llm_config)
+    return _two_agents
+
 
 def chat_cad_coder(prompt: str):
     '''Chat with cad_coder agent.'''
+    User, cad_coder = get_two_agents()
     cad_coder.reset()
     User.reset()
     response= User.initiate_chat(cad_coder, message=prompt)
@@ -95,7 +111,7 @@ def main():
     print("----------------------------------")
     print("Enter 'quit' to exit the program")
 
-    reset_agents()
+    User, cad_coder = get_two_agents()
     
     while True:
         try:
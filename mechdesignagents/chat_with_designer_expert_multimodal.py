@@ -1,18 +1,12 @@
-from autogen import GroupChat, GroupChatManager
-# from designer_functions import *
-from agents import *
-from autogen.agentchat.contrib.capabilities.vision_capability import VisionCapability
+# CAD templates: designer_functions.register_cad_templates(agents.User, agents.functioncall_agent)
+from agents import get_agents, reset_agents
+from speaker_graph import SpeakerRouter, format_routing_stats
+from context_compaction import add_compaction, compaction_stats, format_compaction_stats
+from artifact_store import current_session_id
+import glob
+import os
 import re
 
-# allowed_transitions = {
-#     User: [functioncall_agent,User],
-#     functioncall_agent: [User, designer_expert],
-#     designer_expert: [cad_coder_assistant],
-#     cad_coder_assistant: [cad_coder],
-#     cad_coder: [executor],
-#     executor: [reviewer],
-#     reviewer: [User, cad_coder]  # Can go back to user for approval or cad_coder for fixes
-# }
 
 def multimodal_designers_chat(design_problem: str):
     """
@@ -24,6 +18,7 @@ def multimodal_designers_chat(design_problem: str):
     Required Agents:
         - designer
         - designer_expert
+        - cad_coder_assistant (looks up CadQuery code with call_rag)
         - cad_coder
         - executor
         - reviewer
@@ -31,37 +26,53 @@ def multimodal_designers_chat(design_problem: str):
 
     Configuration:
         - max_round: 50
-        - speaker_selection: round_robin
+        - speaker_selection: SpeakerRouter (speaker_graph)
         - allow_repeat_speaker: False
 
     Example:
         >>> designers_chat("Design a water bottle")
     """
+    from autogen import GroupChat, GroupChatManager
+    from autogen.agentchat.contrib.capabilities.vision_capability import VisionCapability
+
+    agents = get_agents()
     reset_agents()
+    router = SpeakerRouter()
     groupchat = GroupChat(
         # agents=[User,designer_expert,cad_coder, executor, reviewer,cad_data_reviewer],
-        agents=[User,designer_expert,cad_coder, executor, reviewer],
+        agents=[agents.User, agents.designer_expert, agents.cad_coder_assistant, agents.cad_coder,
+                agents.executor, agents.reviewer],
 
         messages=[],
         max_round=50,
-        # speaker_selection_method="round_robin",
-        speaker_selection_method="auto",
+        # Workflow graph and message markers, the LLM only picks when they are ambiguous
+        speaker_selection_method=router,
         allow_repeat_speaker=False,
         func_call_filter=True,
         select_speaker_auto_verbose=False,
         send_introductions= True, 
-        # allowed_or_disallowed_speaker_transitions=allowed_transitions,
-        # speaker_transitions_type="allowed"
     )
-    vision_capability = VisionCapability(lmm_config=llm_config)
-    group_chat_manager = GroupChatManager(groupchat=groupchat, llm_config=llm_config)
+    # Superseded code, logs and plans are summarized before each LLM call
+    transforms = add_compaction(groupchat.agents, agents.llm_config)
+    vision_capability = VisionCapability(lmm_config=agents.llm_config)
+    group_chat_manager = GroupChatManager(groupchat=groupchat, llm_config=agents.llm_config)
     vision_capability.add_to_agent(group_chat_manager)
 
-    rst = User.initiate_chat(
+    rst = agents.User.initiate_chat(
         group_chat_manager,
         message=design_problem,
     )
+    print(format_routing_stats(router.stats()))
+    print(format_compaction_stats(compaction_stats(transforms)))
     output= rst.chat_history
+    # STL of the last run that wrote one, as listed by the Executor (see execution_server.format_job_result)
+    for entry in reversed(output):
+        files_match = re.search(r'Files written: (.+)$', str(entry.get('content')), re.MULTILINE)
+        if entry.get('name') == 'Executor' and files_match:
+            stl_files = [path for path in files_match.group(1).split(", ") if path.lower().endswith('.stl')]
+            if stl_files:
+                return stl_files[0]
+
     stl_filename = None
     for entry in output:
         if entry['name'] == 'CadQuery_Code_Writer' and 'stl' in entry['content']:
@@ -70,15 +81,16 @@ def multimodal_designers_chat(design_problem: str):
             if stl_filename_match:
                 stl_filename = stl_filename_match.group(1)
 
-    # Define the base path
-    base_path = '/home/niel77/MechDesignAgents/mechdesignagents/NewCADs'
+    # The execution server publishes what a script writes to the session directory of the
+    # Executor's work_dir, as <stem>-<content hash>.stl; take the newest one of that name
+    session_path = os.path.join(os.path.abspath('NewCADs'), current_session_id())
 
-    # Append the filename to the path
     if stl_filename:
-        full_path = f"{base_path}/{stl_filename}"
-        return full_path
-    else:
-        return None
+        stem = os.path.splitext(os.path.basename(stl_filename))[0]
+        candidates = glob.glob(os.path.join(glob.escape(session_path), f"{glob.escape(stem)}-*.stl"))
+        if candidates:
+            return max(candidates, key=os.path.getmtime)
+    return None
 
 
 
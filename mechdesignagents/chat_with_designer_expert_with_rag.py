@@ -1,16 +1,8 @@
-from autogen import GroupChat, GroupChatManager
-# from designer_functions import *
-from agents import *
+# CAD templates: designer_functions.register_cad_templates(agents.User, agents.functioncall_agent)
+from agents import get_agents, reset_agents
+from speaker_graph import SpeakerRouter, format_routing_stats
+from context_compaction import add_compaction, compaction_stats, format_compaction_stats
 
-# allowed_transitions = {
-#     User: [functioncall_agent,User],
-#     functioncall_agent: [User, designer_expert],
-#     designer_expert: [cad_coder_assistant],
-#     cad_coder_assistant: [cad_coder],
-#     cad_coder: [executor],
-#     executor: [reviewer],
-#     reviewer: [User, cad_coder]  # Can go back to user for approval or cad_coder for fixes
-# }
 
 def designers_rag_chat(design_problem: str):
     """
@@ -28,34 +20,42 @@ def designers_rag_chat(design_problem: str):
 
     Configuration:
         - max_round: 50
-        - speaker_selection: round_robin
+        - speaker_selection: SpeakerRouter (speaker_graph), round robin when ambiguous
         - allow_repeat_speaker: False
 
     Example:
         >>> designers_chat("Design a water bottle")
     """
+    from autogen import GroupChat, GroupChatManager
+
+    agents = get_agents()
     reset_agents()
+    # The chat was round robin before the router, ambiguous turns stay round robin instead of adding LLM calls
+    router = SpeakerRouter(fallback="round_robin")
     groupchat = GroupChat(
-        agents=[User,cad_coder_assistant,designer_expert,cad_coder, executor, reviewer],
+        agents=[agents.User, agents.cad_coder_assistant, agents.designer_expert, agents.cad_coder,
+                agents.executor, agents.reviewer],
         messages=[],
         max_round=50,
-        speaker_selection_method="round_robin",
-        # speaker_selection_method="auto",
+        # Workflow graph and message markers, then the next agent in order
+        speaker_selection_method=router,
         allow_repeat_speaker=False,
         func_call_filter=True,
         select_speaker_auto_verbose=False,
         send_introductions= True, 
-        # allowed_or_disallowed_speaker_transitions=allowed_transitions,
-        # speaker_transitions_type="allowed"
     )
-    manager = GroupChatManager(groupchat=groupchat, llm_config=llm_config)
+    # Superseded code, logs and plans are summarized before each LLM call
+    transforms = add_compaction(groupchat.agents, agents.llm_config)
+    manager = GroupChatManager(groupchat=groupchat, llm_config=agents.llm_config)
 
     # Start chatting with the designer as this is the user proxy agent.
-    response=User.initiate_chat(
+    response=agents.User.initiate_chat(
         manager,
         message=design_problem,
     )
     print(response.cost)
+    print(format_routing_stats(router.stats()))
+    print(format_compaction_stats(compaction_stats(transforms)))
 
 
 def main():
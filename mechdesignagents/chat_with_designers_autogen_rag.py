@@ -1,25 +1,27 @@
-from agents import *
-from autogen import GroupChat, GroupChatManager
+from agents import get_agents
 
 
 
-def _reset_agents():
-    User.reset()
-    designer_aid.reset()
-    cad_coder.reset()
-    executor.reset()
-    reviewer.reset()
+def _reset_agents(agents):
+    agents.User.reset()
+    agents.designer_aid.reset()
+    agents.cad_coder.reset()
+    agents.executor.reset()
+    agents.reviewer.reset()
 
 
 def rag_chat(design_problem : str):
-    _reset_agents()
+    from autogen import GroupChat, GroupChatManager
+
+    agents = get_agents()
+    _reset_agents(agents)
     groupchat = GroupChat(
-        agents=[designer_aid, cad_coder,executor, reviewer], messages=[], max_round=12, speaker_selection_method="round_robin"
+        agents=[agents.designer_aid, agents.cad_coder, agents.executor, agents.reviewer], messages=[], max_round=12, speaker_selection_method="round_robin"
     )
-    manager = GroupChatManager(groupchat=groupchat, llm_config=llm_config)
+    manager = GroupChatManager(groupchat=groupchat, llm_config=agents.llm_config)
 
     # Start chatting with designer_aid as this is the user proxy agent.
-    response= User.initiate_chat(
+    response= agents.User.initiate_chat(
         manager,
         message=design_problem,
     )
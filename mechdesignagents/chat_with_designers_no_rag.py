@@ -1,21 +1,23 @@
-from autogen import GroupChat, GroupChatManager
-from agents import *
+from agents import get_agents, reset_agents
 
 
 
 def norag_chat(design_prblem: str):
+    from autogen import GroupChat, GroupChatManager
+
+    agents = get_agents()
     reset_agents()
     groupchat = GroupChat(
-        agents=[User, cad_coder, reviewer,],
+        agents=[agents.User, agents.cad_coder, agents.reviewer],
         messages=[],
         max_round=12,
         speaker_selection_method="round_robin",
         allow_repeat_speaker=False,
     )
-    manager = GroupChatManager(groupchat=groupchat, llm_config=llm_config)
+    manager = GroupChatManager(groupchat=groupchat, llm_config=agents.llm_config)
 
     # Start chatting with the designer as this is the user proxy agent.
-    response= User.initiate_chat(
+    response= agents.User.initiate_chat(
         manager,
         message=design_prblem,
     )
@@ -0,0 +1,256 @@
+import ast
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+import types
+from pathlib import Path
+
+import cadquery as cq
+
+# Statements that took at least this long get a checkpoint after them
+CHECKPOINT_MIN_SECONDS = 0.05
+# Checkpoints kept per session, oldest deleted first
+MAX_CHECKPOINTS = 20
+# Calls that write files or talk to the viewer. Nothing after them is checkpointed,
+# since skipping them on a resumed run would lose their effect.
+SIDE_EFFECT_CALLS = {"export", "exportStep", "exportStl", "exportBrep", "exportSvg", "exportDXF", "exportBin",
+                     "save", "write", "write_text", "write_bytes", "open", "mkdir", "makedirs", "remove", "unlink",
+                     "rmtree", "show", "show_object", "show_all", "savefig"}
+# Cheap statements re-run on every resume, their results (modules, functions) are not snapshotted
+REPLAYED = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def split_statements(code: str) -> list:
+    """Top-level statements of a script as AST nodes."""
+    return ast.parse(code).body
+
+
+def prefix_fingerprints(statements) -> list:
+    """
+    Fingerprint of every statement prefix.
+
+    Each statement is hashed through its AST dump, so comments, blank lines and
+    formatting changes keep the fingerprint, and entry i covers statements 0..i.
+    """
+    fingerprints = []
+    digest = hashlib.sha256(cq.__version__.encode("utf-8"))
+    for statement in statements:
+        digest.update(ast.dump(statement).encode("utf-8"))
+        fingerprints.append(digest.copy().hexdigest()[:24])
+    return fingerprints
+
+
+def has_side_effects(statement) -> bool:
+    for node in ast.walk(statement):
+        if isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            if name in SIDE_EFFECT_CALLS:
+                return True
+    return False
+
+
+class _Tee:
+    """Write to a stream and keep a copy, so resumed runs can replay earlier output."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+def _restorable_workplane(workplane) -> bool:
+    ctx = workplane.ctx
+    # Pending sketches and tags refer to objects a snapshot cannot recreate
+    return not ctx.pendingWires and not ctx.pendingEdges and not ctx.tags \
+        and all(isinstance(obj, cq.Shape) for obj in workplane.objects)
+
+
+class CheckpointStore:
+    """
+    Namespace snapshots of partially executed scripts, one directory per prefix fingerprint.
+
+    Workplanes and shapes are written as BREP (a Workplane keeps its plane and
+    the shapes on its stack), other values are pickled.
+
+    Args:
+        root: Checkpoint directory of one session.
+        max_checkpoints (int): Checkpoints kept, least recently used deleted first.
+    """
+
+    def __init__(self, root, max_checkpoints=MAX_CHECKPOINTS):
+        self.root = Path(root)
+        self.max_checkpoints = max_checkpoints
+
+    def path(self, fingerprint: str) -> Path:
+        return self.root / fingerprint
+
+    def latest(self, fingerprints) -> int:
+        """Index of the last statement of the longest prefix with a checkpoint, -1 if none."""
+        for index in range(len(fingerprints) - 1, -1, -1):
+            if (self.path(fingerprints[index]) / "manifest.json").exists():
+                return index
+        return -1
+
+    def save(self, fingerprint: str, namespace: dict, replayed: dict, stdout: str) -> bool:
+        """
+        Snapshot the namespace. Returns False if some value cannot be restored later.
+
+        Names still bound to what a replayed statement bound them to (see
+        replayed_bindings()) are left out, the resumed run recreates them.
+        """
+        manifest = {"stdout": stdout, "values": {}}
+        plain = {}
+        shapes = {}
+        for name, value in namespace.items():
+            if name.startswith("__"):
+                continue
+            if name in replayed and replayed[name] is value:
+                continue
+            if isinstance(value, (types.ModuleType, types.FunctionType, type)):
+                # e.g. a lambda, only a def statement is re-run on resume
+                return False
+            if isinstance(value, cq.Workplane):
+                if not _restorable_workplane(value):
+                    return False
+                plane = value.plane
+                manifest["values"][name] = {"kind": "workplane", "count": len(value.objects),
+                                            "plane": [plane.origin.toTuple(), plane.xDir.toTuple(),
+                                                      plane.zDir.toTuple()]}
+                for i, obj in enumerate(value.objects):
+                    shapes[f"{name}.{i}.brep"] = obj
+            elif isinstance(value, cq.Shape):
+                manifest["values"][name] = {"kind": "shape"}
+                shapes[f"{name}.brep"] = value
+            else:
+                plain[name] = value
+        try:
+            values = pickle.dumps(plain)
+        except Exception:
+            return False
+
+        target = self.path(fingerprint)
+        temp = self.root / f".{fingerprint}.{os.getpid()}.tmp"
+        temp.mkdir(parents=True, exist_ok=True)
+        for file_name, shape in shapes.items():
+            shape.exportBrep(str(temp / file_name))
+        (temp / "values.pkl").write_bytes(values)
+        with open(temp / "manifest.json", "w") as f:
+            json.dump(manifest, f)
+        if target.exists():
+            shutil.rmtree(temp, ignore_errors=True)
+        else:
+            os.replace(temp, target)
+        self.evict()
+        return True
+
+    def load(self, fingerprint: str, namespace: dict) -> str:
+        """Restore a snapshot into namespace and return the output printed up to it."""
+        source = self.path(fingerprint)
+        with open(source / "manifest.json") as f:
+            manifest = json.load(f)
+        namespace.update(pickle.loads((source / "values.pkl").read_bytes()))
+        for name, info in manifest["values"].items():
+            if info["kind"] == "shape":
+                namespace[name] = cq.Shape.importBrep(str(source / f"{name}.brep"))
+            else:
+                origin, x_dir, normal = info["plane"]
+                objects = [cq.Shape.importBrep(str(source / f"{name}.{i}.brep")) for i in range(info["count"])]
+                namespace[name] = cq.Workplane(cq.Plane(origin, x_dir, normal)).newObject(objects)
+        os.utime(source / "manifest.json")
+        return manifest["stdout"]
+
+    def evict(self):
+        entries = sorted(((p / "manifest.json").stat().st_mtime, p)
+                         for p in self.root.iterdir() if (p / "manifest.json").exists())
+        for _, path in entries[:max(0, len(entries) - self.max_checkpoints)]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def run_incremental(code: str, store: CheckpointStore, filename="<script>", namespace=None,
+                    min_seconds=CHECKPOINT_MIN_SECONDS) -> dict:
+    """
+    Execute a script statement by statement, resuming from the longest unchanged prefix.
+
+    Imports and function/class definitions of the skipped prefix are re-run, the
+    rest of the prefix is restored from its checkpoint together with the output
+    it printed. New checkpoints are taken after slow statements, as long as no
+    statement so far wrote files or showed models.
+
+    Args:
+        code (str): Python source.
+        store (CheckpointStore): Checkpoints of the session.
+        filename (str): Script path used in tracebacks.
+        namespace (dict): Globals to run in, a fresh __main__ namespace by default.
+        min_seconds (float): Statements faster than this are not checkpointed.
+
+    Returns:
+        dict: statements, resumed_from (statements skipped), checkpoints written and seconds.
+    """
+    statements = split_statements(code)
+    fingerprints = prefix_fingerprints(statements)
+    namespace = namespace if namespace is not None else {"__name__": "__main__", "__file__": filename}
+    start = time.perf_counter()
+    resume = store.latest(fingerprints)
+    replayed = {}
+    tee = _Tee(sys.stdout)
+    previous_stdout, sys.stdout = sys.stdout, tee
+    report = {"statements": len(statements), "resumed_from": resume + 1, "checkpoints": 0}
+    try:
+        for statement in statements[:resume + 1]:
+            if isinstance(statement, REPLAYED):
+                exec(compile(ast.Module(body=[statement], type_ignores=[]), filename, "exec"), namespace)
+                replayed.update(replayed_bindings(statement, namespace))
+        if resume >= 0:
+            tee.write(store.load(fingerprints[resume], namespace))
+        clean = True
+        for index in range(resume + 1, len(statements)):
+            statement = statements[index]
+            clean = clean and not has_side_effects(statement)
+            statement_start = time.perf_counter()
+            exec(compile(ast.Module(body=[statement], type_ignores=[]), filename, "exec"), namespace)
+            if isinstance(statement, REPLAYED):
+                replayed.update(replayed_bindings(statement, namespace))
+            elif clean and time.perf_counter() - statement_start >= min_seconds:
+                report["checkpoints"] += store.save(fingerprints[index], namespace, replayed, tee.text())
+    finally:
+        sys.stdout = previous_stdout
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def replayed_bindings(statement, namespace: dict) -> dict:
+    """
+    Names a just executed import or definition bound, with their values.
+
+    A star import (the writer prompt's `from ocp_vscode import *`) binds the
+    module's __all__, or all its public names.
+    """
+    if isinstance(statement, ast.ImportFrom) and any(alias.name == "*" for alias in statement.names):
+        module = sys.modules[statement.module]
+        names = getattr(module, "__all__", None) or [name for name in vars(module) if not name.startswith("_")]
+    elif isinstance(statement, (ast.Import, ast.ImportFrom)):
+        names = [(alias.asname or alias.name).split(".")[0] for alias in statement.names]
+    else:
+        names = [statement.name]
+    return {name: namespace[name] for name in names if name in namespace}
+
+
+def format_incremental_report(report) -> str:
+    if not report["resumed_from"]:
+        return f"Ran all {report['statements']} statements ({report['checkpoints']} checkpoints saved)"
+    return (f"Resumed after statement {report['resumed_from']} of {report['statements']} from a checkpoint, "
+            f"ran {report['statements'] - report['resumed_from']} ({report['checkpoints']} checkpoints saved)")
@@ -0,0 +1,449 @@
+import argparse
+import ast
+import builtins
+import difflib
+import functools
+import inspect
+import json
+import os
+import re
+import time
+import typing
+from importlib import metadata
+from pathlib import Path
+
+# CadQuery classes whose methods are checked, see cadquery_api()
+API_CLASSES = ("Workplane", "Sketch", "Assembly", "Shape", "Solid", "Compound", "Shell", "Face", "Wire", "Edge",
+               "Vertex", "Vector", "Location", "Plane", "Color")
+API_MODULES = ("exporters", "importers", "selectors")
+NAMED_PLANES = ("XY", "YZ", "ZX", "XZ", "YX", "ZY", "front", "back", "left", "right", "top", "bottom")
+# Names provided by `from ocp_vscode import *` that generated code uses
+OCP_VSCODE_NAMES = ("show", "show_object", "show_all", "show_clear", "reset_show", "set_defaults", "set_port",
+                    "set_viewer_config", "Camera", "Collapse")
+PYTHON_LANGUAGES = ("python", "py", "python3", "")
+CODE_BLOCK = re.compile(r"```[ \t]*(\w*)[^\n]*\n(.*?)```", re.DOTALL)
+
+
+def _api_cache_path(version: str) -> Path:
+    return Path(os.environ.get("CAD_CACHE_DIR", "./NewCADs/.cad_cache")) / f"cadquery_api-{version}.json"
+
+
+def _describe(func, owner: str, static: bool) -> dict:
+    """Parameters and return type of one method, None where it cannot be introspected."""
+    if not (inspect.isfunction(func) or inspect.ismethod(func)):
+        # Multiple dispatch wrappers and builtins have no reliable signature
+        return {"params": None, "required": None, "max_positional": None, "returns": None}
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return {"params": None, "required": None, "max_positional": None, "returns": None}
+    params = list(signature.parameters.values())
+    if not static and params and params[0].name in ("self", "cls"):
+        params = params[1:]
+    positional = [p for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    varargs = any(p.kind == p.VAR_POSITIONAL for p in params)
+    varkw = any(p.kind == p.VAR_KEYWORD for p in params)
+    returns = signature.return_annotation
+    if isinstance(returns, typing.TypeVar):
+        returns = owner
+    elif isinstance(returns, type):
+        returns = returns.__name__
+    elif isinstance(returns, str):
+        returns = returns.strip("'\"")
+    else:
+        returns = None
+    return {
+        "params": None if varkw else [p.name for p in params if p.kind != p.VAR_POSITIONAL],
+        "required": [p.name for p in positional if p.default is p.empty],
+        "max_positional": None if varargs else len(positional),
+        "returns": returns if returns in API_CLASSES else None,
+    }
+
+
+def _introspect() -> dict:
+    import cadquery as cq
+
+    api = {"version": cq.__version__, "names": sorted(n for n in dir(cq) if not n.startswith("_")),
+           "classes": {}, "modules": {}}
+    for name in API_CLASSES:
+        cls = getattr(cq, name)
+        methods = {}
+        for attr in dir(cls):
+            if attr.startswith("_") and attr != "__init__":
+                continue
+            static = isinstance(inspect.getattr_static(cls, attr, None), (staticmethod, classmethod))
+            value = getattr(cls, attr, None)
+            methods[attr] = _describe(value, name, static) if callable(value) else None
+        api["classes"][name] = methods
+    for name in API_MODULES:
+        api["modules"][name] = sorted(n for n in dir(getattr(cq, name)) if not n.startswith("_"))
+    return api
+
+
+@functools.lru_cache(maxsize=None)
+def cadquery_api() -> dict:
+    """
+    Public names, classes and method signatures of the installed CadQuery.
+
+    Introspecting needs `import cadquery`, so the result is cached on disk per
+    CadQuery version and later lint runs only read a JSON file.
+    """
+    try:
+        version = metadata.version("cadquery")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    path = _api_cache_path(version)
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    api = _introspect()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(temp, "w") as f:
+        json.dump(api, f)
+    os.replace(temp, path)
+    return api
+
+
+def extract_code_blocks(message: str) -> list:
+    """(language, code) of every fenced code block in an agent message."""
+    return [(language.lower(), code) for language, code in CODE_BLOCK.findall(message)]
+
+
+def _diagnostic(node, severity, code, message) -> dict:
+    return {"line": getattr(node, "lineno", 1), "column": getattr(node, "col_offset", 0) + 1,
+            "severity": severity, "code": code, "message": message}
+
+
+def _suggest(name, candidates) -> str:
+    matches = difflib.get_close_matches(name, candidates, n=1)
+    return f" (did you mean '{matches[0]}'?)" if matches else ""
+
+
+class _Checker(ast.NodeVisitor):
+    """Walks a script in order, tracking which names hold CadQuery objects."""
+
+    def __init__(self, api: dict):
+        self.api = api
+        self.diagnostics = []
+        self.cq_aliases = set()
+        self.module_aliases = {}
+        self.types = {}
+        self.ocp_names = set()
+        self.star_imports = set()
+        self.exports = 0
+
+    def report(self, node, severity, code, message):
+        self.diagnostics.append(_diagnostic(node, severity, code, message))
+
+    # Imports
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.name == "cadquery":
+                self.cq_aliases.add(alias.asname or "cadquery")
+            elif alias.name.startswith("cadquery.") and alias.asname:
+                self.module_aliases[alias.asname] = alias.name.split(".")[1]
+
+    def visit_ImportFrom(self, node):
+        if node.module == "ocp_vscode":
+            for alias in node.names:
+                if alias.name == "*":
+                    self.ocp_names.update(OCP_VSCODE_NAMES)
+                else:
+                    self.ocp_names.add(alias.asname or alias.name)
+            return
+        if node.module != "cadquery":
+            if any(alias.name == "*" for alias in node.names):
+                self.star_imports.add(node.module)
+            return
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_imports.add("cadquery")
+            elif alias.name in self.api["classes"]:
+                self.types[alias.asname or alias.name] = ("class", alias.name)
+            elif alias.name in self.api["modules"]:
+                self.module_aliases[alias.asname or alias.name] = alias.name
+            elif alias.name not in self.api["names"]:
+                self.report(node, "error", "unknown-import",
+                            f"cadquery has no '{alias.name}'{_suggest(alias.name, self.api['names'])}")
+
+    # Types
+
+    def infer(self, node):
+        """("instance" | "class", class name) for CadQuery expressions, else None."""
+        if isinstance(node, ast.Name):
+            return self.types.get(node.id)
+        if isinstance(node, ast.Attribute):
+            if isinstance(node.value, ast.Name) and node.value.id in self.cq_aliases \
+                    and node.attr in self.api["classes"]:
+                return ("class", node.attr)
+            return None
+        if isinstance(node, ast.Call):
+            owner = self.infer(node.func)
+            if owner is not None and owner[0] == "class":
+                # Constructor, e.g. cq.Workplane("XY")
+                return ("instance", owner[1])
+            if isinstance(node.func, ast.Attribute):
+                owner = self.infer(node.func.value)
+                info = self.api["classes"][owner[1]].get(node.func.attr) if owner else None
+                if info and info["returns"]:
+                    return ("instance", info["returns"])
+        return None
+
+    def check_call(self, node, info, label):
+        if info is None or any(isinstance(arg, ast.Starred) for arg in node.args) \
+                or any(keyword.arg is None for keyword in node.keywords):
+            return
+        if info["max_positional"] is not None and len(node.args) > info["max_positional"]:
+            self.report(node, "error", "too-many-arguments",
+                        f"{label}() takes at most {info['max_positional']} positional arguments, got {len(node.args)}")
+            return
+        keywords = [keyword.arg for keyword in node.keywords]
+        if info["params"] is not None:
+            for keyword in node.keywords:
+                if keyword.arg not in info["params"]:
+                    self.report(keyword.value, "error", "unknown-keyword",
+                                f"{label}() has no parameter '{keyword.arg}'{_suggest(keyword.arg, info['params'])}")
+        missing = [name for name in (info["required"] or [])[len(node.args):] if name not in keywords]
+        if missing:
+            self.report(node, "error", "missing-argument", f"{label}() is missing {', '.join(missing)}")
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Name):
+            if func.id == "input":
+                self.report(node, "error", "blocking-input", "input() blocks the Executor, define the values in code")
+            elif func.id in ("show", "show_object") and func.id not in self.ocp_names:
+                self.report(node, "error", "missing-import",
+                            f"{func.id}() is used without importing it, add `from ocp_vscode import {func.id}`")
+        if isinstance(func, ast.Attribute):
+            owner = self.infer(func.value)
+            if owner is not None:
+                methods = self.api["classes"][owner[1]]
+                if func.attr not in methods:
+                    self.report(func, "error", "unknown-method",
+                                f"{owner[1]} has no method '{func.attr}'{_suggest(func.attr, list(methods))}")
+                else:
+                    self.check_call(node, methods[func.attr], f"{owner[1]}.{func.attr}")
+            self.check_export(node)
+        owner = self.infer(func)
+        if owner is not None and owner[0] == "class":
+            self.check_call(node, self.api["classes"][owner[1]].get("__init__"), owner[1])
+            if owner[1] == "Workplane" and node.args and isinstance(node.args[0], ast.Constant) \
+                    and isinstance(node.args[0].value, str) and node.args[0].value not in NAMED_PLANES:
+                self.report(node.args[0], "error", "unknown-plane",
+                            f"Unknown plane '{node.args[0].value}', expected one of {', '.join(NAMED_PLANES)}")
+        self.generic_visit(node)
+
+    def check_export(self, node):
+        func = node.func
+        module = None
+        if isinstance(func.value, ast.Attribute) and isinstance(func.value.value, ast.Name) \
+                and func.value.value.id in self.cq_aliases:
+            module = func.value.attr
+        elif isinstance(func.value, ast.Name) and func.value.id in self.module_aliases:
+            module = self.module_aliases[func.value.id]
+        if module is None:
+            return
+        if module in self.api["modules"] and func.attr not in self.api["modules"][module]:
+            self.report(func, "error", "unknown-name",
+                        f"cadquery.{module} has no '{func.attr}'{_suggest(func.attr, self.api['modules'][module])}")
+        if module == "exporters" and func.attr == "export":
+            self.exports += 1
+            target = node.args[1] if len(node.args) > 1 else None
+            has_type = len(node.args) > 2 or any(keyword.arg == "exportType" for keyword in node.keywords)
+            if isinstance(target, ast.Constant) and isinstance(target.value, str) and not has_type \
+                    and not Path(target.value).suffix:
+                self.report(target, "error", "export-type",
+                            f"Cannot infer the export type of '{target.value}', add a suffix such as .step or .stl")
+
+    def visit_Attribute(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id in self.cq_aliases and not isinstance(node.ctx, ast.Store):
+            if node.attr not in self.api["names"]:
+                self.report(node, "error", "unknown-name",
+                            f"cadquery has no '{node.attr}'{_suggest(node.attr, self.api['names'])}")
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        inferred = self.infer(node.value)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                if inferred is None:
+                    self.types.pop(target.id, None)
+                else:
+                    self.types[target.id] = inferred
+            else:
+                self.visit(target)
+
+
+def _names(tree) -> tuple:
+    """Names bound anywhere in the script and the loaded Name nodes, in one walk."""
+    bound = set(dir(builtins)) | {"__file__", "__name__"}
+    loads = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                loads.append(node)
+            else:
+                bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            bound.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, ast.MatchAs) and node.name:
+            bound.add(node.name)
+    return bound, loads
+
+
+def lint_code(code: str, api=None) -> list:
+    """
+    Check one generated CadQuery script without running it.
+
+    Args:
+        code (str): Python source.
+        api (dict): CadQuery API description, cadquery_api() by default.
+
+    Returns:
+        list: Diagnostics as dicts with line, column, severity ("error" or "warning"), code and message.
+    """
+    api = api or cadquery_api()
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [{"line": e.lineno or 1, "column": e.offset or 1, "severity": "error", "code": "syntax-error",
+                 "message": e.msg}]
+    checker = _Checker(api)
+    checker.visit(tree)
+    diagnostics = checker.diagnostics
+
+    if not checker.star_imports:
+        bound, loads = _names(tree)
+        bound |= checker.ocp_names
+        reported = set()
+        for node in loads:
+            if node.id in bound or node.id in reported or node.id in ("show", "show_object"):
+                continue
+            reported.add(node.id)
+            if node.id in ("cq", "cadquery"):
+                message = f"'{node.id}' is used but cadquery is not imported, add `import cadquery as cq`"
+            else:
+                message = f"Undefined name '{node.id}'"
+            diagnostics.append(_diagnostic(node, "error", "undefined-name", message))
+    if checker.cq_aliases and not checker.exports:
+        diagnostics.append({"line": 1, "column": 1, "severity": "warning", "code": "no-export",
+                            "message": "The model is never exported, add cq.exporters.export(...) calls"})
+    return sorted(diagnostics, key=lambda d: (d["line"], d["column"]))
+
+
+def lint_code_blocks(blocks, api=None) -> list:
+    """Lint (language, code) blocks of one message, flagging messages with several python blocks."""
+    blocks = [(language, code) for language, code in blocks if language.lower() in PYTHON_LANGUAGES]
+    diagnostics = []
+    if len(blocks) > 1:
+        diagnostics.append({"line": 1, "column": 1, "severity": "error", "code": "multiple-blocks",
+                            "message": f"{len(blocks)} code blocks found, send the complete script in one block"})
+    for _, code in blocks:
+        diagnostics.extend(lint_code(code, api))
+    return diagnostics
+
+
+def lint_message(message: str, api=None) -> list:
+    """Lint the python code blocks of an agent message, see lint_code_blocks()."""
+    return lint_code_blocks(extract_code_blocks(message), api)
+
+
+def has_errors(diagnostics) -> bool:
+    return any(d["severity"] == "error" for d in diagnostics)
+
+
+def format_diagnostics(diagnostics) -> str:
+    """Diagnostics as `line N:C: severity [code] message` lines for the CAD coder."""
+    return "\n".join(f"line {d['line']}:{d['column']}: {d['severity']} [{d['code']}] {d['message']}"
+                     for d in diagnostics)
+
+
+def _load_corpus(path) -> list:
+    """
+    Scripts with their real outcome: a .jsonl file of {"code", "exit_code"} rows or a
+    directory of execution server jobs (NewCADs/jobs).
+    """
+    path = Path(path)
+    if path.is_file():
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    corpus = []
+    for result_file in sorted(path.glob("*/result.json")):
+        with open(result_file) as f:
+            result = json.load(f)
+        script = result_file.parent / result["script"]
+        if script.exists():
+            corpus.append({"code": script.read_text(), "exit_code": result["exit_code"],
+                           "seconds": result.get("seconds"), "name": result_file.parent.name})
+    return corpus
+
+
+def replay(corpus) -> dict:
+    """
+    Lint previously executed scripts and count the runs the lint would have stopped.
+
+    Every failed run the lint rejects saves one Executor run and the Reviewer's
+    LLM round about it. Rejected scripts that actually ran fine are false positives.
+    """
+    api = cadquery_api()
+    stats = {"scripts": len(corpus), "failed": 0, "caught": 0, "false_positives": 0,
+             "executor_seconds_saved": 0.0, "lint_seconds": 0.0, "by_code": {}}
+    for item in corpus:
+        start = time.perf_counter()
+        diagnostics = lint_code(item["code"], api)
+        stats["lint_seconds"] += time.perf_counter() - start
+        failed = item["exit_code"] != 0
+        rejected = has_errors(diagnostics)
+        stats["failed"] += failed
+        if rejected and failed:
+            stats["caught"] += 1
+            stats["executor_seconds_saved"] += item.get("seconds") or 0.0
+            for d in diagnostics:
+                if d["severity"] == "error":
+                    stats["by_code"][d["code"]] = stats["by_code"].get(d["code"], 0) + 1
+        elif rejected:
+            stats["false_positives"] += 1
+    # One Reviewer LLM round per Executor run that is skipped
+    stats["llm_rounds_saved"] = stats["caught"]
+    stats["mean_lint_us"] = stats["lint_seconds"] / len(corpus) * 1e6 if corpus else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lint generated CadQuery scripts or replay a corpus of executed ones.")
+    parser.add_argument("paths", nargs="+", help="Scripts to lint, or one corpus with --replay")
+    parser.add_argument("--replay", action="store_true",
+                        help="Treat the path as a corpus (.jsonl or execution server jobs directory)")
+    args = parser.parse_args()
+    if args.replay:
+        stats = replay(_load_corpus(args.paths[0]))
+        print(f"{stats['scripts']} scripts, {stats['failed']} failed when run, {stats['caught']} of those caught "
+              f"by the lint ({stats['false_positives']} false positives)")
+        print(f"LLM rounds saved: {stats['llm_rounds_saved']}, Executor time saved: "
+              f"{stats['executor_seconds_saved']:.1f} s, lint time: {stats['mean_lint_us']:.0f} us per script")
+        for code, count in sorted(stats["by_code"].items(), key=lambda item: -item[1]):
+            print(f"    {count:5d}  {code}")
+        return 0
+    status = 0
+    for path in args.paths:
+        diagnostics = lint_code(Path(path).read_text())
+        if diagnostics:
+            print(f"{path}:\n{format_diagnostics(diagnostics)}")
+        status |= has_errors(diagnostics)
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
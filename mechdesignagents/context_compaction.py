@@ -0,0 +1,209 @@
+import copy
+import functools
+import hashlib
+import re
+import weakref
+
+# Prompt tokens an agent may send per turn, by agent name
+DEFAULT_TOKEN_BUDGET = 6000
+TOKEN_BUDGETS = {
+    "Designer_Expert": 4000,
+    "CadQuery_Code_Writer": 8000,
+    "Reviewer": 6000,
+}
+# Agents whose latest message is the approved plan
+PLAN_AGENTS = ("Designer_Expert",)
+# Agents whose latest code is the current script, kept even when snippets follow it
+CODE_AGENTS = ("CadQuery_Code_Writer",)
+# Most recent messages never dropped for the budget
+KEEP_LAST = 2
+CODE_BLOCK = re.compile(r"```[ \t]*(\w*)[^\n]*\n(.*?)```", re.DOTALL)
+EXECUTION_RESULT = re.compile(r"^exitcode: -?\d+ \(execution \w+\)")
+
+# Transform attached to each agent, the agents are reused across chats and get only one hook
+_attached = weakref.WeakKeyDictionary()
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except (KeyError, TypeError):
+        # Groq/Ollama models are not known to tiktoken, cl100k_base is close enough for budgeting
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _text(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def count_tokens(messages, model=None) -> int:
+    """Approximate prompt tokens of chat messages, as OpenAI counts them (4 per message overhead)."""
+    encoding = _encoding(model)
+    total = 0
+    for message in messages:
+        total += 4 + len(encoding.encode(_text(message)))
+        for call in message.get("tool_calls") or []:
+            total += len(encoding.encode(call["function"].get("arguments") or ""))
+    return total
+
+
+def _summarize_code(match) -> str:
+    code = match.group(2)
+    filename = re.search(r"#\s*filename:\s*(\S+)", code)
+    digest = hashlib.sha1(code.encode("utf-8")).hexdigest()[:8]
+    name = filename.group(1) if filename else f"{match.group(1) or 'code'} block"
+    return f"[superseded code: {name}, {code.count(chr(10))} lines, sha1 {digest}]"
+
+
+def _summarize_result(text: str) -> str:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    last = lines[-1][:200] if len(lines) > 1 else ""
+    return f"[earlier execution: {lines[0]}" + (f", last line: {last}]" if last else "]")
+
+
+def _summarize_plan(text: str) -> str:
+    first = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    return f"[superseded plan: {first[:120]}]"
+
+
+class CompactHistory:
+    """
+    AutoGen message transform (see TransformMessages) that keeps a group chat
+    history within a token budget.
+
+    The request (and anything before it, e.g. the introductions), the latest
+    plan, the latest code, the writer's latest script (a Reviewer snippet may
+    follow it) and the latest execution result are kept verbatim. Earlier code
+    blocks are replaced by their file name and hash, earlier
+    execution results and plans by a one-line summary. If the history is still
+    over budget the oldest remaining messages are dropped.
+
+    Args:
+        max_tokens (int): Token budget of the history sent to the LLM.
+        model (str): Model name for the tokenizer.
+        request_from (str): Name of the agent that sent the request.
+        keep_last (int): Most recent messages never dropped.
+    """
+
+    def __init__(self, max_tokens=DEFAULT_TOKEN_BUDGET, model=None, request_from="User", keep_last=KEEP_LAST):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.request_from = request_from
+        self.keep_last = keep_last
+        # (tokens before, tokens after) of every turn
+        self.turns = []
+
+    def apply_transform(self, messages):
+        messages_before, messages = messages, copy.deepcopy(messages)
+        request = next((i for i, m in enumerate(messages) if m.get("name") == self.request_from), 0)
+        code = [i for i, m in enumerate(messages) if i > request and CODE_BLOCK.search(_text(m))]
+        results = [i for i, m in enumerate(messages) if i > request and EXECUTION_RESULT.match(_text(m))]
+        plans = [i for i, m in enumerate(messages) if i > request and m.get("name") in PLAN_AGENTS]
+        scripts = [i for i in code if messages[i].get("name") in CODE_AGENTS]
+        latest_code = set(code[-1:]) | set(scripts[-1:])
+        for i in code:
+            if i in latest_code:
+                continue
+            messages[i]["content"] = CODE_BLOCK.sub(_summarize_code, _text(messages[i]))
+        for i in results[:-1]:
+            messages[i]["content"] = _summarize_result(_text(messages[i]))
+        for i in plans[:-1]:
+            messages[i]["content"] = _summarize_plan(_text(messages[i]))
+
+        protected = set(range(request + 1)) | latest_code | set(results[-1:]) | set(plans[-1:]) \
+            | set(range(max(0, len(messages) - self.keep_last), len(messages)))
+        compacted = self._fit(messages, protected)
+        # Counted here, TransformMessages only calls get_logs() when verbose
+        self.turns.append((count_tokens(messages_before, self.model), count_tokens(compacted, self.model)))
+        return compacted
+
+    def _fit(self, messages, protected):
+        tokens = [count_tokens([m], self.model) for m in messages]
+        # A tool call and its responses are dropped together, the API rejects one without the other
+        units, i = [], 0
+        while i < len(messages):
+            j = i + 1
+            if messages[i].get("tool_calls"):
+                while j < len(messages) and messages[j].get("role") == "tool":
+                    j += 1
+            units.append(range(i, j))
+            i = j
+        total = sum(tokens)
+        dropped = set()
+        for unit in units:
+            if total <= self.max_tokens:
+                break
+            if protected.isdisjoint(unit):
+                dropped.update(unit)
+                total -= sum(tokens[k] for k in unit)
+        if not dropped:
+            return messages
+        note = {"role": "user", "content": f"[{len(dropped)} earlier messages omitted to fit the context budget]"}
+        kept = [m for k, m in enumerate(messages) if k not in dropped]
+        kept.insert(min(dropped), note)
+        return kept
+
+    def get_logs(self, pre_transform_messages, post_transform_messages):
+        before, after = self.turns[-1]
+        return (f"Context: {before} -> {after} prompt tokens, "
+                f"{len(pre_transform_messages)} -> {len(post_transform_messages)} messages"), True
+
+
+def add_compaction(agents, llm_config=None, budgets=None, verbose=True) -> dict:
+    """
+    Attach a CompactHistory transform to every LLM agent of a group chat.
+
+    An agent that already has one from an earlier chat keeps it, with its budget
+    updated and its token counts cleared.
+
+    Args:
+        agents: Agents of the chat, agents without an LLM are skipped.
+        llm_config (dict): Config the tokenizer model is taken from.
+        budgets (dict): Token budget by agent name, TOKEN_BUDGETS by default.
+        verbose (bool): Print the before/after token counts of every turn.
+
+    Returns:
+        dict: The transform of each agent by name, see compaction_stats().
+    """
+    from autogen.agentchat.contrib.capabilities.transform_messages import TransformMessages
+
+    budgets = TOKEN_BUDGETS if budgets is None else budgets
+    config_list = (llm_config or {}).get("config_list") or [{}]
+    model = config_list[0].get("model")
+    transforms = {}
+    for agent in agents:
+        if not agent.llm_config:
+            continue
+        transform = _attached.get(agent)
+        if transform is None:
+            transform = _attached[agent] = CompactHistory()
+            TransformMessages(transforms=[transform], verbose=verbose).add_to_agent(agent)
+        transform.max_tokens = budgets.get(agent.name, DEFAULT_TOKEN_BUDGET)
+        transform.model = model
+        transform.turns = []
+        transforms[agent.name] = transform
+    return transforms
+
+
+def compaction_stats(transforms) -> dict:
+    """Turns and prompt tokens before/after compaction, per agent and in total."""
+    stats = {name: {"turns": len(t.turns), "before": sum(b for b, _ in t.turns), "after": sum(a for _, a in t.turns)}
+             for name, t in transforms.items()}
+    stats["total"] = {key: sum(agent[key] for agent in stats.values()) for key in ("turns", "before", "after")}
+    return stats
+
+
+def format_compaction_stats(stats) -> str:
+    lines = []
+    for name, agent in stats.items():
+        if agent["turns"]:
+            saved = 1 - agent["after"] / agent["before"] if agent["before"] else 0
+            lines.append(f"{name}: {agent['turns']} turns, {agent['before']} -> {agent['after']} prompt tokens "
+                         f"({saved:.0%} saved)")
+    return "Context compaction\n" + "\n".join(lines) if lines else "Context compaction: no LLM turns"
@@ -1,26 +1,65 @@
 import cadquery as cq
 from typing import Annotated, Callable
 from pathlib import Path
-from cadquery import exporters
 from typing_extensions import Annotated
-from ocp_vscode import *
-from math import *
+from visualization import show_model
 from typing import List, Tuple
-from mechdesignagents.agents_v2 import *
+from artifact_store import get_artifact_store
+from cad_cache import cached_cad_function, record_export
+from export_pipeline import (MESH_FORMATS, default_triangle_budget, export_formats,
+                             record_mesh_report, report_mesh_exports)
+from gear_engine import build_gear
+from geometry_report import report_geometry
+from gear_profiles import cycloidal_wire
 
 # # Set up work directory for code execution
 workdir = Path("./NewCADs")
 
+# Export a model into the artifact store and register it with the geometry cache.
+# Meshes are tessellated with a tolerance scaled to the part's size.
+# Returns the unique path the file was written to.
+def export_model(model, file_path):
+    fmt = Path(file_path).suffix.lower().lstrip(".")
+    if fmt in MESH_FORMATS:
+        report = export_formats(model, file_path, (fmt,), preset="adaptive", triangle_budget=default_triangle_budget())
+        record_mesh_report(report)
+        file_path = report["formats"][fmt]["path"]
+    else:
+        file_path = get_artifact_store().export(model, file_path)
+    record_export(model, file_path)
+    return file_path
+
+# Export a model in several formats from one tessellation, see export_pipeline.export_formats.
+# Returns the report with the unique path, time and size of each file.
+def export_model_formats(model, file_path, formats=("stl", "step", "dxf"), preset="production", dxf_model=None):
+    report = export_formats(model, file_path, formats, preset=preset, dxf_model=dxf_model)
+    record_mesh_report(report)
+    for info in report["formats"].values():
+        record_export(model, info["path"])
+    return report
+
+# Templates defined below with their descriptions, registered with the agents
+# by register_cad_templates()
+CAD_TEMPLATES = []
+
 # Custom decorator for registration
 def register_cad_function(description: str):
     def decorator(func: Callable):
-        User.register_function(
-            function_map={func.__name__: func}
-        )
-        functioncall_agent.register_for_llm(description=description)(func)
+        func = cached_cad_function(report_geometry(report_mesh_exports(func)))
+        CAD_TEMPLATES.append((func, description))
         return func
     return decorator
 
+# Register every template with an agent team, called by agents_v2.build_agents().
+# Importing this module only defines the templates, so batch workers and scripts
+# never build the agent team.
+def register_cad_templates(user, function_caller):
+    for func, description in CAD_TEMPLATES:
+        user.register_function(
+            function_map={func.__name__: func}
+        )
+        function_caller.register_for_llm(description=description)(func)
+
 
 
 
@@ -30,9 +69,9 @@ def create_plate(length: Annotated[float, "Length of the plate"],
                  width: Annotated[float, "Width of the plate"],
                  thickness: Annotated[float, "Thickness of the plate"]) -> str:
     plate = cq.Workplane("XY").box(length, width, thickness)
-    show_object(plate)
+    show_model(plate)
     file_path = workdir / "plate.stl"
-    cq.exporters.export(plate, str(file_path))
+    file_path = export_model(plate, file_path)
     return f"Plate model created and saved as {file_path}"
 
 
@@ -43,9 +82,9 @@ def create_box(width: Annotated[float, "Width of the box"],
                height: Annotated[float, "Height of the box"],
                depth: Annotated[float, "Depth of the box"]) -> str:
     box = cq.Workplane("XY").box(width, height, depth)
-    show_object(box)
+    show_model(box)
     file_path = workdir / "box.stl"
-    cq.exporters.export(box, str(file_path))
+    file_path = export_model(box, file_path)
     return f"Box model created and saved as {file_path}"
 
 
@@ -55,9 +94,9 @@ def create_box(width: Annotated[float, "Width of the box"],
 def create_cylinder(radius: Annotated[float, "Radius of the cylinder"],
                     height: Annotated[float, "Height of the cylinder"]) -> str:
     cylinder = cq.Workplane("XY").circle(radius).extrude(height)
-    show_object(cylinder)
+    show_model(cylinder)
     file_path = workdir / "cylinder.stl"
-    cq.exporters.export(cylinder, str(file_path))
+    file_path = export_model(cylinder, file_path)
     return f"Cylinder model created and saved as {file_path}"
 
 
@@ -69,10 +108,10 @@ def create_cone(base_radius: Annotated[float, "Radius of the cone base"],
                 top_radius: Annotated[float, "Radius of the cone top"]) -> str:
     # Create the cone shape with a loft operation
     cone = cq.Workplane("XY").circle(base_radius).workplane(offset=height).circle(top_radius).loft()
-    show_object(cone)
+    show_model(cone)
     # Export the result to an STL file
     file_path = workdir / "cone.stl"
-    exporters.export(cone, str(file_path))
+    file_path = export_model(cone, file_path)
     return f"Cone model created and saved as {file_path}"
 
 # Function for creating a sphere
@@ -80,10 +119,10 @@ def create_cone(base_radius: Annotated[float, "Radius of the cone base"],
 def create_sphere(radius: Annotated[float, "Radius of the sphere"]) -> str:
     # Create the sphere
     sphere = cq.Workplane("XY").sphere(radius)
-    show_object(sphere)
+    show_model(sphere)
     # Export the result to an STL file
     file_path = workdir / "sphere.stl"
-    exporters.export(sphere, str(file_path))
+    file_path = export_model(sphere, file_path)
     return f"Sphere model created and saved as {file_path}"
 
 
@@ -98,10 +137,10 @@ def create_plate_with_hole(length: Annotated[float, "Length of the plate"],
     result = (
         cq.Workplane("XY").box(length, width, thickness).faces(">Z").workplane().hole(center_hole_dia)
     )
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "plate_with_hole.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Plate model created and saved as {file_path}"
 
 
@@ -112,9 +151,9 @@ def create_torus(major_radius: Annotated[float, "Major radius (distance from tor
                  minor_radius: Annotated[float, "Minor radius (radius of the tube)"]) -> str:
     # Draw a 2D circle for the minor radius (the tube of the torus)
     torus = cq.Solid.makeTorus(major_radius,minor_radius)
-    show(torus)
+    show_model(torus)
     file_path = workdir / "torus.stl"
-    exporters.export(torus, str(file_path))
+    file_path = export_model(torus, file_path)
     return f"Torus model created and saved as {file_path}"
 
 
@@ -130,10 +169,10 @@ def create_rectangular_tube(outer_width: Annotated[float, "Outer width of the tu
     rect_tube = (
         cq.Workplane("XY").rect(outer_width, outer_height).rect(inner_width, inner_height).extrude(extrusion_length)
     )
-    show_object(rect_tube)
+    show_model(rect_tube)
     # Export the result to an STL file
     file_path = workdir / "rectangular_tube.stl"
-    exporters.export(rect_tube, str(file_path))
+    file_path = export_model(rect_tube, file_path)
     return f"Rectangular tube model created and saved as {file_path}"
 
 
@@ -148,9 +187,9 @@ def create_cylinder_tube(inner_radius: Annotated[float, "Inner radius of the tub
     # Create the cylinder tube
     cylinder_tube = (cq.Workplane("XY").center(center_x, center_y).circle(outer_radius).circle(inner_radius).extrude(height))
     # Export the result to an STL file
-    show_object(cylinder_tube)
+    show_model(cylinder_tube)
     file_path = workdir / "cylinder_tube.stl"
-    exporters.export(cylinder_tube, str(file_path))
+    file_path = export_model(cylinder_tube, file_path)
     return f"Cylinder tube model created and saved as {file_path}"
 
 
@@ -177,10 +216,10 @@ def create_I_Block(length: Annotated[float, "Length of extrusion"],
     result = (
         cq.Workplane("front").polyline(pts).mirrorY().extrude(length)
     )
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "I_block.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Extruded polyline model created and saved as {file_path}"
 
 
@@ -199,10 +238,10 @@ def create_circularbase_with_circular_cutout(base_radius: Annotated[float, "Radi
         .circle(small_circle_radius)  # Create small circles at each point
         .extrude(extrusion_height)  # Extrude the small circles
     )
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "circular_base_with_circular_cutout.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Base with extruded circles created and saved as {file_path}"
 
 
@@ -222,13 +261,11 @@ def create_pillow_block(length: Annotated[float, "Length of the box"],
         cq.Workplane("XY").box(length, height, thickness).faces(">Z").workplane().hole(hole_diameter).faces(">Z").workplane()
         .rect(length - padding, height - padding, forConstruction=True).vertices().cboreHole(through_hole_diameter, counterbore_diameter, counterbore_depth)
     )
-    show_object(result)
-    # Export the result to a STEP file
-    step_file_path = workdir / "pillow_block.step"
-    exporters.export(result, str(step_file_path))
-    # Export a 2D section as a DXF file
-    dxf_file_path = workdir / "result.dxf"
-    exporters.export(result.section(), str(dxf_file_path))
+    show_model(result)
+    # Export STEP and a 2D section as DXF, written concurrently
+    report = export_model_formats(result, workdir / "pillow_block.step", ("step", "dxf"), dxf_model=result.section())
+    step_file_path = report["formats"]["step"]["path"]
+    dxf_file_path = report["formats"]["dxf"]["path"]
     return f"Pillow block model created and saved as {step_file_path}, with a DXF section saved as {dxf_file_path}"
 
 
@@ -248,10 +285,10 @@ def create_box_with_hex_cutouts(box_length: Annotated[float, "Length of the box"
         .polygon(6, hex_side_length)
         .cutThruAll()
     )
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "box_with_hex_cutouts.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Box with hexagonal cutouts created and saved as {file_path}"
 
 
@@ -269,10 +306,10 @@ def create_lofted_shape(box_length: Annotated[float, "Length of the base box"],
     result = (
         cq.Workplane("front").box(box_length, box_width, box_height).faces(">Z").circle(circle_radius).workplane(offset=loft_offset).rect(rect_length, rect_width).loft(combine=True)
     )
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "lofted_shape.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Lofted shape model created and saved as {file_path}"
 
 
@@ -293,9 +330,9 @@ def cylinder_with_circle_and_rectangular_hole(base_circle_radius: Annotated[floa
     # Extrude the shape
     result = result.extrude(extrusion_height)
     # Export the result to an STL file
-    show_object(result)
+    show_model(result)
     file_path = workdir / "centered_shape.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Centered shape model created and saved as {file_path}"
 
 
@@ -317,10 +354,10 @@ def create_spline_extrusion(profile_points: Annotated[List[Tuple[float, float]],
     )
     # Extrude the profile
     result = profile.extrude(extrusion_height)
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "spline_extrusion.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Spline extrusion model created and saved as {file_path}"
 
 
@@ -343,9 +380,9 @@ def create_complex_extruded_L_shape(extrusion_length: Annotated[float, "Length o
     result = result.rotate((0, 0, 0), (1, 0, 0), rotation_angle)
     result = result.translate(result.val().BoundingBox().center.multiply(-1))
     # Export the result to an STL file
-    show_object(result)
+    show_model(result)
     file_path = workdir / "complex_extruded_shape.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Complex extruded shape model created and saved as {file_path}"
 
 
@@ -369,10 +406,10 @@ def create_battery_model(battery_length: Annotated[float, "Length of the battery
     )
     # Combine the battery body and cap
     result = battery_body.union(battery_cap)
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "battery_model.stl"
-    exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Battery model created and saved as {file_path}"
 
 
@@ -400,9 +437,9 @@ def create_rectangular_battery(battery_length: Annotated[float, "Length of the b
         .moveTo(-battery_length / 2 + 1, 0).polygon(6, hex_radius, forConstruction=False).polygon(6, hex_radius - 0.5, forConstruction=False).extrude(extrusion_height)  # Extrude top features
     )
     # Export the result to an STL file
-    show_object(battery_body)
+    show_model(battery_body)
     file_path = workdir / "rectangular_battery.stl"
-    exporters.export(battery_body, str(file_path))
+    file_path = export_model(battery_body, file_path)
     return f"Rectangular battery model created and saved as {file_path}"
 
 
@@ -426,10 +463,10 @@ def create_bottle(length: Annotated[float, "Length of the bottle body"],
     p = p.faces(">Z").workplane(centerOption="CenterOfMass").circle(neck_radius).extrude(neck_height, True)
     # Apply shell thickness
     result = p.faces(">Z").shell(shell_thickness)
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "bottle.stl"
-    cq.exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Bottle model created and saved as {file_path}"
 
 
@@ -493,8 +530,8 @@ def create_lego_brick(
     lego_brick = tmp if lbumps == 1 and wbumps == 1 else tmp.union(base)
     # Export the model as an STL file
     file_path = workdir / "lego_brick.stl"
-    show_object(lego_brick)
-    exporters.export(lego_brick, str(file_path))
+    show_model(lego_brick)
+    file_path = export_model(lego_brick, file_path)
     return f"LEGO-like brick model created and saved as {file_path}"
 
 
@@ -579,10 +616,10 @@ def create_custom_box(
         lid = lid.rotateAboutCenter((1, 0, 0), 180)
     # Step 9: Combine lid and bottom for the final box model
     final_result = lid.union(bottom)
-    show_object(final_result)
+    show_model(final_result)
     # Export the result as an STL file
     file_path = workdir / "custom_box.stl"
-    exporters.export(final_result, str(file_path))
+    file_path = export_model(final_result, file_path)
     return f"Custom box model created and saved as {file_path}"
 
 
@@ -596,86 +633,16 @@ def create_gear(
     bore_diameter: Annotated[float, "Center hole diameter (mm)"],
     pressure_angle: Annotated[float, "Pressure angle (degrees)"],
     clearance: Annotated[float, "Clearance (mm)"],
-    backlash: Annotated[float, "Backlash (mm)"]
+    backlash: Annotated[float, "Backlash (mm)"],
+    profile: Annotated[str, "Tooth flank: 'arc' (circle-arc approximation) or 'involute'"] = "arc"
 ) -> str:
-    # Calculations for different circles
-    P_circle = module * teeth_number
-    A_circle = P_circle + 2 * module
-    D_circle = P_circle - 2.5 * module
-    B_circle = D_circle + 2 * clearance
-    # Deep calculation for flank geometry
-    pitch = 1 / module
-    theta = radians(180 / teeth_number)
-    theta1 = radians(90) + theta
-    offset = teeth_number / pitch * sin(pi / 2 / teeth_number) / 2 - 7 * backlash / 4
-    flank_radius = teeth_number / pitch / 5
-    # Convert polar coordinates to Cartesian
-    cache_radius = sqrt(P_circle**2 - offset**2)
-    x1 = cache_radius * cos(theta1)
-    y1 = cache_radius * sin(theta1)
-    di_radius = sqrt((0 - x1)**2 + (P_circle - y1)**2)
-    theta2 = di_radius / theta * (di_radius - offset) + radians(90)
-    x2 = P_circle / 2 * cos(theta2)
-    y2 = P_circle / 2 * sin(theta2)
-    # Flank center
-    theta3 = (pi) * theta + radians(90)
-    x3 = B_circle / 2 * cos(theta3)
-    y3 = B_circle / 2 * sin(theta3)
-    # Function to calculate intersection points of two circles
-    def get_circle_intersections(circle1_center, circle1_radius, circle2_center, circle2_radius):
-        x1, y1 = circle1_center
-        x2, y2 = circle2_center
-        r1 = circle1_radius
-        r2 = circle2_radius
-        d = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-        if d > r1 + r2 or d < abs(r1 - r2):
-            return []
-        if d == 0 and r1 == r2:
-            return []
-
-        a = (r1 ** 2 - r2 ** 2 + d ** 2) / (2 * d)
-        h = sqrt(r1 ** 2 - a ** 2)
-
-        x3 = x1 + a * (x2 - x1) / d
-        y3 = y1 + a * (y2 - y1) / d
-
-        intersection1 = (x3 + h * (y2 - y1) / d, y3 - h * (x2 - x1) / d)
-        intersection2 = (x3 - h * (y2 - y1) / d, y3 + h * (x2 - x1) / d)
-
-        return [intersection1, intersection2]
-    # Calculate intersection points
-    intersection1 = get_circle_intersections((0, 0), D_circle / 2, (x3, y3), flank_radius)[0]
-    x4, y4 = intersection1
-    intersection2 = get_circle_intersections((0, 0), A_circle / 2, (x3, y3), flank_radius)[0]
-    x5, y5 = intersection2
-    # Function to create the profile for a single tooth
-    def create_tooth_profile(A_circle, D_circle, flank_radius, x4, y4, x5, y5):
-        tooth0 = (
-            cq.Workplane("XY").moveTo(0, D_circle / 2).lineTo(0, A_circle / 2).radiusArc((x5, y5), -A_circle / 2).radiusArc((x4, y4), flank_radius).radiusArc((0, D_circle / 2), D_circle / 2).close().extrude(thickness)
-        )
-        tooth1 = tooth0.mirror(mirrorPlane="YZ", basePointVector=(0, 0, 0))
-        tooth = tooth0.union(tooth1)
-        return tooth
-    # Create a single tooth profile
-    tooth_profile = create_tooth_profile(A_circle, D_circle, flank_radius, x4, y4, x5, y5)
-     # Function to pattern the tooth profile around the gear
-    def pattern_teeth(tooth_profile, teeth_number, P_circle):
-        gear = cq.Workplane("XY")
-        rotation_angle = 360 / teeth_number
-        for i in range(teeth_number):
-            positioned_tooth = tooth_profile.translate((0, 0, 0))
-            rotated_tooth = positioned_tooth.rotate((0, 0, 1), (0, 0, 0), rotation_angle * i)
-            gear = gear.union(rotated_tooth)
-        return gear
-    # Main gear body without teeth
-    main_body = cq.Workplane("XY").circle(A_circle / 2).circle(bore_diameter).extrude(thickness)
-    # Generate the patterned gear with teeth
-    gear_with_teeth = pattern_teeth(tooth_profile, teeth_number, A_circle)
-    gear55 = main_body.cut(gear_with_teeth)
-    show_object(gear55)
+    # Tooth gaps are cut from one pitch sector in 2D and patterned, then extruded once
+    gear55 = build_gear(module, teeth_number, thickness, bore_diameter, clearance, backlash,
+                        pressure_angle=pressure_angle, profile=profile)
+    show_model(gear55)
     # Export the result to a STEP file
     file_path = workdir / "gear.stl"
-    exporters.export(gear55, str(file_path))
+    file_path = export_model(gear55, file_path)
     return f"Gear model created and saved as {file_path}"
 
 
@@ -685,28 +652,13 @@ def create_gear(
 def create_cycloidal_gear(r1: Annotated[float, "Radius of the larger circle"],
                            r2: Annotated[float, "Radius of the smaller circle"],
                            thickness: Annotated[float, "Thickness of the gear"]) -> str:
-    def hypocycloid(t, r1, r2):
-        return (
-            (r1 - r2) * cos(t) + r2 * cos(r1 / r2 * t - t),
-            (r1 - r2) * sin(t) + r2 * sin(-(r1 / r2 * t - t)),
-        )
-    def epicycloid(t, r1, r2):
-        return (
-            (r1 + r2) * cos(t) - r2 * cos(r1 / r2 * t + t),
-            (r1 + r2) * sin(t) - r2 * sin(r1 / r2 * t + t),
-        )
-    def gear(t):
-        if (-1) ** (1 + floor(t / 2 / pi * (r1 / r2))) < 0:
-            return epicycloid(t, r1, r2)
-        else:
-            return hypocycloid(t, r1, r2)
-    # Create the gear profile and extrude it
+    # Profile points are computed with NumPy in one call and fitted as one B-spline
     result = (
-        cq.Workplane("XY").parametricCurve(lambda t: gear(t * 2 * pi)).twistExtrude(thickness, 90).faces(">Z").workplane().circle(r2)  # Create bore hole
+        cq.Workplane("XY").add(cycloidal_wire(r1, r2)).toPending().twistExtrude(thickness, 90).faces(">Z").workplane().circle(r2)  # Create bore hole
         .cutThruAll()
     )
-    show_object(result)
+    show_model(result)
     # Export the result to an STL file
     file_path = workdir / "cycloidal_gear.stl"
-    cq.exporters.export(result, str(file_path))
+    file_path = export_model(result, file_path)
     return f"Cycloidal gear model created and saved as {file_path}"
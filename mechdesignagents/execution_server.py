@@ -0,0 +1,428 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+# Imported once by the fork server, every worker forked from it starts with them loaded
+PRELOAD = ["cadquery", "OCP", "numpy", "ocp_vscode"]
+SCRIPT_NAME = "script.py"
+STDOUT_NAME = "stdout.txt"
+STDERR_NAME = "stderr.txt"
+RESULT_NAME = "result.json"
+TIMEOUT_EXIT_CODE = 124
+DEFAULT_SOCKET = os.path.join("/tmp", f"mechdesignagents-exec-{os.getuid() if hasattr(os, 'getuid') else 0}.sock")
+
+
+def _context():
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _warm_up():
+    # Loads the OCCT libraries used by booleans, fillets and meshing before a job arrives
+    try:
+        import cadquery as cq
+        cq.Workplane("XY").box(1, 1, 1).edges().fillet(0.1).val().tessellate(0.1)
+    except Exception:
+        pass
+
+
+def _limit_memory(limit_mb):
+    """Cap the address space at the current size plus limit_mb."""
+    try:
+        import resource
+    except ImportError:
+        return
+    with open("/proc/self/statm") as f:
+        current = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    limit = current + limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _redirect_output(job_dir: Path):
+    # Redirect the file descriptors, not just sys.stdout, so OCCT messages are captured too
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for fd, name in ((1, STDOUT_NAME), (2, STDERR_NAME)):
+        target = os.open(job_dir / name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.dup2(target, fd)
+        os.close(target)
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+
+
+def _geometry_summary(job_dir: Path) -> str:
+    """Geometry report of the first STEP or BREP file the job wrote, see geometry_report."""
+    models = sorted(p for p in job_dir.iterdir() if p.suffix.lower() in (".step", ".stp", ".brep"))
+    if not models:
+        return None
+    try:
+        from geometry_report import analyze_shape, format_geometry_report, load_model
+        meshes = sorted(job_dir.glob("*.stl"))
+        return format_geometry_report(analyze_shape(load_model(models[0]), meshes[0] if meshes else None))
+    except Exception as e:
+        return f"Geometry report unavailable: {type(e).__name__}: {e}"
+
+
+def _run_job(job: dict) -> dict:
+    job_dir = Path(job["job_dir"])
+    script = job_dir / job["script_name"]
+    script.write_text(job["code"])
+    os.chdir(job_dir)
+    _redirect_output(job_dir)
+    if job["memory_limit_mb"]:
+        _limit_memory(job["memory_limit_mb"])
+    exit_code = 0
+    incremental = None
+    namespace = {"__name__": "__main__", "__file__": str(script)}
+    try:
+        if job["checkpoint_dir"]:
+            from checkpoint_exec import CheckpointStore, run_incremental
+            incremental = run_incremental(job["code"], CheckpointStore(job["checkpoint_dir"]), str(script), namespace)
+        else:
+            exec(compile(job["code"], str(script), "exec"), namespace)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    geometry = _geometry_summary(job_dir) if job["analyze"] and exit_code == 0 else None
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return {"exit_code": exit_code, "geometry": geometry, "incremental": incremental}
+
+
+def _worker_main(conn):
+    """Idle pre-forked worker: warm up, wait for exactly one job, run it and exit."""
+    _warm_up()
+    try:
+        job = conn.recv()
+    except EOFError:
+        return
+    if job is None:
+        return
+    conn.send(_run_job(job))
+    conn.close()
+
+
+def _script_name(code: str) -> str:
+    # Honour the "# filename: box.py" line the CAD coder is asked to write
+    match = re.search(r"^#\s*filename:\s*([\w.-]+\.py)\s*$", code, re.MULTILINE)
+    return match.group(1) if match else SCRIPT_NAME
+
+
+class CadExecutionServer:
+    """
+    Run generated CadQuery scripts in warm, pre-forked worker processes.
+
+    Workers are forked from a fork server that has CadQuery and OCP imported, and
+    each one warms up OCCT while idle. A worker runs a single job in its own
+    directory and exits, so jobs never share state; a replacement is forked as
+    soon as a worker is taken.
+
+    Args:
+        work_dir (str): Jobs run in <work_dir>/jobs/<job id>, the files they write
+            are published to the session's artifact store directory <work_dir>/<session id>/.
+        workers (int): Idle workers kept ready.
+        timeout (float): Default seconds per job before the worker is killed.
+        memory_limit_mb (int): Extra address space a job may allocate, None for no limit.
+    """
+
+    def __init__(self, work_dir="NewCADs", workers=2, timeout=60.0, memory_limit_mb=4096):
+        self.work_dir = Path(work_dir)
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._ctx = None
+        self.jobs = 0
+        self.timeouts = 0
+
+    def start(self):
+        with self._lock:
+            if self._ctx is not None:
+                return
+            self._ctx = _context()
+            if self._ctx.get_start_method() == "forkserver":
+                self._ctx.set_forkserver_preload(PRELOAD)
+            for _ in range(self.workers):
+                self._spawn()
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        self._idle.put((process, parent_conn))
+
+    def run(self, code: str, timeout=None, analyze=True, job_id=None, session_id=None, incremental=True) -> dict:
+        """
+        Execute a script in a fresh warm worker.
+
+        Args:
+            code (str): Python source.
+            timeout (float): Seconds before the worker is killed, the server default if None.
+            analyze (bool): Add the geometry report of the first STEP/BREP file written.
+            job_id (str): Name of the job directory, random by default.
+            session_id (str): Session the files are published to, the job id if None.
+            incremental (bool): With a session_id, run against the checkpoints of the
+                session (see checkpoint_exec) instead of always running the whole script.
+
+        Returns:
+            dict: exit_code, stdout, stderr, artifacts (paths in the session directory), geometry,
+            incremental (statements skipped and run), seconds, timed_out and job_dir.
+        """
+        from artifact_store import ArtifactStore
+
+        self.start()
+        timeout = timeout or self.timeout
+        job_id = job_id or uuid.uuid4().hex[:12]
+        job_dir = (self.work_dir / "jobs" / job_id).resolve()
+        job_dir.mkdir(parents=True, exist_ok=True)
+        script_name = _script_name(code)
+        checkpoint_dir = None
+        if session_id and incremental:
+            checkpoint_dir = str((self.work_dir / "checkpoints" / session_id).resolve())
+        process, conn = self._idle.get()
+        # Replace the worker right away so the next job also finds a warm one
+        self._spawn()
+        start = time.perf_counter()
+        status = None
+        timed_out = False
+        try:
+            conn.send({"code": code, "job_dir": str(job_dir), "script_name": script_name,
+                       "memory_limit_mb": self.memory_limit_mb, "analyze": analyze,
+                       "checkpoint_dir": checkpoint_dir})
+            if conn.poll(timeout):
+                status = conn.recv()
+            else:
+                timed_out = True
+        except (EOFError, OSError):
+            # The worker died, e.g. killed for exceeding its memory limit
+            pass
+        finally:
+            conn.close()
+            if process.is_alive():
+                process.kill()
+            process.join()
+        seconds = time.perf_counter() - start
+        self.jobs += 1
+        if timed_out:
+            self.timeouts += 1
+            exit_code = TIMEOUT_EXIT_CODE
+        elif status is not None:
+            exit_code = status["exit_code"]
+        else:
+            exit_code = process.exitcode if process.exitcode else 1
+
+        def read(name):
+            path = job_dir / name
+            return path.read_text(errors="replace") if path.exists() else ""
+
+        # Scripts save with relative names. Like template exports they get a content-hashed
+        # name in the session directory, so sessions writing the same name never collide.
+        store = ArtifactStore(self.work_dir.resolve())
+        artifacts = sorted(str(store.add_file(p, p.name, session_id=session_id or job_id)) for p in job_dir.iterdir()
+                           if p.is_file() and p.name not in (script_name, STDOUT_NAME, STDERR_NAME, RESULT_NAME))
+        # Outcome of the job, replayed by code_lint to measure what the lint would have caught
+        with open(job_dir / RESULT_NAME, "w") as f:
+            json.dump({"script": script_name, "exit_code": exit_code, "seconds": seconds, "timed_out": timed_out}, f)
+        return {"exit_code": exit_code, "stdout": read(STDOUT_NAME), "stderr": read(STDERR_NAME),
+                "artifacts": artifacts, "geometry": status["geometry"] if status else None,
+                "incremental": status["incremental"] if status else None,
+                "seconds": seconds, "timed_out": timed_out, "job_dir": str(job_dir)}
+
+    def close(self):
+        while True:
+            try:
+                process, conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+            process.join(1.0)
+            if process.is_alive():
+                process.kill()
+
+    def stats(self) -> dict:
+        return {"jobs": self.jobs, "timeouts": self.timeouts}
+
+
+def _authkey() -> bytes:
+    return os.environ.get("CAD_EXEC_AUTHKEY", "mechdesignagents").encode("utf-8")
+
+
+class ExecutionClient:
+    """Send jobs to a server started with `python execution_server.py` (from mechdesignagents/)."""
+
+    def __init__(self, address=DEFAULT_SOCKET, authkey=None):
+        self.address = address
+        self.authkey = authkey or _authkey()
+
+    def run(self, code: str, timeout=None, analyze=True, job_id=None, session_id=None, incremental=True) -> dict:
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send({"code": code, "timeout": timeout, "analyze": analyze, "job_id": job_id,
+                       "session_id": session_id, "incremental": incremental})
+            return conn.recv()
+
+
+def _handle(server, conn):
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            try:
+                conn.send(server.run(**request))
+            except Exception as e:
+                conn.send({"exit_code": 1, "stdout": "", "stderr": f"Execution server error: {e}", "artifacts": [],
+                           "geometry": None, "incremental": None, "seconds": 0.0, "timed_out": False,
+                           "job_dir": None})
+
+
+def serve(server: CadExecutionServer, address=DEFAULT_SOCKET, authkey=None):
+    """Accept jobs from ExecutionClient over a local socket until interrupted."""
+    if os.path.exists(address):
+        os.unlink(address)
+    server.start()
+    previous = os.umask(0o077)
+    try:
+        listener = Listener(address, authkey=authkey or _authkey())
+    finally:
+        os.umask(previous)
+    with listener:
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle, args=(server, conn), daemon=True).start()
+
+
+def format_job_result(result: dict) -> str:
+    """Job output as the Executor reports it to the other agents."""
+    lines = []
+    if result["stdout"].strip():
+        lines.append(result["stdout"].rstrip())
+    if result["stderr"].strip():
+        lines.append(result["stderr"].rstrip())
+    if result["timed_out"]:
+        lines.append(f"Timed out after {result['seconds']:.0f} s, the script was stopped.")
+    if result["artifacts"]:
+        lines.append("Files written: " + ", ".join(result["artifacts"]))
+    if result["geometry"]:
+        lines.append(result["geometry"])
+    if result.get("incremental"):
+        from checkpoint_exec import format_incremental_report
+        lines.append(format_incremental_report(result["incremental"]))
+    return "\n".join(lines)
+
+
+class CadQueryCodeExecutor:
+    """
+    AutoGen code executor (autogen.coding.CodeExecutor) that runs python code
+    blocks on a CadExecutionServer instead of starting a new interpreter per block.
+
+    Uses the server listening on CAD_EXEC_SOCKET if that is set, otherwise an
+    in-process server started on the first execution. Code failing the static
+    checks of code_lint is sent back with the diagnostics without being run.
+
+    Args:
+        backend: CadExecutionServer or ExecutionClient, chosen as above if None.
+        timeout (float): Seconds per code block.
+        work_dir (str): Work directory of the in-process server.
+        lint (bool): Check code blocks with code_lint before running them.
+        incremental (bool): Resume scripts from checkpoints of the unchanged statement
+            prefix (see checkpoint_exec), so repair rounds only re-run what changed.
+    """
+
+    def __init__(self, backend=None, timeout=60.0, work_dir="NewCADs", lint=True, incremental=True):
+        if backend is None:
+            address = os.environ.get("CAD_EXEC_SOCKET")
+            backend = ExecutionClient(address) if address else get_execution_server(work_dir)
+        self.backend = backend
+        self.timeout = timeout
+        self.lint = lint
+        self.lint_rejections = 0
+        self.incremental = incremental
+
+    @property
+    def code_extractor(self):
+        from autogen.coding import MarkdownCodeExtractor
+        return MarkdownCodeExtractor()
+
+    def execute_code_blocks(self, code_blocks):
+        from autogen.coding import CodeResult
+        from artifact_store import current_session_id
+        from code_lint import PYTHON_LANGUAGES, format_diagnostics, has_errors, lint_code_blocks
+
+        if self.lint:
+            diagnostics = lint_code_blocks([(block.language, block.code) for block in code_blocks])
+            if has_errors(diagnostics):
+                self.lint_rejections += 1
+                return CodeResult(exit_code=1, output="Static check failed, the code was not run. CadQuery Code "
+                                  "Writer, fix these issues and send the complete script again:\n"
+                                  + format_diagnostics(diagnostics))
+        outputs = []
+        exit_code = 0
+        for block in code_blocks:
+            if block.language.lower() not in PYTHON_LANGUAGES:
+                outputs.append(f"Unsupported language {block.language!r}, only python code blocks are executed.")
+                exit_code = 1
+                break
+            result = self.backend.run(block.code, timeout=self.timeout, session_id=current_session_id(),
+                                      incremental=self.incremental)
+            outputs.append(format_job_result(result))
+            exit_code = result["exit_code"]
+            if exit_code != 0:
+                break
+        return CodeResult(exit_code=exit_code, output="\n".join(outputs))
+
+    def restart(self):
+        # Every job already runs in a fresh worker
+        pass
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def get_execution_server(work_dir="NewCADs") -> CadExecutionServer:
+    """Shared in-process server per work directory, workers are forked on first use."""
+    with _servers_lock:
+        if work_dir not in _servers:
+            _servers[work_dir] = CadExecutionServer(work_dir)
+        return _servers[work_dir]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve warm CadQuery workers for the Executor agent.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path, clients use CAD_EXEC_SOCKET")
+    parser.add_argument("--work-dir", default="NewCADs")
+    parser.add_argument("--workers", type=int, default=2, help="Idle workers kept ready")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--memory-limit-mb", type=int, default=4096)
+    args = parser.parse_args()
+    server = CadExecutionServer(args.work_dir, args.workers, args.timeout, args.memory_limit_mb)
+    print(f"Serving CadQuery workers on {args.socket}")
+    try:
+        serve(server, args.socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
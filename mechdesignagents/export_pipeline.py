@@ -0,0 +1,338 @@
+import contextvars
+import functools
+import json
+import os
+import struct
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import cadquery as cq
+from cadquery import exporters
+from OCP.BRep import BRep_Tool
+from OCP.BRepMesh import BRepMesh_IncrementalMesh
+from OCP.BRepTools import BRepTools
+from OCP.TopAbs import TopAbs_Orientation
+from OCP.TopLoc import TopLoc_Location
+
+from artifact_store import get_artifact_store
+from cad_cache import to_shape
+
+# Mesh export reports of the template currently running, see report_mesh_exports()
+_mesh_reports = contextvars.ContextVar("mesh_export_reports", default=None)
+
+# Linear (mm) and angular (rad) deflection
+TOLERANCE_PRESETS = {
+    "draft": {"tolerance": 0.5, "angular_tolerance": 0.5},
+    "production": {"tolerance": 0.05, "angular_tolerance": 0.1},
+}
+# Adaptive policy: deflection as a fraction of the bounding box diagonal
+ADAPTIVE_RELATIVE_TOLERANCE = 1e-3
+ADAPTIVE_TOLERANCE_LIMITS = (1e-4, 2.0)
+ADAPTIVE_ANGULAR_TOLERANCE = 0.2
+MAX_ANGULAR_TOLERANCE = 0.8
+MESH_FORMATS = ("stl", "glb", "3mf")
+BREP_FORMATS = ("step", "brep", "dxf")
+
+
+def tessellate(shape: cq.Shape, tolerance: float, angular_tolerance: float):
+    """
+    Mesh a shape once and return the triangulation as arrays.
+
+    Returns:
+        tuple: (vertices float32 (N, 3), triangles uint32 (M, 3))
+    """
+    # Drop any earlier triangulation, OCCT would otherwise keep a finer one
+    BRepTools.Clean_s(shape.wrapped)
+    BRepMesh_IncrementalMesh(shape.wrapped, tolerance, False, angular_tolerance, True)
+    vertices = []
+    triangles = []
+    offset = 0
+    for face in shape.Faces():
+        location = TopLoc_Location()
+        poly = BRep_Tool.Triangulation_s(face.wrapped, location)
+        if poly is None:
+            continue
+        transform = location.Transformation()
+        nodes = [poly.Node(i).Transformed(transform) for i in range(1, poly.NbNodes() + 1)]
+        vertices.append(np.array([(p.X(), p.Y(), p.Z()) for p in nodes], dtype=np.float32))
+        tris = np.array([t.Get() for t in poly.Triangles()], dtype=np.int64) - 1 + offset
+        if face.wrapped.Orientation() == TopAbs_Orientation.TopAbs_REVERSED:
+            tris = tris[:, [0, 2, 1]]
+        triangles.append(tris)
+        offset += poly.NbNodes()
+    if not vertices:
+        return np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint32)
+    return np.concatenate(vertices), np.concatenate(triangles).astype(np.uint32)
+
+
+def write_stl(path, vertices, triangles):
+    """Binary STL, normals computed for all triangles at once."""
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    records = np.zeros(len(triangles), dtype=[("normal", "<f4", 3), ("corners", "<f4", (3, 3)), ("attr", "<u2")])
+    records["normal"] = normals
+    records["corners"] = corners
+    with open(path, "wb") as f:
+        f.write(b"\0" * 80)
+        f.write(struct.pack("<I", len(triangles)))
+        f.write(records.tobytes())
+
+
+def write_glb(path, vertices, triangles):
+    """Binary glTF 2.0 with one indexed triangle mesh, in metres as glTF expects."""
+    positions = (vertices / 1000.0).astype("<f4")
+    indices = triangles.astype("<u4").ravel()
+    index_bytes = indices.tobytes()
+    position_bytes = positions.tobytes()
+    padding = (4 - len(index_bytes) % 4) % 4
+    binary = index_bytes + b"\0" * padding + position_bytes
+    binary += b"\0" * ((4 - len(binary) % 4) % 4)
+    gltf = {
+        "asset": {"version": "2.0", "generator": "mechdesignagents"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 1}, "indices": 0}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(index_bytes), "target": 34963},
+            {"buffer": 0, "byteOffset": len(index_bytes) + padding, "byteLength": len(position_bytes),
+             "target": 34962},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5125, "count": int(indices.size), "type": "SCALAR"},
+            {"bufferView": 1, "componentType": 5126, "count": int(len(positions)), "type": "VEC3",
+             "min": positions.min(axis=0).tolist() if len(positions) else [0, 0, 0],
+             "max": positions.max(axis=0).tolist() if len(positions) else [0, 0, 0]},
+        ],
+    }
+    header = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    header += b" " * ((4 - len(header) % 4) % 4)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<III", 0x46546C67, 2, 12 + 8 + len(header) + 8 + len(binary)))
+        f.write(struct.pack("<II", len(header), 0x4E4F534A))
+        f.write(header)
+        f.write(struct.pack("<II", len(binary), 0x004E4942))
+        f.write(binary)
+
+
+def write_3mf(path, vertices, triangles):
+    """3MF package with one mesh object, in millimetres."""
+    vertex_xml = "".join(f'<vertex x="{x:.6g}" y="{y:.6g}" z="{z:.6g}"/>' for x, y, z in vertices.tolist())
+    triangle_xml = "".join(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>' for a, b, c in triangles.tolist())
+    model = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<model unit="millimeter" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+        f'<resources><object id="1" type="model"><mesh><vertices>{vertex_xml}</vertices>'
+        f'<triangles>{triangle_xml}</triangles></mesh></object></resources>'
+        '<build><item objectid="1"/></build></model>'
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+        '</Types>'
+    )
+    relationships = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+        'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+        '</Relationships>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", content_types)
+        package.writestr("_rels/.rels", relationships)
+        package.writestr("3D/3dmodel.model", model)
+
+
+def adaptive_tolerance(shape: cq.Shape, relative: float = ADAPTIVE_RELATIVE_TOLERANCE) -> dict:
+    """
+    Deflection scaled to the part: a fixed fraction of the bounding box diagonal.
+
+    A 2 mm sphere and a 500 mm box then get the same relative mesh quality
+    instead of the same absolute deflection.
+    """
+    diagonal = shape.BoundingBox().DiagonalLength
+    low, high = ADAPTIVE_TOLERANCE_LIMITS
+    return {"tolerance": min(high, max(low, diagonal * relative)),
+            "angular_tolerance": ADAPTIVE_ANGULAR_TOLERANCE}
+
+
+def tessellate_within_budget(shape: cq.Shape, settings: dict, triangle_budget=None, max_passes: int = 4):
+    """
+    Tessellate, coarsening the deflection until the mesh fits the triangle budget.
+
+    Triangle count grows roughly with 1 / tolerance on curved faces, so each pass
+    scales the tolerance by the overshoot, up to the ADAPTIVE_TOLERANCE_LIMITS
+    maximum. A mesh that still does not fit at that tolerance is returned as is.
+
+    Returns:
+        tuple: (vertices, triangles, settings the returned mesh was made with)
+    """
+    max_tolerance = ADAPTIVE_TOLERANCE_LIMITS[1]
+    settings = dict(settings)
+    vertices, triangles = tessellate(shape, settings["tolerance"], settings["angular_tolerance"])
+    for _ in range(max_passes - 1):
+        if triangle_budget is None or len(triangles) <= triangle_budget or settings["tolerance"] >= max_tolerance:
+            break
+        overshoot = len(triangles) / triangle_budget
+        settings = {**settings,
+                    "tolerance": min(max_tolerance, settings["tolerance"] * overshoot),
+                    "angular_tolerance": min(MAX_ANGULAR_TOLERANCE, settings["angular_tolerance"] * overshoot ** 0.5)}
+        vertices, triangles = tessellate(shape, settings["tolerance"], settings["angular_tolerance"])
+    return vertices, triangles, settings
+
+
+MESH_WRITERS = {"stl": write_stl, "glb": write_glb, "3mf": write_3mf}
+
+
+def default_section(shape: cq.Shape):
+    """Planar section through the middle of the bounding box, used for DXF output."""
+    bbox = shape.BoundingBox()
+    return cq.Workplane("XY").add(shape).section((bbox.zmin + bbox.zmax) / 2)
+
+
+def _timed(write, path):
+    start = time.perf_counter()
+    write(path)
+    return time.perf_counter() - start
+
+
+def export_formats(model, file_path, formats=("stl", "step", "dxf"), preset="production",
+                   dxf_model=None, max_workers=None, store=None, triangle_budget=None):
+    """
+    Write one model in several formats.
+
+    STL, GLB and 3MF share a single tessellation. Meshing changes the shape's
+    triangulation and OCCT is not thread safe on a shared shape, so the mesh is
+    computed first and the STEP, BREP and DXF writers then run one after another,
+    alongside the mesh file writers (numpy only) in a thread pool. Files go
+    through the artifact store like every other template output.
+
+    Args:
+        model: Workplane or Shape to export.
+        file_path: Base output name, e.g. NewCADs/pillow_block.stl; the suffix is replaced per format.
+        formats (tuple): Any of stl, glb, 3mf, step, brep, dxf.
+        preset (str or dict): "draft", "production", "adaptive" (scaled to the bounding box)
+            or {"tolerance": ..., "angular_tolerance": ...}.
+        dxf_model: What to write to DXF, a section through the middle of the model by default.
+        max_workers (int): Threads writing the mesh files.
+        store: ArtifactStore, the default one if not given.
+        triangle_budget (int): Target triangle count, the mesh is coarsened until it fits (a few passes at most).
+
+    Returns:
+        dict: Per format the stored "path", "seconds" and "bytes", plus the tessellation
+        time, triangle count and tolerances used.
+    """
+    formats = [fmt.lower().lstrip(".") for fmt in formats]
+    unknown = set(formats) - set(MESH_FORMATS) - set(BREP_FORMATS)
+    if unknown:
+        raise ValueError(f"Unsupported export formats {sorted(unknown)}")
+    store = store or get_artifact_store()
+    shape = to_shape(model)
+    if preset == "adaptive":
+        settings = adaptive_tolerance(shape)
+    else:
+        settings = TOLERANCE_PRESETS[preset] if isinstance(preset, str) else preset
+    base = Path(file_path)
+
+    brep_writers = {
+        "step": lambda path: exporters.export(shape, str(path), exportType="STEP"),
+        "brep": lambda path: shape.exportBrep(str(path)),
+        "dxf": lambda path: exporters.export(dxf_model if dxf_model is not None else default_section(shape),
+                                             str(path), exportType="DXF"),
+    }
+
+    def run(fmt, write):
+        temp = store.temp_path(f".{fmt}")
+        try:
+            seconds = _timed(write, temp)
+            size = os.path.getsize(temp)
+            path = store.add_file(temp, base.with_suffix(f".{fmt}").name, move=True)
+            return {"path": path, "seconds": seconds, "bytes": size}
+        finally:
+            if temp.exists():
+                temp.unlink()
+
+    report = {"formats": {}, **settings}
+    mesh_formats = [fmt for fmt in formats if fmt in MESH_FORMATS]
+    if mesh_formats:
+        start = time.perf_counter()
+        vertices, triangles, used = tessellate_within_budget(shape, settings, triangle_budget)
+        report.update(used)
+        report["tessellation_seconds"] = time.perf_counter() - start
+        report["triangles"] = int(len(triangles))
+    with ThreadPoolExecutor(max_workers=max_workers or min(4, len(mesh_formats)) or 1) as pool:
+        futures = {fmt: pool.submit(run, fmt, lambda path, write=MESH_WRITERS[fmt]: write(path, vertices, triangles))
+                   for fmt in mesh_formats}
+        for fmt in formats:
+            if fmt in BREP_FORMATS:
+                report["formats"][fmt] = run(fmt, brep_writers[fmt])
+        for fmt in mesh_formats:
+            report["formats"][fmt] = futures[fmt].result()
+    # Keep the order the formats were asked for
+    report["formats"] = {fmt: report["formats"][fmt] for fmt in formats}
+    return report
+
+
+def format_report(report) -> str:
+    """One line per written file for tool results and logs."""
+    lines = []
+    for fmt, info in report["formats"].items():
+        lines.append(f"{fmt.upper()}: {info['path']} ({info['bytes'] / 1024:.1f} KiB, {info['seconds'] * 1000:.0f} ms)")
+    if "triangles" in report:
+        lines.append(f"Mesh: {report['triangles']} triangles, tessellated in "
+                     f"{report['tessellation_seconds'] * 1000:.0f} ms at tolerance {report['tolerance']:.3g} mm")
+    return "\n".join(lines)
+
+
+def default_triangle_budget():
+    """Triangle budget for template STL exports from CAD_TRIANGLE_BUDGET, None for no limit."""
+    budget = os.environ.get("CAD_TRIANGLE_BUDGET")
+    return int(budget) if budget else None
+
+
+def export_policy() -> dict:
+    """Settings that decide what the template exports write, part of the geometry cache key."""
+    return {"triangle_budget": default_triangle_budget(), "presets": TOLERANCE_PRESETS,
+            "adaptive": [ADAPTIVE_RELATIVE_TOLERANCE, *ADAPTIVE_TOLERANCE_LIMITS, ADAPTIVE_ANGULAR_TOLERANCE,
+                         MAX_ANGULAR_TOLERANCE]}
+
+
+def record_mesh_report(report):
+    """Attach an export report to the template result being collected, if any."""
+    reports = _mesh_reports.get()
+    if reports is not None:
+        reports.append(report)
+
+
+def mesh_summary(report) -> str:
+    lines = []
+    for fmt, info in report["formats"].items():
+        if fmt in MESH_FORMATS:
+            lines.append(f"{fmt.upper()} mesh: {report['triangles']} triangles, {info['bytes'] / 1024:.1f} KiB "
+                         f"(tolerance {report['tolerance']:.3g} mm)")
+    return "\n".join(lines)
+
+
+def report_mesh_exports(func):
+    """Append triangle count and file size of the template's mesh exports to its result string."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        reports = []
+        token = _mesh_reports.set(reports)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _mesh_reports.reset(token)
+        summary = "\n".join(filter(None, (mesh_summary(report) for report in reports)))
+        return f"{result}\n{summary}" if summary and isinstance(result, str) else result
+
+    return wrapper
@@ -0,0 +1,91 @@
+import argparse
+import json
+import time
+
+import cadquery as cq
+
+from gear_engine import build_gear, gear_geometry
+
+
+def sequential_gear(module, teeth_number, thickness, bore_diameter, clearance, backlash):
+    """The original create_gear build: one extruded gap per tooth, unioned one at a time."""
+    geometry = gear_geometry(module, teeth_number, clearance, backlash)
+    half = (
+        cq.Workplane("XY").moveTo(0, geometry["root_diameter"] / 2).lineTo(0, geometry["addendum_diameter"] / 2)
+        .radiusArc(geometry["tip_point"], -geometry["addendum_diameter"] / 2)
+        .radiusArc(geometry["root_point"], geometry["flank_radius"])
+        .radiusArc((0, geometry["root_diameter"] / 2), geometry["root_diameter"] / 2).close().extrude(thickness)
+    )
+    gap = half.union(half.mirror(mirrorPlane="YZ", basePointVector=(0, 0, 0)))
+    gear = cq.Workplane("XY")
+    rotation_angle = 360 / teeth_number
+    for i in range(teeth_number):
+        gear = gear.union(gap.rotate((0, 0, 1), (0, 0, 0), rotation_angle * i))
+    main_body = (
+        cq.Workplane("XY").circle(geometry["addendum_diameter"] / 2).circle(bore_diameter).extrude(thickness)
+    )
+    return main_body.cut(gear)
+
+
+def measure(build, **params):
+    start = time.perf_counter()
+    model = build(**params)
+    seconds = time.perf_counter() - start
+    shapes = model.vals()
+    return {
+        "seconds": seconds,
+        "volume": sum(shape.Volume() for shape in shapes),
+        "solids": sum(len(shape.Solids()) for shape in shapes),
+        "valid": all(shape.isValid() for shape in shapes),
+    }
+
+
+def run_benchmark(teeth_counts, module=2.0, thickness=10.0, bore_diameter=5.0, clearance=0.1, backlash=0.05,
+                  sequential_limit=90):
+    """
+    Time the sequential and the patterned gear build for several tooth counts.
+
+    Args:
+        teeth_counts (list): Tooth counts to build.
+        sequential_limit (int): Largest tooth count built the sequential way, it grows much faster.
+
+    Returns:
+        list: One row per tooth count with both timings and the volume difference.
+    """
+    rows = []
+    for teeth_number in teeth_counts:
+        params = dict(module=module, teeth_number=teeth_number, thickness=thickness,
+                      bore_diameter=bore_diameter, clearance=clearance, backlash=backlash)
+        row = {"teeth": teeth_number, "patterned": measure(build_gear, **params)}
+        if teeth_number <= sequential_limit:
+            row["sequential"] = measure(sequential_gear, **params)
+            row["speedup"] = row["sequential"]["seconds"] / row["patterned"]["seconds"]
+            row["volume_difference"] = abs(row["sequential"]["volume"] - row["patterned"]["volume"])
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gear build time versus tooth count.")
+    parser.add_argument("--teeth", type=int, nargs="+", default=[20, 40, 60, 90, 120])
+    parser.add_argument("--sequential-limit", type=int, default=90)
+    parser.add_argument("--output", default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    rows = run_benchmark(args.teeth, sequential_limit=args.sequential_limit)
+    print(f"{'teeth':>6}{'sequential s':>14}{'patterned s':>13}{'speedup':>9}{'volume diff':>13}{'valid':>7}")
+    for row in rows:
+        sequential = row.get("sequential")
+        print(f"{row['teeth']:>6}"
+              f"{sequential['seconds'] if sequential else float('nan'):>14.2f}"
+              f"{row['patterned']['seconds']:>13.2f}"
+              f"{row.get('speedup', float('nan')):>9.1f}"
+              f"{row.get('volume_difference', float('nan')):>13.2e}"
+              f"{str(row['patterned']['valid']):>7}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+from math import asin, ceil, cos, degrees, pi, radians, sin, sqrt
+
+import cadquery as cq
+
+from gear_profiles import involute_gear_wire
+
+
+def circle_intersections(circle1_center, circle1_radius, circle2_center, circle2_radius):
+    """Intersection points of two circles, empty if they do not intersect."""
+    x1, y1 = circle1_center
+    x2, y2 = circle2_center
+    r1 = circle1_radius
+    r2 = circle2_radius
+    d = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+    if d > r1 + r2 or d < abs(r1 - r2):
+        return []
+    if d == 0 and r1 == r2:
+        return []
+
+    a = (r1 ** 2 - r2 ** 2 + d ** 2) / (2 * d)
+    h = sqrt(r1 ** 2 - a ** 2)
+
+    x3 = x1 + a * (x2 - x1) / d
+    y3 = y1 + a * (y2 - y1) / d
+
+    intersection1 = (x3 + h * (y2 - y1) / d, y3 - h * (x2 - x1) / d)
+    intersection2 = (x3 - h * (y2 - y1) / d, y3 + h * (x2 - x1) / d)
+
+    return [intersection1, intersection2]
+
+
+def gear_geometry(module: float, teeth_number: int, clearance: float, backlash: float) -> dict:
+    """Circles and flank arc points of the circle-arc gear approximation."""
+    # Calculations for different circles
+    P_circle = module * teeth_number
+    A_circle = P_circle + 2 * module
+    D_circle = P_circle - 2.5 * module
+    B_circle = D_circle + 2 * clearance
+    # Deep calculation for flank geometry
+    pitch = 1 / module
+    theta = radians(180 / teeth_number)
+    flank_radius = teeth_number / pitch / 5
+    # Flank center
+    theta3 = (pi) * theta + radians(90)
+    x3 = B_circle / 2 * cos(theta3)
+    y3 = B_circle / 2 * sin(theta3)
+    # Flank end points on the root and addendum circles
+    x4, y4 = circle_intersections((0, 0), D_circle / 2, (x3, y3), flank_radius)[0]
+    x5, y5 = circle_intersections((0, 0), A_circle / 2, (x3, y3), flank_radius)[0]
+    return {
+        "pitch_diameter": P_circle,
+        "addendum_diameter": A_circle,
+        "root_diameter": D_circle,
+        "flank_radius": flank_radius,
+        "root_point": (x4, y4),
+        "tip_point": (x5, y5),
+    }
+
+
+def tooth_gap_face(geometry: dict) -> cq.Shape:
+    """Planar face of one tooth gap, symmetric about the Y axis."""
+    A_circle = geometry["addendum_diameter"]
+    D_circle = geometry["root_diameter"]
+    half = (
+        cq.Workplane("XY").moveTo(0, D_circle / 2).lineTo(0, A_circle / 2)
+        .radiusArc(geometry["tip_point"], -A_circle / 2)
+        .radiusArc(geometry["root_point"], geometry["flank_radius"])
+        .radiusArc((0, D_circle / 2), D_circle / 2).close()
+        .wires().val()
+    )
+    face = cq.Face.makeFromWires(half)
+    return face.fuse(face.mirror("YZ")).clean()
+
+
+def sector_wedge(inner_radius: float, outer_radius: float, angle: float) -> cq.Face:
+    """Annular sector of `angle` degrees centred on the +Y axis."""
+    a = radians(angle / 2)
+    wire = (
+        cq.Workplane("XY").moveTo(-inner_radius * sin(a), inner_radius * cos(a))
+        .lineTo(-outer_radius * sin(a), outer_radius * cos(a))
+        .threePointArc((0, outer_radius), (outer_radius * sin(a), outer_radius * cos(a)))
+        .lineTo(inner_radius * sin(a), inner_radius * cos(a))
+        .threePointArc((0, inner_radius), (-inner_radius * sin(a), inner_radius * cos(a))).close()
+        .wires().val()
+    )
+    return cq.Face.makeFromWires(wire)
+
+
+def gear_profile(module: float, teeth_number: int, bore_diameter: float,
+                 clearance: float, backlash: float) -> cq.Shape:
+    """
+    2D profile of the whole gear: addendum disc minus every tooth gap and the bore.
+
+    Only one pitch sector is computed with booleans, cut by the few gaps that
+    reach into it. The sector is then placed around the gear with plain
+    rotations and the copies are glued along their shared edges in one pass.
+
+    Args:
+        module (float): Gear module (mm).
+        teeth_number (int): Number of teeth.
+        bore_diameter (float): Center hole size, used as a radius like the original template.
+        clearance (float): Clearance (mm).
+        backlash (float): Backlash (mm).
+
+    Returns:
+        cq.Shape: Planar face(s) of the profile in the XY plane.
+    """
+    geometry = gear_geometry(module, teeth_number, clearance, backlash)
+    gap = tooth_gap_face(geometry)
+    outer_radius = geometry["addendum_diameter"] / 2
+    step = 360 / teeth_number
+    if teeth_number < 3:
+        disc = cq.Face.makeFromWires(
+            cq.Wire.makeCircle(outer_radius, cq.Vector(0, 0, 0), cq.Vector(0, 0, 1)),
+            [cq.Wire.makeCircle(bore_diameter, cq.Vector(0, 0, 0), cq.Vector(0, 0, 1))],
+        )
+        gaps = [gap.rotate((0, 0, 0), (0, 0, 1), step * i) for i in range(teeth_number)]
+        return disc.cut(*gaps).clean()
+
+    # Gaps are wider than one pitch, find how many neighbours overlap the sector
+    bbox = gap.BoundingBox()
+    half_width = max(abs(bbox.xmin), abs(bbox.xmax))
+    reach = degrees(asin(min(1.0, half_width / (geometry["root_diameter"] / 2))))
+    neighbours = min(teeth_number, ceil((reach + step / 2) / step))
+    local_gaps = [gap.rotate((0, 0, 0), (0, 0, 1), step * i) for i in range(-neighbours, neighbours + 1)]
+    sector = sector_wedge(bore_diameter, outer_radius, step).cut(*local_gaps)
+
+    copies = [face.rotate((0, 0, 0), (0, 0, 1), step * i) for i in range(teeth_number) for face in sector.Faces()]
+    return copies[0].fuse(*copies[1:], glue=True).clean()
+
+
+def involute_profile(module: float, teeth_number: int, bore_diameter: float, pressure_angle: float,
+                     backlash: float, points: int = 16) -> cq.Face:
+    """2D involute gear profile, bore sized like the circle-arc profile."""
+    outline = involute_gear_wire(module, teeth_number, pressure_angle, backlash, points)
+    bore = cq.Wire.makeCircle(bore_diameter, cq.Vector(0, 0, 0), cq.Vector(0, 0, 1))
+    return cq.Face.makeFromWires(outline, [bore])
+
+
+def build_gear(module: float, teeth_number: int, thickness: float, bore_diameter: float,
+               clearance: float, backlash: float, pressure_angle: float = 20.0,
+               profile: str = "arc", points: int = 16) -> cq.Workplane:
+    """
+    Spur gear extruded once from its full 2D profile.
+
+    Args:
+        profile (str): "arc" for the circle-arc flank approximation, "involute" for true involute flanks.
+        points (int): Samples per involute flank.
+    """
+    if profile == "involute":
+        face = involute_profile(module, teeth_number, bore_diameter, pressure_angle, backlash, points)
+        return cq.Workplane("XY").newObject([cq.Solid.extrudeLinear(face, cq.Vector(0, 0, thickness))])
+    if profile != "arc":
+        raise ValueError(f"Unknown gear profile {profile!r}, expected 'arc' or 'involute'")
+    profile = gear_profile(module, teeth_number, bore_diameter, clearance, backlash)
+    solids = [cq.Solid.extrudeLinear(face, cq.Vector(0, 0, thickness)) for face in profile.Faces()]
+    return cq.Workplane("XY").newObject([solids[0] if len(solids) == 1 else cq.Compound.makeCompound(solids)])
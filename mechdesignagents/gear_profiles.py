@@ -0,0 +1,156 @@
+import numpy as np
+import cadquery as cq
+
+
+def hypocycloid_points(t, r1: float, r2: float) -> np.ndarray:
+    """(N, 2) points of the hypocycloid of a circle of radius r2 rolling inside r1."""
+    t = np.asarray(t, dtype=float)
+    k = r1 / r2 * t - t
+    return np.column_stack(((r1 - r2) * np.cos(t) + r2 * np.cos(k), (r1 - r2) * np.sin(t) - r2 * np.sin(k)))
+
+
+def epicycloid_points(t, r1: float, r2: float) -> np.ndarray:
+    """(N, 2) points of the epicycloid of a circle of radius r2 rolling outside r1."""
+    t = np.asarray(t, dtype=float)
+    k = r1 / r2 * t + t
+    return np.column_stack(((r1 + r2) * np.cos(t) - r2 * np.cos(k), (r1 + r2) * np.sin(t) - r2 * np.sin(k)))
+
+
+def cycloidal_points(r1: float, r2: float, points_per_lobe: int = 40) -> np.ndarray:
+    """
+    Closed cycloidal gear outline, alternating epicycloid and hypocycloid lobes.
+
+    Args:
+        r1 (float): Pitch radius.
+        r2 (float): Radius of the rolling circle, r1 / r2 lobes of each kind.
+        points_per_lobe (int): Samples per epicycloid or hypocycloid lobe.
+
+    Returns:
+        np.ndarray: (N, 2) array over one full turn, without repeating the first point.
+    """
+    lobes = 2 * max(1, int(np.ceil(r1 / r2)))
+    t = np.linspace(0.0, 2 * np.pi, lobes * points_per_lobe, endpoint=False)
+    # Same lobe selection as the original template: odd lobes are epicycloids
+    epicycloid = (-1.0) ** (1 + np.floor(t / 2 / np.pi * (r1 / r2))) < 0
+    return np.where(epicycloid[:, None], epicycloid_points(t, r1, r2), hypocycloid_points(t, r1, r2))
+
+
+def involute_function(angle):
+    return np.tan(angle) - angle
+
+
+def involute_flank_points(module: float, teeth_number: int, pressure_angle: float = 20.0,
+                          backlash: float = 0.0, points: int = 16) -> np.ndarray:
+    """
+    Polar samples of one involute flank, from the start of the involute to the tip.
+
+    The tooth is centred on angle 0, the returned angles are the half thickness of
+    the tooth at each radius (the other flank is the mirror image).
+
+    Args:
+        module (float): Gear module (mm).
+        teeth_number (int): Number of teeth.
+        pressure_angle (float): Pressure angle (degrees).
+        backlash (float): Backlash removed from the tooth thickness at the pitch circle (mm).
+        points (int): Samples per flank.
+
+    Returns:
+        np.ndarray: (points, 2) array of (radius, half angle).
+    """
+    alpha = np.radians(pressure_angle)
+    pitch_radius = module * teeth_number / 2
+    base_radius = pitch_radius * np.cos(alpha)
+    tip_radius = pitch_radius + module
+    root_radius = pitch_radius - 1.25 * module
+    start_radius = max(base_radius, root_radius)
+    # Half the tooth thickness at the pitch circle as an angle
+    half_pitch_angle = (np.pi * module / 2 - backlash) / (2 * pitch_radius)
+    # Sample evenly in the roll angle, which spaces points evenly along the flank
+    roll = np.linspace(np.sqrt((start_radius / base_radius) ** 2 - 1),
+                       np.sqrt((tip_radius / base_radius) ** 2 - 1), points)
+    radius = base_radius * np.sqrt(1 + roll ** 2)
+    half_angle = half_pitch_angle + involute_function(alpha) - involute_function(np.arccos(base_radius / radius))
+    if half_angle[-1] <= 0:
+        raise ValueError(f"Teeth become pointed below the tip circle with {teeth_number} teeth "
+                         f"and a {pressure_angle} degree pressure angle.")
+    return np.column_stack((radius, half_angle))
+
+
+def involute_tooth_points(module: float, teeth_number: int, pressure_angle: float = 20.0,
+                          backlash: float = 0.0, points: int = 16) -> np.ndarray:
+    """
+    Cartesian flank points of every tooth in one array.
+
+    Returns:
+        np.ndarray: (teeth_number, 2, points, 2) array, flank 0 runs root to tip on
+        the clockwise side of the tooth and flank 1 runs tip to root on the other.
+    """
+    flank = involute_flank_points(module, teeth_number, pressure_angle, backlash, points)
+    radius, half_angle = flank[:, 0], flank[:, 1]
+    centres = 2 * np.pi * np.arange(teeth_number) / teeth_number
+    # Broadcast (teeth, 1) against (points,) to get every flank of the gear at once
+    right = centres[:, None] - half_angle[None, :]
+    left = (centres[:, None] + half_angle[None, :])[:, ::-1]
+    angles = np.stack((right, left), axis=1)
+    radii = np.stack((radius, radius[::-1]))[None, :, :]
+    return np.stack((radii * np.cos(angles), radii * np.sin(angles)), axis=-1)
+
+
+def _vectors(points) -> list:
+    return [cq.Vector(float(x), float(y), 0.0) for x, y in points]
+
+
+def spline_wire(points: np.ndarray, periodic: bool = False) -> cq.Wire:
+    """Interpolate a single B-spline through a point array and return it as a wire."""
+    return cq.Wire.assembleEdges([cq.Edge.makeSpline(_vectors(points), periodic=periodic)])
+
+
+def cycloidal_wire(r1: float, r2: float, points_per_lobe: int = 40) -> cq.Wire:
+    """Cycloidal gear outline as one closed (periodic) B-spline wire."""
+    return spline_wire(cycloidal_points(r1, r2, points_per_lobe), periodic=True)
+
+
+def involute_gear_wire(module: float, teeth_number: int, pressure_angle: float = 20.0,
+                       backlash: float = 0.0, points: int = 16) -> cq.Wire:
+    """
+    Closed outline of an involute spur gear.
+
+    Each flank is one B-spline edge through its sampled points, joined by tip and
+    root arcs, plus a radial segment where the root circle lies inside the base circle.
+
+    Args:
+        module (float): Gear module (mm).
+        teeth_number (int): Number of teeth.
+        pressure_angle (float): Pressure angle (degrees).
+        backlash (float): Backlash (mm).
+        points (int): Samples per flank.
+
+    Returns:
+        cq.Wire: Outline in the XY plane.
+    """
+    teeth = involute_tooth_points(module, teeth_number, pressure_angle, backlash, points)
+    root_radius = module * teeth_number / 2 - 1.25 * module
+    edges = []
+    for i in range(teeth_number):
+        right, left = teeth[i]
+        next_right = teeth[(i + 1) % teeth_number][0]
+        right_start = _vectors(right[:1])[0]
+        if np.hypot(*right[0]) > root_radius + 1e-9:
+            root_point = right[0] * root_radius / np.hypot(*right[0])
+            edges.append(cq.Edge.makeLine(_vectors([root_point])[0], right_start))
+        edges.append(cq.Edge.makeSpline(_vectors(right)))
+        tip_mid = (right[-1] + left[0]) / 2
+        tip_mid *= np.hypot(*right[-1]) / np.hypot(*tip_mid)
+        edges.append(cq.Edge.makeThreePointArc(*_vectors((right[-1], tip_mid, left[0]))))
+        edges.append(cq.Edge.makeSpline(_vectors(left)))
+        left_end = left[-1]
+        next_start = next_right[0]
+        if np.hypot(*left_end) > root_radius + 1e-9:
+            left_root = left_end * root_radius / np.hypot(*left_end)
+            edges.append(cq.Edge.makeLine(*_vectors((left_end, left_root))))
+            left_end = left_root
+            next_start = next_start * root_radius / np.hypot(*next_start)
+        root_mid = (left_end + next_start) / 2
+        root_mid *= root_radius / np.hypot(*root_mid)
+        edges.append(cq.Edge.makeThreePointArc(*_vectors((left_end, root_mid, next_start))))
+    return cq.Wire.assembleEdges(edges)
@@ -0,0 +1,199 @@
+import argparse
+import functools
+import json
+import re
+import struct
+from pathlib import Path
+
+import numpy as np
+import cadquery as cq
+
+from artifact_store import get_artifact_store
+from cad_cache import record_export, recording_exports, to_shape
+
+MESH_SUFFIXES = (".stl",)
+
+
+def read_stl(path):
+    """
+    Read a binary or ASCII STL file.
+
+    Returns:
+        np.ndarray: float32 (M, 3, 3), the three corners of every triangle.
+    """
+    data = Path(path).read_bytes()
+    if len(data) >= 84:
+        count = struct.unpack("<I", data[80:84])[0]
+        if len(data) == 84 + 50 * count:
+            records = np.frombuffer(data, dtype=[("normal", "<f4", 3), ("corners", "<f4", (3, 3)), ("attr", "<u2")],
+                                    count=count, offset=84)
+            return records["corners"].copy()
+    numbers = re.findall(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)", data)
+    return np.array(numbers, dtype=np.float32).reshape(-1, 3, 3)
+
+
+def weld(corners: np.ndarray):
+    """Indexed mesh from triangle corners, merging vertices with identical coordinates."""
+    vertices, triangles = np.unique(corners.reshape(-1, 3), axis=0, return_inverse=True)
+    return vertices, triangles.reshape(-1, 3)
+
+
+def mesh_check(corners: np.ndarray) -> dict:
+    """
+    Watertightness of a triangle soup.
+
+    Every edge of a closed, manifold, consistently oriented mesh is shared by
+    exactly two triangles that traverse it in opposite directions.
+
+    Returns:
+        dict: triangles, open (boundary) edges, non-manifold edges, edges with
+        inconsistent orientation and the overall watertight flag.
+    """
+    _, triangles = weld(corners)
+    # Triangles collapsed by welding have no area and no edges worth checking
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    triangles = triangles[keep]
+    directed = triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    _, edge_counts = np.unique(np.sort(directed, axis=1), axis=0, return_counts=True)
+    _, directed_counts = np.unique(directed, axis=0, return_counts=True)
+    report = {
+        "triangles": int(len(triangles)),
+        "degenerate_triangles": int((~keep).sum()),
+        "open_edges": int((edge_counts == 1).sum()),
+        "non_manifold_edges": int((edge_counts > 2).sum()),
+        "flipped_edges": int((directed_counts > 1).sum()),
+    }
+    report["watertight"] = report["open_edges"] == 0 and report["non_manifold_edges"] == 0 \
+        and report["flipped_edges"] == 0
+    return report
+
+
+def analyze_shape(model, mesh_path=None) -> dict:
+    """
+    Validity, mass properties and topology of a built model.
+
+    Args:
+        model: Workplane or Shape.
+        mesh_path: Exported STL to check for watertightness, skipped if None.
+
+    Returns:
+        dict: JSON-serializable report, "issues" lists anything a reviewer should reject.
+    """
+    shape = to_shape(model)
+    bbox = shape.BoundingBox()
+    center = shape.Center()
+    report = {
+        "valid": bool(shape.isValid()),
+        "volume": shape.Volume(),
+        "area": shape.Area(),
+        # Rounded (and -0.0 folded into 0.0) so floating point noise does not clutter the summary
+        "bbox": [round(value, 9) + 0.0 for value in (bbox.xmin, bbox.ymin, bbox.zmin, bbox.xmax, bbox.ymax, bbox.zmax)],
+        "size": [round(value, 9) + 0.0 for value in (bbox.xlen, bbox.ylen, bbox.zlen)],
+        "center_of_mass": [round(value, 9) + 0.0 for value in (center.x, center.y, center.z)],
+        "solids": len(shape.Solids()),
+        "shells": len(shape.Shells()),
+        "faces": len(shape.Faces()),
+        "edges": len(shape.Edges()),
+        "vertices": len(shape.Vertices()),
+        "mesh": None,
+    }
+    if mesh_path is not None:
+        report["mesh"] = {"path": str(mesh_path), **mesh_check(read_stl(mesh_path))}
+
+    issues = []
+    if not report["valid"]:
+        issues.append("shape is invalid")
+    if report["solids"] == 0:
+        issues.append("no solid")
+    elif report["volume"] <= 0:
+        issues.append("volume is not positive")
+    if report["solids"] > 1:
+        issues.append(f"{report['solids']} disconnected solids")
+    mesh = report["mesh"]
+    if mesh is not None and not mesh["watertight"]:
+        issues.append(f"mesh not watertight ({mesh['open_edges']} open, {mesh['non_manifold_edges']} non-manifold, "
+                      f"{mesh['flipped_edges']} flipped edges)")
+    report["issues"] = issues
+    return report
+
+
+def format_geometry_report(report) -> str:
+    """Compact text version of analyze_shape() for tool results."""
+    size = " x ".join(f"{value:.4g}" for value in report["size"])
+    center = ", ".join(f"{value:.4g}" for value in report["center_of_mass"])
+    lines = [
+        f"Geometry: {'valid' if report['valid'] else 'INVALID'}, {report['solids']} solid(s), "
+        f"{report['faces']} faces, {report['edges']} edges",
+        f"Volume {report['volume']:.6g} mm^3, area {report['area']:.6g} mm^2, size {size} mm, "
+        f"centre of mass ({center})",
+    ]
+    if report["mesh"] is not None:
+        lines.append(f"Mesh: {'watertight' if report['mesh']['watertight'] else 'NOT watertight'}, "
+                     f"{report['mesh']['triangles']} triangles")
+    lines.append("Issues: " + ("; ".join(report["issues"]) if report["issues"] else "none"))
+    return "\n".join(lines)
+
+
+def write_geometry_report(report, file_path, store=None) -> Path:
+    """Store the report next to the model's other artifacts as <stem>.geometry.json."""
+    store = store or get_artifact_store()
+    name = f"{Path(file_path).stem}.geometry.json"
+    temp = store.temp_path(".json")
+    try:
+        with open(temp, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+        return store.add_file(temp, name, move=True)
+    finally:
+        if temp.exists():
+            temp.unlink()
+
+
+def report_geometry(func):
+    """
+    Analyze the first model a template exports and append the summary to its result.
+
+    The JSON report is stored as an artifact of the call, so the geometry cache
+    keeps and restores it together with the exported files.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with recording_exports() as exports:
+            result = func(*args, **kwargs)
+        # Pass the exports on to the enclosing recording (geometry cache, batch runner)
+        for model, path in exports:
+            record_export(model, path)
+        models = [(model, path) for model, path in exports if model is not None]
+        if not models:
+            return result
+        model, path = models[0]
+        mesh_path = next((p for m, p in exports if p.suffix.lower() in MESH_SUFFIXES and p.exists()), None)
+        report = analyze_shape(model, mesh_path)
+        record_export(model, write_geometry_report(report, path))
+        return f"{result}\n{format_geometry_report(report)}" if isinstance(result, str) else result
+
+    return wrapper
+
+
+def load_model(path):
+    """Import a STEP or BREP file as a cq.Shape."""
+    suffix = Path(path).suffix.lower()
+    if suffix in (".step", ".stp"):
+        return cq.importers.importStep(str(path))
+    if suffix == ".brep":
+        return cq.Shape.importBrep(str(path))
+    raise ValueError(f"Cannot analyze {path}, expected a STEP or BREP file")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validity and mass properties of an exported CAD model.")
+    parser.add_argument("model", help="STEP or BREP file")
+    parser.add_argument("--mesh", default=None, help="STL export of the same model to check for watertightness")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+    report = analyze_shape(load_model(args.model), args.mesh)
+    print(json.dumps(report, indent=1) if args.json else format_geometry_report(report))
+    return 1 if report["issues"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
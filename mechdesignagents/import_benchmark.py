@@ -0,0 +1,169 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Modules that must stay cheap to import, the heavy dependencies load on first use
+DEFAULT_MODULES = ["main", "agents", "agents_v2", "chat_with_designer_expert", "chat_with_cadcoder",
+                   "visualization", "artifact_store", "cad_batch"]
+PROMPT = "Enter the number of your choice"
+# Startup budget for main.py, from process start to the menu prompt
+STARTUP_BUDGET = 1.0
+# Run before the measured code so the interpreter sees exactly what `python main.py` sees:
+# cwd and sys.path[0] are this directory, nothing else of the project is on the path
+MAIN_PRELUDE = "import os, sys; sys.path[0] = os.getcwd(); "
+
+
+def _main_env() -> dict:
+    return {key: value for key, value in os.environ.items() if key != "PYTHONPATH"}
+
+
+def parse_importtime(stderr: str, module: str) -> tuple:
+    """
+    Parse `python -X importtime` output for one top-level import.
+
+    Returns:
+        tuple: Cumulative µs of the module and its nested imports as
+        (cumulative µs, module) tuples, slowest first.
+    """
+    block = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented and printed before the module that imported them
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                return int(cumulative_us), sorted(block, reverse=True)
+            block = []
+        else:
+            block.append((int(cumulative_us), name))
+    return None, []
+
+
+def import_time(module: str, top: int = 10) -> dict:
+    """Import a module in a fresh interpreter and report its total and slowest imports."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", MAIN_PRELUDE + f"import {module}"],
+                          capture_output=True, text=True, cwd=HERE, env=_main_env())
+    seconds = time.perf_counter() - start
+    total, nested = parse_importtime(proc.stderr, module)
+    error = None
+    if proc.returncode:
+        error = proc.stderr.strip().splitlines()[-1]
+    return {"module": module, "seconds": seconds, "import_seconds": total / 1e6 if total else None,
+            "slowest": [(name, cumulative / 1e6) for cumulative, name in nested[:top]],
+            "error": error}
+
+
+def project_imports(directory: str = HERE) -> list:
+    """
+    Every import of a project module in the modules of directory, including the
+    lazy ones inside functions that a plain import never executes.
+
+    Returns:
+        list: (file name, line, module) tuples.
+    """
+    local = {name[:-3] for name in os.listdir(directory) if name.endswith(".py")}
+    found = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".py"):
+            continue
+        with open(os.path.join(directory, file_name), encoding="utf-8") as f:
+            try:
+                tree = ast.parse(f.read(), file_name)
+            except SyntaxError:
+                continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                top = module.split(".")[0]
+                if top in local or top == os.path.basename(directory):
+                    found.append((file_name, node.lineno, module))
+    return found
+
+
+def unresolved_imports(directory: str = HERE) -> list:
+    """
+    Project imports that cannot be resolved from main.py's cwd and sys.path.
+
+    Returns:
+        list: (file name, line, module) tuples of the failing imports.
+    """
+    imports = project_imports(directory)
+    check = MAIN_PRELUDE + (
+        "import importlib.util, json\n"
+        "def resolves(module):\n"
+        "    try:\n"
+        "        return importlib.util.find_spec(module) is not None\n"
+        "    except ImportError:\n"
+        "        return False\n"
+        "modules = json.loads(sys.stdin.read())\n"
+        "print(json.dumps([module for module in modules if not resolves(module)]))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", check], input=json.dumps(sorted({m for _, _, m in imports})),
+                          capture_output=True, text=True, cwd=directory, env=_main_env(), check=True)
+    missing = set(json.loads(proc.stdout))
+    return [entry for entry in imports if entry[2] in missing]
+
+
+def startup_time(timeout: float = 30.0) -> float:
+    """Seconds from starting main.py until it shows the chat menu prompt."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-u", "main.py"], cwd=HERE, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        output = ""
+        while PROMPT not in output:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"main.py did not show the menu within {timeout} s")
+            char = proc.stdout.read(1)
+            if not char:
+                raise RuntimeError(f"main.py exited before showing the menu:\n{output}")
+            output += char
+        return time.perf_counter() - start
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the agent modules and main.py startup.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed per module")
+    args = parser.parse_args()
+
+    unresolved = unresolved_imports()
+    for file_name, line, module in unresolved:
+        print(f"{file_name}:{line}: cannot import {module} from main.py's sys.path")
+
+    failed = bool(unresolved)
+    for module in args.modules:
+        result = import_time(module, args.top)
+        if result["error"]:
+            print(f"{module}: failed, {result['error']}")
+            failed = True
+            continue
+        print(f"{module}: {result['import_seconds'] * 1000:.1f} ms import, {result['seconds']:.2f} s process")
+        for name, seconds in result["slowest"]:
+            print(f"    {seconds * 1000:8.1f} ms  {name}")
+
+    seconds = startup_time()
+    status = "ok" if seconds <= STARTUP_BUDGET else f"over the {STARTUP_BUDGET:.0f} s budget"
+    print(f"main.py time to menu: {seconds:.2f} s ({status})")
+    return 0 if seconds <= STARTUP_BUDGET and not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,79 +1,26 @@
+import asyncio
+import contextlib
+import contextvars
 import os
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import threading
+import time
+from operator import itemgetter
+
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_groq import ChatGroq
 from langchain_chroma import Chroma
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda
 
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.prompts import PromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
 
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
+from rag_cache import RAGQueryCache, SemanticAnswerCache
+from rag_ingest import DEFAULT_SOURCES, EMBEDDING_MODEL, update_index
+from rag_retrieval import HybridRetriever
 
-def langchain_rag(code_question: str, 
-                  pdf_path="../data/cadquery-readthedocs-io-en-latest.pdf", 
-                  persist_directory="./Cadquery_db") -> str:
-    # Initialize embeddings
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-    
-    # Initialize LLM
-    llm = ChatGroq(model="llama3-8b-8192", api_key=os.environ["GROQ_API_KEY"])
-    
-    # Check if the vector store already exists
-    if os.path.exists(persist_directory):
-        # Load existing vector store
-        vectorstore = Chroma(
-            collection_name="CadQuery_Documentation", 
-            embedding_function=embeddings,
-            persist_directory=persist_directory
-        )
-        print("Loaded existing vector store.")
-    else:
-        # If vector store doesn't exist, create it
-        # Load and split the document
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=256, chunk_overlap=50,separators=["\n\n", "\n", ". ", " ", ""])
-        all_splits = text_splitter.split_documents(documents)
-        
-        # Create and persist the vector store
-        vectorstore = Chroma.from_documents(
-            collection_name="CadQuery_Documentation",
-            documents=all_splits, 
-            embedding=embeddings,
-            persist_directory=persist_directory
-        )
-        print("Created and persisted new vector store.")
-    
-    # Create retriever
-    retriever = vectorstore.as_retriever()
-
-    # Define prompt template
-    # system_prompt = (
-    #     "You are an assistant for question-answering tasks. "
-    #     "Use the following pieces of retrieved context to answer "
-    #     "the question. If you don't know the answer, say that you "
-    #     "don't know. "
-    #     "\n\n"
-    #     "{context}"
-    # )
-
-    # prompt = ChatPromptTemplate.from_messages(
-    #     [
-    #         ("system", system_prompt),
-    #         ("human", "{input}"),
-    #     ]
-    # )
-
-    # # Create chains
-    # question_answer_chain = create_stuff_documents_chain(llm, prompt)
-    # rag_chain = create_retrieval_chain(retriever, question_answer_chain)
-    template = """Use the following pieces of context to answer the question at the end regarding using CadQuery to create CAD models.
+COLLECTION_NAME = "CadQuery_Documentation"
+
+RAG_TEMPLATE = """Use the following pieces of context to answer the question at the end regarding using CadQuery to create CAD models.
     If you don't know the answer, just say that you don't know, don't try to make up an answer.
     Provide answer relevant to coding only.
 
@@ -82,24 +29,404 @@ def langchain_rag(code_question: str,
     Question: {question}
 
     Helpful Answer:"""
-    custom_rag_prompt = PromptTemplate.from_template(template)
 
-    rag_chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
-        | custom_rag_prompt
-        | llm
-        | StrOutputParser()
-    )
 
-    response= rag_chain.invoke(code_question)
-    
-    # Invoke the chain
-    # response = rag_chain.invoke({"input": code_question})
-    return response
+def format_docs(docs):
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+class RAGEngine:
+    """
+    Process-wide retrieval engine for the CadQuery documentation.
+
+    The embedding model, vector store, retriever and prompt chain are loaded
+    once on first use (or by calling warm_up()) and reused for every question.
+
+    Args:
+        sources (dict): Mapping of source name to PDF path, defaults to DEFAULT_SOURCES.
+        persist_directory (str): Chroma persistence directory.
+        k (int): Number of chunks retrieved per question.
+        retrieval_mode (str): Default retrieval, "dense", "bm25" or "hybrid".
+        rerank (bool): Rerank retrieved chunks with a local cross-encoder by default.
+        llm: Optional chat model, defaults to ChatGroq.
+        use_cache (bool): Cache retrievals and answers in the store directory.
+        semantic_threshold (float): Cosine similarity at which a previous answer is
+            reused for a differently phrased question, None disables it. Answers
+            are only reused for the same retrieval mode, rerank and k.
+    """
+
+    def __init__(self,
+                 sources=None,
+                 persist_directory="./Cadquery_db",
+                 k=4,
+                 retrieval_mode="dense",
+                 rerank=False,
+                 llm=None,
+                 use_cache=True,
+                 semantic_threshold=0.92):
+        self.sources = dict(DEFAULT_SOURCES if sources is None else sources)
+        self.persist_directory = persist_directory
+        self.k = k
+        self.retrieval_mode = retrieval_mode
+        self.rerank = rerank
+        self.embeddings = None
+        self.vectorstore = None
+        self.retriever = None
+        self.llm = llm
+        self.answer_chain = None
+        self.index_report = None
+        self.cache = None
+        if use_cache:
+            self.cache = RAGQueryCache(os.path.join(persist_directory, "query_cache.sqlite"))
+        self.semantic_threshold = semantic_threshold
+        # One cache per retrieval variant, see _variant()
+        self.semantic_caches = {}
+        self._lock = threading.Lock()
+        self.metrics = {
+            "warm_up_seconds": None,
+            "cold_calls": 0,
+            "warm_calls": 0,
+            "cold_latency": [],
+            "warm_latency": [],
+            "first_token_latency": [],
+            "cancelled": 0,
+        }
+
+    @property
+    def is_warm(self):
+        return self.answer_chain is not None
+
+    def warm_up(self):
+        """Load embeddings, vector store and chain. Returns the load time in seconds."""
+        with self._lock:
+            if self.is_warm:
+                return 0.0
+            start = time.perf_counter()
+            self.embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+            if self.llm is None:
+                self.llm = ChatGroq(model="llama3-8b-8192", api_key=os.environ["GROQ_API_KEY"])
+            self.vectorstore = self._load_vectorstore()
+            self.retriever = HybridRetriever(self.vectorstore, self.embeddings)
+            if self.cache is not None:
+                self.cache.set_index_version(self.index_version)
+            for semantic_cache in self.semantic_caches.values():
+                semantic_cache.clear()
+            self.answer_chain = (
+                {
+                    "context": itemgetter("docs") | RunnableLambda(format_docs),
+                    "question": itemgetter("question"),
+                }
+                | PromptTemplate.from_template(RAG_TEMPLATE)
+                | self.llm
+                | StrOutputParser()
+            )
+            elapsed = time.perf_counter() - start
+            self.metrics["warm_up_seconds"] = elapsed
+            return elapsed
+
+    def _load_vectorstore(self):
+        vectorstore = Chroma(
+            collection_name=COLLECTION_NAME,
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory
+        )
+        # Re-embed only the pages that changed since the last build
+        self.index_report = update_index(vectorstore, self.persist_directory, self.sources)
+        print(f"Vector store ready: {self.index_report}")
+        return vectorstore
+
+    @property
+    def index_version(self):
+        return self.index_report["version"] if self.index_report else None
+
+    def retrieve(self, question: str, vector=None, mode=None, rerank=None, k=None):
+        """
+        Return the documentation chunks relevant to the question.
+
+        mode, rerank and k default to the engine settings, see HybridRetriever.retrieve.
+        """
+        self.warm_up()
+        return self.retriever.retrieve(
+            question,
+            k=self.k if k is None else k,
+            mode=self.retrieval_mode if mode is None else mode,
+            rerank=self.rerank if rerank is None else rerank,
+            vector=vector,
+        )
+
+    def _variant(self, mode=None, rerank=None) -> str:
+        mode = self.retrieval_mode if mode is None else mode
+        rerank = self.rerank if rerank is None else rerank
+        return f"{mode}:{rerank}:{self.k}"
+
+    def _semantic_cache(self, variant):
+        if self.semantic_threshold is None:
+            return None
+        with self._lock:
+            if variant not in self.semantic_caches:
+                self.semantic_caches[variant] = SemanticAnswerCache(threshold=self.semantic_threshold)
+            return self.semantic_caches[variant]
+
+    def _prepare(self, question: str, mode=None, rerank=None, vector=None):
+        """
+        Consult the caches and retrieve context.
+
+        A precomputed query vector skips embedding the question again.
+
+        Returns:
+            tuple: (cached answer or None, query vector, chunk IDs, retrieved docs)
+        """
+        variant = self._variant(mode, rerank)
+        semantic_cache = self._semantic_cache(variant)
+        if semantic_cache is not None:
+            # Embedded once, used for the similarity lookup and for retrieval
+            if vector is None:
+                vector = self.embeddings.embed_query(question)
+            response, _ = semantic_cache.lookup(vector)
+            if response is not None:
+                return response, vector, None, None
+        if self.cache is not None:
+            chunk_ids = self.cache.get_chunk_ids(question, variant)
+            if chunk_ids is not None:
+                response = self.cache.get_answer(chunk_ids, question)
+                if response is not None:
+                    return response, vector, chunk_ids, None
+                return None, vector, chunk_ids, self.vectorstore.get_by_ids(chunk_ids)
+        docs = self.retrieve(question, vector, mode, rerank)
+        chunk_ids = [doc.id for doc in docs]
+        if self.cache is not None:
+            self.cache.put_chunk_ids(question, chunk_ids, variant)
+        return None, vector, chunk_ids, docs
+
+    def _store(self, question: str, vector, chunk_ids, response: str, mode=None, rerank=None):
+        if self.cache is not None:
+            self.cache.put_answer(chunk_ids, question, response)
+        semantic_cache = self._semantic_cache(self._variant(mode, rerank))
+        if semantic_cache is not None:
+            semantic_cache.add(vector, response)
+
+    def stream(self, question: str, mode=None, rerank=None, should_stop=None):
+        """
+        Yield the answer to the question as it is generated.
+
+        Args:
+            question (str): CadQuery question.
+            mode (str): Retrieval mode override.
+            rerank (bool): Rerank override.
+            should_stop: Optional callable given the partial answer, returning True
+                ends the generation once the answer is usable (e.g. a complete code
+                block). The answer so far is cached like a complete one. Answers
+                the consumer stops reading, or that fail, are not cached.
+        """
+        cold = not self.is_warm
+        start = time.perf_counter()
+        self.warm_up()
+        response, vector, chunk_ids, docs = self._prepare(question, mode, rerank)
+        try:
+            if response is not None:
+                self.metrics["first_token_latency"].append(time.perf_counter() - start)
+                yield response
+                return
+            parts = []
+            for token in self.answer_chain.stream({"docs": docs, "question": question}):
+                if not parts:
+                    self.metrics["first_token_latency"].append(time.perf_counter() - start)
+                parts.append(token)
+                yield token
+                if should_stop is not None and should_stop("".join(parts)):
+                    self.metrics["cancelled"] += 1
+                    break
+            self._store(question, vector, chunk_ids, "".join(parts), mode, rerank)
+        finally:
+            # Also when the consumer closes the generator early
+            self._record(cold, time.perf_counter() - start)
+
+    def answer(self, question: str, mode=None, rerank=None) -> str:
+        """Retrieve context for the question and generate an answer."""
+        return "".join(self.stream(question, mode, rerank))
+
+    async def abatch(self, questions, mode=None, rerank=None, max_concurrency=4):
+        """
+        Answer several questions concurrently.
+
+        All questions are embedded in one batch, the cache lookups and vector
+        searches run concurrently in threads and at most max_concurrency LLM
+        calls are in flight at once.
+
+        Returns:
+            list: Answers in the order of the questions.
+        """
+        questions = list(questions)
+        await asyncio.to_thread(self.warm_up)
+        vectors = await asyncio.to_thread(self.embeddings.embed_documents, questions)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def answer_one(question, vector):
+            start = time.perf_counter()
+            response, vector, chunk_ids, docs = await asyncio.to_thread(
+                self._prepare, question, mode, rerank, vector)
+            if response is None:
+                async with semaphore:
+                    response = await self.answer_chain.ainvoke({"docs": docs, "question": question})
+                self._store(question, vector, chunk_ids, response, mode, rerank)
+            self._record(False, time.perf_counter() - start)
+            return response
+
+        return await asyncio.gather(*(answer_one(q, v) for q, v in zip(questions, vectors)))
+
+    def _record(self, cold, elapsed):
+        key = "cold" if cold else "warm"
+        self.metrics[f"{key}_calls"] += 1
+        self.metrics[f"{key}_latency"].append(elapsed)
+
+    def stats(self) -> dict:
+        """Summarize cold vs warm latency in seconds."""
+        def mean(values):
+            return sum(values) / len(values) if values else None
+        return {
+            "warm_up_seconds": self.metrics["warm_up_seconds"],
+            "cold_calls": self.metrics["cold_calls"],
+            "warm_calls": self.metrics["warm_calls"],
+            "mean_cold_latency": mean(self.metrics["cold_latency"]),
+            "mean_warm_latency": mean(self.metrics["warm_latency"]),
+            "mean_first_token_latency": mean(self.metrics["first_token_latency"]),
+            "cancelled": self.metrics["cancelled"],
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "semantic_cache": {variant: semantic_cache.stats()
+                               for variant, semantic_cache in self.semantic_caches.items()},
+            "retrieval_latency": {
+                mode: mean(values) for mode, values in self.retriever.latency.items()
+            } if self.retriever is not None else None,
+        }
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_rag_engine(pdf_path=None, persist_directory="./Cadquery_db") -> RAGEngine:
+    """
+    Return the shared engine for a documentation store, creating it on first use.
+
+    Args:
+        pdf_path (str): Index only this PDF instead of DEFAULT_SOURCES.
+        persist_directory (str): Chroma persistence directory.
+    """
+    sources = DEFAULT_SOURCES if pdf_path is None else {"cadquery_docs": pdf_path}
+    key = (tuple(sorted(sources.items())), os.path.abspath(persist_directory))
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = RAGEngine(sources=sources, persist_directory=persist_directory)
+        return _engines[key]
+
+
+def warm_up_rag(background=False, **engine_kwargs):
+    """
+    Load the shared RAG engine ahead of the first question.
+
+    Args:
+        background (bool): Load in a daemon thread and return it instead of blocking.
+    """
+    engine = get_rag_engine(**engine_kwargs)
+    if background:
+        thread = threading.Thread(target=engine.warm_up, name="rag-warm-up", daemon=True)
+        thread.start()
+        return thread
+    return engine.warm_up()
+
+
+def console_sink(token: str, done: bool):
+    """Print streamed RAG output to the terminal as it arrives."""
+    print(token, end="", flush=True)
+    if done:
+        print()
+
+
+def stop_after_code_block(partial_answer: str) -> bool:
+    """should_stop predicate that cancels once a complete code block was streamed."""
+    return partial_answer.count("```") >= 2
+
+
+# Callables(token, done) receiving streamed RAG output, e.g. the console or a Streamlit placeholder.
+# Per context, so concurrent sessions (Streamlit runs each in its own thread) only see their own tokens.
+_stream_sinks = contextvars.ContextVar("rag_stream_sinks", default=(console_sink,))
+
+
+@contextlib.contextmanager
+def streaming_to(*sinks):
+    """Also send the RAG output streamed inside the block, in this thread or task, to sinks."""
+    token = _stream_sinks.set(_stream_sinks.get() + sinks)
+    try:
+        yield
+    finally:
+        _stream_sinks.reset(token)
+
+
+def stream_rag(code_question: str,
+               pdf_path=None,
+               persist_directory="./Cadquery_db",
+               mode=None,
+               rerank=None,
+               should_stop=None,
+               sinks=None) -> str:
+    """
+    Answer a question while forwarding tokens to the stream sinks.
+
+    Args:
+        should_stop: Optional cancellation predicate, see RAGEngine.stream.
+        sinks (list): Sinks to use instead of the ones of the current context, see streaming_to().
+
+    Returns:
+        str: The full answer, or the part streamed until should_stop ended it.
+    """
+    sinks = list(_stream_sinks.get()) if sinks is None else sinks
+    engine = get_rag_engine(pdf_path, persist_directory)
+    parts = []
+    for token in engine.stream(code_question, mode=mode, rerank=rerank, should_stop=should_stop):
+        parts.append(token)
+        for sink in sinks:
+            sink(token, False)
+    for sink in sinks:
+        sink("", True)
+    return "".join(parts)
+
+
+def _run_coroutine(coroutine):
+    """Run a coroutine to completion, also from code already inside an event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    result = {}
+    def runner():
+        result["value"] = asyncio.run(coroutine)
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    return result["value"]
+
+
+def rag_batch(questions,
+              pdf_path=None,
+              persist_directory="./Cadquery_db",
+              mode=None,
+              rerank=None,
+              max_concurrency=4) -> list:
+    """Answer a list of questions in one round-trip, see RAGEngine.abatch."""
+    engine = get_rag_engine(pdf_path, persist_directory)
+    return _run_coroutine(engine.abatch(questions, mode=mode, rerank=rerank, max_concurrency=max_concurrency))
+
+
+def langchain_rag(code_question: str,
+                  pdf_path=None,
+                  persist_directory="./Cadquery_db",
+                  mode=None,
+                  rerank=None) -> str:
+    return get_rag_engine(pdf_path, persist_directory).answer(code_question, mode=mode, rerank=rerank)
 
 # Example usage
 # if __name__ == "__main__":
 #     while True:
 #         question = input("Enter your question regarding Cadquery: ")
 #         print(langchain_rag(question))
-    
+#     print(get_rag_engine().stats())
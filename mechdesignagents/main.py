@@ -1,8 +1,15 @@
-from chat_with_cadcoder import chat_cad_coder
-from chat_with_designer_expert import designers_chat
-from chat_with_designers_no_rag import norag_chat
-from chat_with_designer_expert_with_rag import designers_rag_chat
-from chat_with_designers_autogen_rag import rag_chat   
+import importlib
+import os
+
+# Chat function for every option. The chat modules pull in autogen, the agents and
+# the RAG engine, so only the selected one is imported, after the menu is shown.
+CHAT_FUNCTIONS = {
+    "1": ("chat_with_cadcoder", "chat_cad_coder"),
+    "2": ("chat_with_designer_expert", "designers_chat"),
+    "3": ("chat_with_designer_expert_with_rag", "designers_rag_chat"),
+    "4": ("chat_with_designers_autogen_rag", "rag_chat"),
+    "5": ("chat_with_designers_no_rag", "norag_chat"),
+}
 
       
 def display_chat_options():
@@ -31,14 +38,26 @@ def get_user_choice():
             print("Invalid input. Please enter a number.")
 
 
+def load_chat(choice):
+    module_name, function_name = CHAT_FUNCTIONS[choice]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
 # Call the main function to start the application
 
 def main():
+    # Interactive sessions show template models in the viewer without waiting on it
+    os.environ.setdefault("CAD_VIEWER", "deferred")
     print("\nLet's create CAD models!")
     print("-------------------")
     print("Enter 'exit' to exit the program")
     display_chat_options()
     choice= get_user_choice()
+    if choice == "3":
+        from langchain_rag import warm_up_rag
+        # Load the RAG engine while the user types the design problem
+        warm_up_rag(background=True)
+    chat = load_chat(choice)
     while True:
         try:
             prompt = input("\nEnter your design problem (or 'exit'if you want to exit): ")
@@ -46,18 +65,7 @@ def main():
                 print("\nExiting CAD Design Assistant")
                 break
             try:
-                if choice == "1":
-                    chat_cad_coder(prompt)
-                elif choice == "2":
-                    designers_chat(prompt)
-                elif choice == "3":
-                    designers_rag_chat(prompt)
-                elif choice == "4":
-                    rag_chat(prompt)
-                elif choice == "5":
-                    norag_chat(prompt)
-                else:
-                    print("Invalid choice. Please select a valid option.")
+                chat(prompt)
             except Exception as e:
                 print(f"An error occurred: {e}")
                 print("Please try again.")
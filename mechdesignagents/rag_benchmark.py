@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from langchain_rag import RAGEngine
+from rag_retrieval import RETRIEVAL_MODES, evaluate_retrieval
+
+
+def stub_llm():
+    """Offline stand-in for ChatGroq, answers with the first line of the prompt context."""
+    def answer(prompt_value):
+        text = prompt_value.to_string()
+        context = text.split("coding only.", 1)[-1].split("Question:", 1)[0].strip()
+        return context.splitlines()[0] if context else ""
+    return RunnableLambda(answer)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def summarize(result, k):
+    ranks = result["ranks"]
+    return {
+        f"recall@{k}": result["recall_at_k"],
+        "mrr": sum(1.0 / rank for rank in ranks if rank is not None) / len(ranks),
+        "p50_ms": 1000 * percentile(result["latencies"], 50),
+        "p95_ms": 1000 * percentile(result["latencies"], 95),
+    }
+
+
+def run_benchmark(queries, persist_directory, k=4, rerank_options=(False, True), repeats=1):
+    """
+    Build (or update) the index and score every retriever configuration.
+
+    Args:
+        queries (list): Query set, see rag_queries.json.
+        persist_directory (str): Store used for the run.
+        k (int): Cut-off for recall and MRR.
+        rerank_options (tuple): Rerank settings tried for each retrieval mode.
+        repeats (int): Passes over the query set, later passes measure warm latency.
+
+    Returns:
+        dict: Index build time and size plus metrics for each configuration.
+    """
+    engine = RAGEngine(persist_directory=persist_directory, k=k, llm=stub_llm(),
+                       use_cache=False, semantic_threshold=None)
+    start = time.perf_counter()
+    engine.warm_up()
+    report = {
+        "index_build_seconds": time.perf_counter() - start,
+        "index_size_bytes": directory_size(persist_directory),
+        "index": engine.index_report,
+        "configurations": {},
+    }
+    for mode in RETRIEVAL_MODES:
+        for rerank in rerank_options:
+            def retrieve(question, k):
+                return engine.retrieve(question, mode=mode, rerank=rerank, k=k)
+            # First pass loads lazy parts (BM25 index, cross-encoder), keep the last one
+            for _ in range(repeats):
+                result = evaluate_retrieval(retrieve, queries, k)
+            report["configurations"][f"{mode}{'+rerank' if rerank else ''}"] = summarize(result, k)
+
+    # End-to-end latency with the stub LLM covers prompt formatting and parsing
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        engine.answer(query["question"])
+        latencies.append(time.perf_counter() - start)
+    report["answer_p50_ms"] = 1000 * percentile(latencies, 50)
+    report["answer_p95_ms"] = 1000 * percentile(latencies, 95)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval quality and latency benchmark for langchain_rag.")
+    parser.add_argument("--queries", default="rag_queries.json")
+    parser.add_argument("--persist-directory", default=None,
+                        help="Existing store to benchmark, a fresh one is built in a temp directory by default")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--no-rerank", action="store_true", help="Skip the cross-encoder configurations")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        queries = json.load(f)
+    persist_directory = args.persist_directory or tempfile.mkdtemp(prefix="rag_bench_")
+    try:
+        report = run_benchmark(queries, persist_directory, k=args.k, repeats=args.repeats,
+                               rerank_options=(False,) if args.no_rerank else (False, True))
+    finally:
+        if args.persist_directory is None:
+            shutil.rmtree(persist_directory, ignore_errors=True)
+
+    print(f"Index build: {report['index_build_seconds']:.1f} s, {report['index_size_bytes'] / 1e6:.1f} MB")
+    print(f"{'configuration':<15}{'recall@' + str(args.k):>10}{'MRR':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, metrics in report["configurations"].items():
+        print(f"{name:<15}{metrics[f'recall@{args.k}']:>10.2f}{metrics['mrr']:>8.2f}"
+              f"{metrics['p50_ms']:>10.1f}{metrics['p95_ms']:>10.1f}")
+    print(f"Answer latency with stub LLM: p50 {report['answer_p50_ms']:.1f} ms, p95 {report['answer_p95_ms']:.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Words that do not change what is being looked up in the CadQuery docs
+STOPWORDS = {
+    "a", "an", "the", "to", "in", "of", "for", "on", "with", "and", "or", "by",
+    "how", "do", "i", "can", "you", "me", "what", "is", "are", "using", "use",
+    "cadquery", "cq", "code", "python", "please", "show", "example",
+}
+# Bumped whenever normalize_query() changes, stored entries of another format are dropped
+KEY_FORMAT = 2
+
+
+def normalize_query(text: str) -> str:
+    """
+    Reduce a question to a canonical key.
+
+    Lowercases and drops punctuation and stopwords, so "How to extrude a circle?"
+    and "extrude circle cadquery" share a key. Word order and repeated words
+    are kept ("convert step to stl" is not "convert stl to step"), rephrasings
+    are left to the SemanticAnswerCache.
+    """
+    words = (w.strip(".") for w in re.findall(r"[a-z0-9_.]+", str(text).lower()))
+    return " ".join(w for w in words if w and w not in STOPWORDS)
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class TTLLRUCache:
+    """In-memory LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, created = item
+        if self.ttl is not None and time.time() - created > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value, created=None):
+        self._data[key] = (value, time.time() if created is None else created)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class RAGQueryCache:
+    """
+    Two-level cache in front of the RAG engine, backed by SQLite.
+
+    Level 1 maps a normalized question and retrieval variant to the retrieved
+    chunk IDs. Level 2 maps (chunk IDs, normalized question) to the generated
+    answer. Both levels are dropped when the index version changes.
+
+    Args:
+        path (str): SQLite file, survives restarts.
+        max_entries (int): In-memory LRU size per level.
+        ttl (float): Seconds before an entry expires, None keeps entries forever.
+    """
+
+    def __init__(self, path="./Cadquery_db/query_cache.sqlite", max_entries=1024, ttl=7 * 24 * 3600):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS retrievals (key TEXT PRIMARY KEY, chunk_ids TEXT, created REAL);
+            CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT, created REAL);
+            """
+        )
+        self._memory = {
+            "retrievals": TTLLRUCache(max_entries, ttl),
+            "answers": TTLLRUCache(max_entries, ttl),
+        }
+        self.counters = {"retrieval_hits": 0, "retrieval_misses": 0, "answer_hits": 0, "answer_misses": 0}
+        self.index_version = None
+
+    def set_index_version(self, version):
+        """Invalidate every entry if the index (or the key format) changed since it was cached."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()
+            if row is None or row[0] != f"{KEY_FORMAT}:{version}":
+                self._conn.execute("DELETE FROM retrievals")
+                self._conn.execute("DELETE FROM answers")
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('index_version', ?)",
+                                   (f"{KEY_FORMAT}:{version}",))
+                self._conn.commit()
+                for level in self._memory.values():
+                    level.clear()
+            self.index_version = version
+
+    def _get(self, table, key):
+        value = self._memory[table].get(key)
+        if value is not None:
+            return value
+        column = "chunk_ids" if table == "retrievals" else "answer"
+        row = self._conn.execute(f"SELECT {column}, created FROM {table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self._conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._memory[table].put(key, value, created)
+        return value
+
+    def _put(self, table, key, value):
+        created = time.time()
+        self._conn.execute(f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?)", (key, value, created))
+        self._conn.commit()
+        self._memory[table].put(key, value, created)
+
+    def get_chunk_ids(self, question: str, variant: str = ""):
+        with self._lock:
+            value = self._get("retrievals", _digest(normalize_query(question), variant))
+            self._count("retrieval", value is not None)
+            return json.loads(value) if value is not None else None
+
+    def put_chunk_ids(self, question: str, chunk_ids, variant: str = ""):
+        with self._lock:
+            self._put("retrievals", _digest(normalize_query(question), variant), json.dumps(list(chunk_ids)))
+
+    def get_answer(self, chunk_ids, question: str):
+        with self._lock:
+            value = self._get("answers", _digest(*chunk_ids, normalize_query(question)))
+            self._count("answer", value is not None)
+            return value
+
+    def put_answer(self, chunk_ids, question: str, answer: str):
+        with self._lock:
+            self._put("answers", _digest(*chunk_ids, normalize_query(question)), answer)
+
+    def _count(self, level, hit):
+        self.counters[f"{level}_{'hits' if hit else 'misses'}"] += 1
+
+    def stats(self) -> dict:
+        def rate(level):
+            hits = self.counters[f"{level}_hits"]
+            total = hits + self.counters[f"{level}_misses"]
+            return hits / total if total else None
+        return dict(self.counters, retrieval_hit_rate=rate("retrieval"), answer_hit_rate=rate("answer"))
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question embedding, matched by cosine similarity.
+
+    Embeddings are kept L2-normalized in one float32 matrix so a lookup is a
+    single matrix-vector product. When full, the oldest entry is overwritten.
+
+    Args:
+        threshold (float): Minimum cosine similarity for a hit.
+        max_entries (int): Number of questions kept.
+    """
+
+    def __init__(self, threshold=0.92, max_entries=4096):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._matrix = None
+        self._answers = []
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, vector):
+        """Return (answer, similarity) of the closest cached question, or (None, similarity)."""
+        query = self._normalize(vector)
+        with self._lock:
+            if self._size == 0:
+                self.misses += 1
+                return None, 0.0
+            scores = self._matrix[:self._size] @ query
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity >= self.threshold:
+                self.hits += 1
+                return self._answers[best], similarity
+            self.misses += 1
+            return None, similarity
+
+    def add(self, vector, answer: str):
+        query = self._normalize(vector)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty((min(64, self.max_entries), query.shape[0]), dtype=np.float32)
+            if self._size < self.max_entries and self._size == self._matrix.shape[0]:
+                grown = np.empty((min(2 * self._size, self.max_entries), query.shape[0]), dtype=np.float32)
+                grown[:self._size] = self._matrix
+                self._matrix = grown
+            self._matrix[self._next] = query
+            if self._next < len(self._answers):
+                self._answers[self._next] = answer
+            else:
+                self._answers.append(answer)
+            self._size = min(self._size + 1, self.max_entries)
+            self._next = (self._next + 1) % self.max_entries
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._answers = []
+            self._size = 0
+            self._next = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "semantic_hits": self.hits,
+            "semantic_misses": self.misses,
+            "semantic_hit_rate": self.hits / total if total else None,
+            "semantic_entries": self._size,
+        }
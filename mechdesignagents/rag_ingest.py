@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Source documents indexed into the shared CadQuery store. Chunks of missing files are removed.
+DEFAULT_SOURCES = {
+    "cadquery_docs": "../data/cadquery-readthedocs-io-en-latest.pdf",
+    "cadquery_examples": "../data/Examples_small.pdf",
+    "asme_y14_41": "../data/ASME_Y14.41.pdf",
+}
+MANIFEST_NAME = "index_manifest.json"
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
+
+def make_text_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=256, chunk_overlap=50, separators=["\n\n", "\n", ". ", " ", ""])
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(persist_directory: str) -> dict:
+    path = os.path.join(persist_directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"version": None, "sources": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(persist_directory: str, manifest: dict):
+    """Write the manifest atomically so a crash never leaves a half-written file."""
+    os.makedirs(persist_directory, exist_ok=True)
+    path = os.path.join(persist_directory, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def manifest_version(manifest: dict) -> str:
+    """Hash of every indexed page, changes whenever the index content changes."""
+    digest = hashlib.sha256()
+    for name in sorted(manifest["sources"]):
+        pages = manifest["sources"][name]["pages"]
+        for page in sorted(pages, key=int):
+            digest.update(f"{name}:{page}:{pages[page]['hash']}\n".encode())
+    return digest.hexdigest()
+
+
+def chunk_id(source_name: str, page: int, index: int, page_hash: str) -> str:
+    return f"{source_name}:{page}:{index}:{page_hash[:12]}"
+
+
+def split_page(source_name: str, page_doc, page_hash: str, text_splitter):
+    """Split one PDF page into chunks with stable IDs and source metadata."""
+    page = page_doc.metadata.get("page", 0)
+    chunks = text_splitter.split_documents([page_doc])
+    ids = []
+    for i, chunk in enumerate(chunks):
+        chunk.metadata.update({"doc_source": source_name, "page": page, "page_hash": page_hash})
+        ids.append(chunk_id(source_name, page, i, page_hash))
+    return chunks, ids
+
+
+_worker_embeddings = None
+
+
+def _init_embedding_worker(model_name: str, threads: int):
+    # Each worker loads its own model once and keeps its share of the CPU cores
+    global _worker_embeddings
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+    torch.set_num_threads(threads)
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _embed_batch(texts):
+    return _worker_embeddings.embed_documents(texts)
+
+
+class EmbeddingPipeline:
+    """
+    Embeds chunks in fixed-size batches and bulk-inserts them into the store.
+
+    With workers > 1 the batches are embedded in a pool of processes, otherwise
+    the vector store's own embedding function is used in-process.
+
+    Args:
+        vectorstore: Chroma store receiving the chunks.
+        batch_size (int): Chunks per embedding call and per insert.
+        workers (int): Number of embedding processes.
+    """
+
+    def __init__(self, vectorstore, batch_size=64, workers=1, model_name=EMBEDDING_MODEL):
+        self.vectorstore = vectorstore
+        self.batch_size = batch_size
+        self.workers = workers
+        self.model_name = model_name
+        self.pool = None
+        self._buffer = []
+        self._pending = []
+        self.chunks = 0
+        self._start = time.perf_counter()
+
+    def add(self, chunks, ids):
+        self._buffer.extend(zip(ids, chunks))
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._submit(batch)
+
+    def _submit(self, batch):
+        texts = [chunk.page_content for _, chunk in batch]
+        if self.workers <= 1:
+            self._insert(batch, self.vectorstore.embeddings.embed_documents(texts))
+            return
+        if self.pool is None:
+            # Started on the first batch so an up-to-date index costs no model loads
+            threads = max(1, (os.cpu_count() or self.workers) // self.workers)
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_embedding_worker,
+                initargs=(self.model_name, threads),
+            )
+        self._pending.append((batch, self.pool.submit(_embed_batch, texts)))
+        # Bound the number of batches in flight so memory stays flat on large PDFs
+        while len(self._pending) > 2 * self.workers:
+            self._drain_one()
+
+    def _drain_one(self):
+        batch, future = self._pending.pop(0)
+        self._insert(batch, future.result())
+
+    def _insert(self, batch, vectors):
+        self.vectorstore._collection.upsert(
+            ids=[cid for cid, _ in batch],
+            embeddings=vectors,
+            documents=[chunk.page_content for _, chunk in batch],
+            metadatas=[chunk.metadata for _, chunk in batch],
+        )
+        self.chunks += len(batch)
+
+    def flush(self):
+        """Embed and insert everything buffered or in flight."""
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self._submit(batch)
+        while self._pending:
+            self._drain_one()
+
+    def close(self) -> dict:
+        self.flush()
+        if self.pool is not None:
+            self.pool.shutdown()
+        elapsed = time.perf_counter() - self._start
+        return {
+            "chunks_embedded": self.chunks,
+            "embed_wall_seconds": elapsed,
+            "chunks_per_second": self.chunks / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def update_index(vectorstore, persist_directory: str, sources=None, batch_size=64, workers=1) -> dict:
+    """
+    Bring the vector store in line with the source documents.
+
+    Only pages whose content hash changed are re-embedded. Chunks of pages,
+    sources and files that no longer exist are deleted.
+
+    Args:
+        vectorstore: Chroma store to update.
+        persist_directory (str): Directory holding the store and its manifest.
+        sources (dict): Mapping of source name to PDF path.
+        batch_size (int): Chunks embedded and inserted per batch.
+        workers (int): Embedding processes, 1 embeds in-process.
+
+    Returns:
+        dict: Page counts, chunks per second and the index version.
+    """
+    sources = DEFAULT_SOURCES if sources is None else sources
+    manifest = load_manifest(persist_directory)
+    text_splitter = None
+    report = {"pages_added": 0, "pages_deleted": 0, "pages_unchanged": 0, "chunks_added": 0}
+    start = time.perf_counter()
+
+    if not manifest["sources"] and vectorstore._collection.count():
+        # Store built before manifests existed, its chunk IDs are unknown
+        print("Vector store has no manifest, rebuilding it.")
+        vectorstore.reset_collection()
+
+    for name in list(manifest["sources"]):
+        # A file deleted from disk is dropped like a source removed from the mapping
+        if name not in sources or not os.path.exists(sources[name]):
+            stale = manifest["sources"].pop(name)
+            for entry in stale["pages"].values():
+                # Pages without text have no chunks, never send Chroma an empty id list
+                if entry["chunk_ids"]:
+                    vectorstore.delete(ids=entry["chunk_ids"])
+                report["pages_deleted"] += 1
+
+    pipeline = EmbeddingPipeline(vectorstore, batch_size=batch_size, workers=workers)
+    for name, path in sources.items():
+        if not os.path.exists(path):
+            print(f"Skipping missing source {name}: {path}")
+            continue
+        file_hash = sha256_file(path)
+        entry = manifest["sources"].setdefault(name, {"path": path, "file_hash": None, "pages": {}})
+        if entry["file_hash"] == file_hash:
+            report["pages_unchanged"] += len(entry["pages"])
+            continue
+
+        from langchain_community.document_loaders import PyPDFLoader
+
+        text_splitter = text_splitter or make_text_splitter()
+        old_pages = entry["pages"]
+        new_pages = {}
+        for page_doc in PyPDFLoader(path).lazy_load():
+            page = str(page_doc.metadata.get("page", len(new_pages)))
+            page_hash = sha256_text(page_doc.page_content)
+            if page in old_pages and old_pages[page]["hash"] == page_hash:
+                new_pages[page] = old_pages[page]
+                report["pages_unchanged"] += 1
+                continue
+            if page in old_pages and old_pages[page]["chunk_ids"]:
+                vectorstore.delete(ids=old_pages[page]["chunk_ids"])
+            chunks, ids = split_page(name, page_doc, page_hash, text_splitter)
+            pipeline.add(chunks, ids)
+            new_pages[page] = {"hash": page_hash, "chunk_ids": ids}
+            report["pages_added"] += 1
+            report["chunks_added"] += len(ids)
+        for page in set(old_pages) - set(new_pages):
+            if old_pages[page]["chunk_ids"]:
+                vectorstore.delete(ids=old_pages[page]["chunk_ids"])
+            report["pages_deleted"] += 1
+
+        pipeline.flush()
+        entry.update({"path": path, "file_hash": file_hash, "pages": new_pages})
+        # Persist after each source so an interrupted build resumes where it stopped
+        manifest["version"] = manifest_version(manifest)
+        save_manifest(persist_directory, manifest)
+
+    report.update(pipeline.close())
+    manifest["version"] = manifest_version(manifest)
+    save_manifest(persist_directory, manifest)
+    report["version"] = manifest["version"]
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the CadQuery documentation vector store.")
+    parser.add_argument("--persist-directory", default="./Cadquery_db")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    from langchain_chroma import Chroma
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from langchain_rag import COLLECTION_NAME
+
+    vectorstore = Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+        persist_directory=args.persist_directory,
+    )
+    report = update_index(vectorstore, args.persist_directory,
+                          batch_size=args.batch_size, workers=args.workers)
+    print(f"Indexed {report['chunks_embedded']} chunks at {report['chunks_per_second']:.1f} chunks/s")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
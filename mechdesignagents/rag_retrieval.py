@@ -0,0 +1,227 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from langchain_core.documents import Document
+
+RETRIEVAL_MODES = ("dense", "bm25", "hybrid")
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def tokenize(text: str):
+    """
+    Split text into lowercase terms for BM25.
+
+    Identifiers are kept whole ("cboreHole" -> "cborehole") and their camelCase
+    parts are added as well, so both exact API names and plain words match.
+    """
+    terms = []
+    for word in re.findall(r"[A-Za-z_][A-Za-z0-9_]*|\d+", text):
+        terms.append(word.lower())
+        parts = re.findall(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+", word)
+        if len(parts) > 1:
+            terms.extend(part.lower() for part in parts)
+    return terms
+
+
+class BM25Index:
+    """
+    Inverted-index BM25 (Okapi) over the chunks of the vector store.
+
+    Args:
+        ids (list): Chunk IDs.
+        texts (list): Chunk texts, aligned with ids.
+        metadatas (list): Chunk metadata, aligned with ids.
+    """
+
+    def __init__(self, ids, texts, metadatas=None, k1=1.5, b=0.75):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = list(metadatas) if metadatas is not None else [{} for _ in self.ids]
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for i, text in enumerate(self.texts):
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+        n = len(self.texts)
+        self.avg_length = sum(self.doc_lengths) / n if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        data = vectorstore._collection.get(include=["documents", "metadatas"])
+        return cls(data["ids"], data["documents"], data["metadatas"])
+
+    def search(self, query: str, k: int = 4):
+        """Return [(chunk index, score)] of the k best-scoring chunks."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = 1 - self.b + self.b * self.doc_lengths[i] / self.avg_length
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def document(self, i: int) -> Document:
+        return Document(id=self.ids[i], page_content=self.texts[i], metadata=self.metadatas[i] or {})
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """Fuse ranked ID lists, each ID scores sum(1 / (k + rank))."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class CrossEncoderReranker:
+    """Local cross-encoder that rescores (question, chunk) pairs, loaded on first use."""
+
+    def __init__(self, model_name=CROSS_ENCODER_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def rerank(self, question: str, docs, k: int):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name)
+        scores = self._model.predict([(question, doc.page_content) for doc in docs])
+        ranked = sorted(zip(docs, scores), key=lambda item: float(item[1]), reverse=True)
+        return [doc for doc, _ in ranked[:k]]
+
+
+class HybridRetriever:
+    """
+    Dense, BM25 or fused retrieval over one Chroma store, with optional reranking.
+
+    Args:
+        vectorstore: Chroma store holding the chunks and their embeddings.
+        embeddings: Embedding model used for dense queries.
+        candidates (int): Results taken from each retriever before fusion/reranking.
+    """
+
+    def __init__(self, vectorstore, embeddings, candidates=20):
+        self.vectorstore = vectorstore
+        self.embeddings = embeddings
+        self.candidates = candidates
+        self.reranker = CrossEncoderReranker()
+        self._bm25 = None
+        self._lock = threading.Lock()
+        self.latency = defaultdict(list)
+
+    @property
+    def bm25(self) -> BM25Index:
+        with self._lock:
+            if self._bm25 is None:
+                self._bm25 = BM25Index.from_vectorstore(self.vectorstore)
+            return self._bm25
+
+    def invalidate(self):
+        """Drop the BM25 index after the vector store changed."""
+        with self._lock:
+            self._bm25 = None
+
+    def retrieve(self, question: str, k: int = 4, mode: str = "dense", rerank: bool = False, vector=None):
+        """
+        Return the k most relevant chunks.
+
+        Args:
+            question (str): Query text.
+            k (int): Number of chunks returned.
+            mode (str): "dense", "bm25" or "hybrid" (reciprocal rank fusion of both).
+            rerank (bool): Rescore the candidates with the cross-encoder.
+            vector: Precomputed query embedding for the dense search.
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {RETRIEVAL_MODES}")
+        start = time.perf_counter()
+        depth = self.candidates if rerank or mode == "hybrid" else k
+        rankings = []
+        by_id = {}
+        if mode in ("dense", "hybrid"):
+            if vector is None:
+                vector = self.embeddings.embed_query(question)
+            dense = self.vectorstore.similarity_search_by_vector(vector, k=depth)
+            by_id.update((doc.id, doc) for doc in dense)
+            rankings.append([doc.id for doc in dense])
+        if mode in ("bm25", "hybrid"):
+            bm25 = self.bm25
+            hits = bm25.search(question, depth)
+            for i, _ in hits:
+                by_id.setdefault(bm25.ids[i], bm25.document(i))
+            rankings.append([bm25.ids[i] for i, _ in hits])
+        ranked = rankings[0] if len(rankings) == 1 else reciprocal_rank_fusion(rankings)
+        docs = [by_id[doc_id] for doc_id in ranked[:depth]]
+        if rerank:
+            docs = self.reranker.rerank(question, docs, k)
+        docs = docs[:k]
+        self.latency[f"{mode}+rerank" if rerank else mode].append(time.perf_counter() - start)
+        return docs
+
+
+def first_relevant_rank(docs, anchors):
+    """1-based rank of the first chunk containing any anchor, None if no chunk does."""
+    anchors = [anchor.lower() for anchor in anchors]
+    for rank, doc in enumerate(docs, start=1):
+        text = doc.page_content.lower()
+        if any(anchor in text for anchor in anchors):
+            return rank
+    return None
+
+
+def evaluate_retrieval(retrieve, queries, k: int = 4):
+    """
+    Run a fixed query set through a retrieval function.
+
+    Args:
+        retrieve: Callable taking (question, k) and returning a list of Documents.
+        queries (list): Dicts with "question" and the "anchors" a relevant chunk contains.
+        k (int): Cut-off for recall.
+
+    Returns:
+        dict: recall@k, the per-query first relevant rank and latencies in seconds.
+    """
+    ranks = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        docs = retrieve(query["question"], k)
+        latencies.append(time.perf_counter() - start)
+        ranks.append(first_relevant_rank(docs, query["anchors"]))
+    found = sum(rank is not None for rank in ranks)
+    return {
+        "recall_at_k": found / len(queries) if queries else None,
+        "ranks": ranks,
+        "latencies": latencies,
+        "mean_latency": sum(latencies) / len(latencies) if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    import json
+    from langchain_rag import get_rag_engine
+
+    with open("rag_queries.json") as f:
+        queries = json.load(f)
+    engine = get_rag_engine()
+    engine.warm_up()
+    for mode in RETRIEVAL_MODES:
+        for rerank in (False, True):
+            result = evaluate_retrieval(
+                lambda question, k: engine.retrieve(question, mode=mode, rerank=rerank, k=k), queries)
+            print(f"{mode:<7} rerank={rerank!s:<5} recall@4={result['recall_at_k']:.2f} "
+                  f"mean latency={1000 * result['mean_latency']:.1f} ms")
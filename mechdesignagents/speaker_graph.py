@@ -0,0 +1,160 @@
+import re
+
+# Who speaks after whom in the design workflow. An agent that is not part of a
+# chat is skipped over, e.g. User -> Designer_Expert when there is no Function_Call_Agent.
+DESIGN_WORKFLOW = {
+    "User": ["Function_Call_Agent"],
+    "Function_Call_Agent": ["User", "Designer_Expert"],
+    "Designer_Expert": ["CAD_coder_assistant"],
+    "CAD_coder_assistant": ["CadQuery_Code_Writer"],
+    "CadQuery_Code_Writer": ["Executor"],
+    "Executor": ["Reviewer", "CadQuery_Code_Writer"],
+    "Reviewer": ["User", "CadQuery_Code_Writer"],
+}
+
+# (speaker, pattern, next speaker), matched case-insensitively against the last message.
+# When the matching rules point at different agents the choice is left to the LLM.
+DESIGN_RULES = [
+    ("Function_Call_Agent", r"\b(?:no|not|cannot|can't)\b[^.\n]*\bfunction", "Designer_Expert"),
+    # Rejected by the static check, the code was not run and the writer is asked directly
+    ("Executor", r"Code output: Static check failed", "CadQuery_Code_Writer"),
+    ("Executor", r"exitcode: \d+ \(execution (?:succeeded|failed)\)\nCode output: (?!Static check failed)", "Reviewer"),
+    ("Reviewer", r"(?:ran|runs|executed) successfully|was successful", "User"),
+    ("Reviewer", r"execution failed|(?<!no )(?<!without )\berrors?\b|\bfix|\bmodify|\bchange", "CadQuery_Code_Writer"),
+]
+
+# Explicit hand-offs such as "Forwarding to the Designer Expert" or "pass this to the coder"
+HANDOFF = re.compile(r"\b(?:forward(?:ing|ed)?|pass(?:ing)?|hand(?:ing)? (?:it |this )?over)\b[^.\n]{0,40}?"
+                     r"\bto (?:the )?([a-z][\w ]{2,40})", re.IGNORECASE)
+ALIASES = {
+    "Function_Call_Agent": ["function call agent", "function caller"],
+    "Designer_Expert": ["designer expert", "designer"],
+    "CAD_coder_assistant": ["cad coder assistant", "coder assistant"],
+    "CadQuery_Code_Writer": ["cadquery code writer", "code writer", "cad coder", "coder"],
+    "Executor": ["executor"],
+    "Reviewer": ["reviewer"],
+    "User": ["user"],
+}
+
+
+def message_text(message: dict) -> str:
+    """Text of a chat message, including the text parts of multimodal content."""
+    content = message.get("content")
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _called_functions(message: dict) -> list:
+    if message.get("function_call"):
+        return [message["function_call"].get("name")]
+    return [call["function"]["name"] for call in message.get("tool_calls") or []]
+
+
+class SpeakerRouter:
+    """
+    GroupChat speaker_selection_method that follows a declarative workflow graph.
+
+    The next speaker is picked without an LLM call when the last message settles
+    it: a tool call goes to the agent that can execute it, a tool result back to
+    the caller, then an explicit hand-off, the marker rules and finally the graph
+    are tried. Only when several successors remain does the fallback decide:
+    "auto" lets the GroupChatManager ask the LLM as before, "round_robin" picks
+    the agent after the last speaker in the chat's order without an LLM call.
+    Create one router per chat session.
+
+    Args:
+        workflow (dict): Agent name -> names of the agents that may speak next.
+        rules (list): (speaker, pattern, next speaker) marker rules.
+        fallback (str): "auto" or "round_robin".
+    """
+
+    def __init__(self, workflow=None, rules=None, fallback="auto"):
+        if fallback not in ("auto", "round_robin"):
+            raise ValueError(f"Unknown fallback {fallback!r}, use 'auto' or 'round_robin'")
+        self.workflow = workflow or DESIGN_WORKFLOW
+        self.rules = [(speaker, re.compile(pattern, re.IGNORECASE), target)
+                      for speaker, pattern, target in (rules or DESIGN_RULES)]
+        self.fallback = fallback
+        self.counts = {"tool": 0, "handoff": 0, "rule": 0, "graph": 0, "round_robin": 0, "llm": 0}
+
+    def successors(self, name: str, present) -> list:
+        """Agents in the chat that may follow name, skipping over agents missing from it."""
+        result, seen = [], {name}
+        pending = list(self.workflow.get(name, []))
+        while pending:
+            candidate = pending.pop(0)
+            if candidate in seen:
+                continue
+            seen.add(candidate)
+            if candidate in present:
+                result.append(candidate)
+            else:
+                pending.extend(self.workflow.get(candidate, []))
+        return result
+
+    def __call__(self, last_speaker, groupchat):
+        agents = {agent.name: agent for agent in groupchat.agents}
+        message = groupchat.messages[-1] if groupchat.messages else {}
+        name, reason = self._route(last_speaker.name, message, groupchat, agents)
+        self.counts[reason] += 1
+        return "auto" if name is None else agents[name]
+
+    def _route(self, speaker, message, groupchat, agents):
+        functions = _called_functions(message)
+        if functions:
+            executors = [agent.name for agent in groupchat.agents
+                         if all(agent.can_execute_function(function) for function in functions)]
+            # GroupChat's own function call filter handles the other cases
+            return (executors[0], "tool") if len(executors) == 1 else self._fallback(speaker, groupchat)
+        if message.get("tool_responses") or message.get("role") in ("tool", "function"):
+            for earlier in reversed(groupchat.messages[:-1]):
+                if _called_functions(earlier) and earlier.get("name") in agents:
+                    return earlier["name"], "rule"
+
+        allowed = self.successors(speaker, agents)
+        text = message_text(message)
+        for match in HANDOFF.finditer(text):
+            target = self._resolve(match.group(1), allowed)
+            if target:
+                return target, "handoff"
+        targets = {target for rule_speaker, pattern, target in self.rules
+                   if rule_speaker == speaker and target in allowed and pattern.search(text)}
+        if len(targets) == 1:
+            return targets.pop(), "rule"
+        if not targets and len(allowed) == 1:
+            return allowed[0], "graph"
+        return self._fallback(speaker, groupchat)
+
+    def _fallback(self, speaker, groupchat):
+        if self.fallback == "auto":
+            return None, "llm"
+        names = [agent.name for agent in groupchat.agents]
+        index = names.index(speaker) if speaker in names else -1
+        return names[(index + 1) % len(names)], "round_robin"
+
+    @staticmethod
+    def _resolve(phrase: str, allowed) -> str:
+        phrase = phrase.lower().replace("_", " ")
+        matches = [(len(alias), name) for name in allowed
+                   for alias in ALIASES.get(name, [name.lower().replace("_", " ")]) if phrase.startswith(alias)]
+        return max(matches)[1] if matches else None
+
+    def stats(self) -> dict:
+        """
+        Selections of the session by how they were made.
+
+        "saved" counts the selections that speaker_selection_method="auto" would
+        have sent to the LLM, i.e. all but tool call routing and LLM fallbacks.
+        Round-robin fallbacks count as saved.
+        """
+        selections = sum(self.counts.values())
+        return {"selections": selections, **self.counts,
+                "saved": selections - self.counts["tool"] - self.counts["llm"]}
+
+
+def format_routing_stats(stats: dict) -> str:
+    return (f"Speaker selection: {stats['selections']} turns, {stats['saved']} LLM calls saved "
+            f"({stats['rule']} rules, {stats['handoff']} hand-offs, {stats['graph']} graph, "
+            f"{stats['round_robin']} round robin), "
+            f"{stats['llm']} LLM fallbacks")
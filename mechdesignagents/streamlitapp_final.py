@@ -2,6 +2,7 @@ import streamlit as st
 from streamlit_stl import stl_from_file
 import os
 from chat_with_designer_expert_multimodal import multimodal_designers_chat
+from langchain_rag import streaming_to
 
 def initialize_session_state():
     if 'prompt' not in st.session_state:
@@ -30,6 +31,18 @@ def initialize_session_state():
 def update_stl_path(new_path):
     st.session_state.current_stl_path = new_path
 
+def make_rag_stream_sink(placeholder):
+    """Stream sink that shows RAG answers in a Streamlit placeholder as they arrive."""
+    parts = []
+    def sink(token, done):
+        if not parts and not done:
+            placeholder.empty()
+        parts.append(token)
+        placeholder.markdown("".join(parts))
+        if done:
+            parts.clear()
+    return sink
+
 def render_controls():
     # Text input for prompt
     prompt = st.text_input("Let's design", 
@@ -39,10 +52,12 @@ def render_controls():
     
     if st.button("Generate CAD Model"):
         if prompt:
-            with st.spinner("Generating CAD model..."):
-                stl_file = multimodal_designers_chat(prompt)
-                update_stl_path(stl_file)
-                st.rerun()
+            # The CAD coder assistant's documentation lookups appear here as they stream
+            with streaming_to(make_rag_stream_sink(st.empty())):
+                with st.spinner("Generating CAD model..."):
+                    stl_file = multimodal_designers_chat(prompt)
+            update_stl_path(stl_file)
+            st.rerun()
 
     st.subheader("Visualization Controls")
     
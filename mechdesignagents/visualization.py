@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+
+
+class NullSink:
+    """Headless sink, models are never tessellated for display."""
+
+    enabled = False
+
+    def show(self, obj, name=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class OCPSink:
+    """Send models to the ocp_vscode viewer synchronously."""
+
+    enabled = True
+
+    def __init__(self):
+        self._show_object = None
+
+    def show(self, obj, name=None):
+        if self._show_object is None:
+            # Imported on first use so headless runs never load the viewer client
+            from ocp_vscode import show_object
+            self._show_object = show_object
+        if name is None:
+            self._show_object(obj)
+        else:
+            self._show_object(obj, name=name)
+
+    def close(self):
+        pass
+
+
+class DeferredSink:
+    """
+    Push models to another sink from a background thread so callers never wait
+    on tessellation or viewer I/O.
+
+    Only the newest models are kept when the viewer falls behind, older pending
+    ones are dropped since they would be replaced on screen anyway.
+
+    Args:
+        sink: Sink doing the actual display, OCPSink by default.
+        max_pending (int): Models waiting to be shown before old ones are dropped.
+    """
+
+    enabled = True
+
+    def __init__(self, sink=None, max_pending=4):
+        self.sink = sink or OCPSink()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="visualization-sink", daemon=True)
+        self._thread.start()
+        self.shown = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def show(self, obj, name=None):
+        while True:
+            try:
+                self._queue.put_nowait((obj, name))
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self.sink.show(*item)
+                self.shown += 1
+            except Exception as e:
+                # A missing or closed viewer must not affect the design session
+                self.errors += 1
+                print(f"Visualization failed: {e}")
+
+    def close(self, timeout=5.0):
+        """Show what is still queued, then stop the worker thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+SINKS = {"none": NullSink, "ocp": OCPSink, "deferred": DeferredSink}
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def make_visualization_sink(name: str):
+    if name not in SINKS:
+        raise ValueError(f"Unknown visualization sink {name!r}, expected one of {sorted(SINKS)}")
+    return SINKS[name]()
+
+
+def get_visualization_sink():
+    """Sink used by the CAD templates, chosen by CAD_VIEWER (none, ocp or deferred), none by default."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = make_visualization_sink(os.environ.get("CAD_VIEWER", "none"))
+        return _sink
+
+
+def set_visualization_sink(sink):
+    """
+    Replace the sink used by the CAD templates.
+
+    Args:
+        sink: A sink instance or one of "none", "ocp", "deferred".
+    """
+    global _sink
+    if isinstance(sink, str):
+        sink = make_visualization_sink(sink)
+    with _sink_lock:
+        previous, _sink = _sink, sink
+    if previous is not None and previous is not sink:
+        previous.close()
+    return sink
+
+
+def show_model(obj, name=None):
+    """Display a model through the current sink, a no-op in headless runs."""
+    get_visualization_sink().show(obj, name)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The app runs from mechdesignagents/ (python main.py), so its modules import each other flat
+MODULE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mechdesignagents")
+if MODULE_DIR not in sys.path:
+    sys.path.insert(0, MODULE_DIR)
@@ -0,0 +1,38 @@
+from artifact_store import ArtifactStore, content_hash
+
+STEP = """ISO-10303-21;
+HEADER;
+FILE_NAME('box.step','{timestamp}',('Author'),(''),'Open CASCADE STEP processor 7.7','','Unknown');
+ENDSEC;
+DATA;
+#1 = APPLICATION_PROTOCOL_DEFINITION('international standard','automotive_design',2000,#2);
+#7 = PRODUCT('Open CASCADE STEP translator 7.7 {counter}','Open CASCADE STEP translator 7.7 {counter}','',(#8));
+#20 = CARTESIAN_POINT('',({x},0.,0.));
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+
+def write(path, text):
+    path.write_text(text)
+    return path
+
+
+def test_step_hash_ignores_timestamp_and_counter(tmp_path):
+    a = write(tmp_path / "a.step", STEP.format(timestamp="2026-01-01T10:00:00", counter=1, x="10."))
+    b = write(tmp_path / "b.step", STEP.format(timestamp="2026-03-02T11:30:00", counter=7, x="10."))
+    c = write(tmp_path / "c.step", STEP.format(timestamp="2026-01-01T10:00:00", counter=1, x="20."))
+    assert content_hash(a) == content_hash(b)
+    assert content_hash(a) != content_hash(c)
+
+
+def test_step_without_data_section_is_hashed_whole(tmp_path):
+    # Both end in the same byte, hashing from find() == -1 made them equal
+    first = write(tmp_path / "first.step", "ISO-10303-21;\nHEADER;\nFILE_NAME('first.step');\n")
+    second = write(tmp_path / "second.step", "ISO-10303-21;\nHEADER;\nFILE_NAME('second.step');\n")
+    assert content_hash(first) != content_hash(second)
+
+    store = ArtifactStore(str(tmp_path / "store"))
+    stored = [store.add_file(path, path.name, session_id="s") for path in (first, second)]
+    assert stored[0].read_text() != stored[1].read_text()
+    assert store.stats() == {"stored": 2, "deduplicated": 0}
@@ -0,0 +1,54 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("cadquery")
+
+import cad_batch
+
+# Variant 0 is stuck in a call the in-worker alarm cannot interrupt, like OCCT.
+# Variants 1 and 2 run past the timeout but within the grace, they cancel the
+# alarm like a long native call would.
+TEMPLATES = """
+import signal
+import time
+
+
+def variant(index, seconds):
+    if index == 0:
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    time.sleep(seconds)
+    return f"built {index}"
+"""
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    (tmp_path / "batch_templates.py").write_text(TEMPLATES)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(cad_batch, "TEMPLATE_MODULE", "batch_templates")
+    monkeypatch.setattr(cad_batch, "HARD_TIMEOUT_GRACE", 1.5)
+    monkeypatch.setattr(cad_batch, "POLL_SECONDS", 0.1)
+    monkeypatch.chdir(tmp_path)
+
+
+def test_resubmitted_tasks_are_timed_in_the_new_pool(templates, tmp_path, monkeypatch):
+    warm_up = cad_batch._warm_up_worker
+
+    def slow_warm_up(*args):
+        # Loading the real templates takes a while, the restarted task must not age meanwhile
+        time.sleep(1.5)
+        warm_up(*args)
+
+    monkeypatch.setattr(cad_batch, "_warm_up_worker", slow_warm_up)
+    manifest = tmp_path / "manifest.jsonl"
+    # The pool is killed ~2 s after variant 0 started, variant 2 has then run for ~1 s
+    variants = [{"index": 0, "seconds": 60}, {"index": 1, "seconds": 1.0}, {"index": 2, "seconds": 1.5}]
+    summary = cad_batch.run_batch("variant", variants, str(manifest), max_workers=2, timeout=0.5)
+    rows = {row["index"]: row for row in map(json.loads, manifest.read_text().splitlines())}
+    assert rows[0]["status"] == "timeout"
+    assert rows[1]["status"] == "ok"
+    assert rows[2]["status"] == "ok", rows[2]["error"]
+    assert summary["timeout"] == 1
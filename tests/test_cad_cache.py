@@ -0,0 +1,115 @@
+import importlib
+import sys
+
+import pytest
+
+pytest.importorskip("cadquery")
+
+import cad_cache
+from cad_cache import GeometryCache, cached_cad_function, code_version
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = GeometryCache(tmp_path / "cache")
+    monkeypatch.setattr(cad_cache, "_default_cache", cache)
+    return cache
+
+
+def test_key_includes_code_version(cache):
+    params = {"length": 10, "width": 5.0}
+    assert cache.key("plate", params, "v1") == cache.key("plate", {"width": 5, "length": 10.0}, "v1")
+    assert cache.key("plate", params, "v1") != cache.key("plate", params, "v2")
+
+
+def test_new_template_version_misses(cache):
+    calls = []
+
+    def plate(length=10):
+        calls.append(length)
+        return f"plate {length}"
+
+    v1 = cached_cad_function(version="1")(plate)
+    assert v1(10) == v1(length=10) == "plate 10"
+    assert calls == [10]
+    assert cached_cad_function(version="2")(plate)(10) == "plate 10"
+    assert calls == [10, 10]
+    assert cache.stats()["hits"] == 1
+
+
+def test_code_version_follows_source_edits(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module_file = tmp_path / "plate_template.py"
+    module_file.write_text("def plate(length):\n    return length * 2\n")
+    module = importlib.import_module("plate_template")
+    try:
+        before = code_version(cached_cad_function(module.plate))
+        assert code_version(module.plate) == before
+        module_file.write_text("def plate(length):\n    return length * 3\n")
+        module = importlib.reload(module)
+        assert code_version(module.plate) != before
+    finally:
+        sys.modules.pop("plate_template", None)
+
+
+HELPER = "def plate_volume(length, width):\n    return length * width * {thickness}\n"
+TEMPLATE = "import helpers\n\n\ndef plate(length, width):\n    return helpers.plate_volume(length, width)\n"
+
+
+def test_code_version_follows_helper_module_edits(tmp_path, monkeypatch):
+    (tmp_path / "helpers.py").write_text(HELPER.format(thickness=5))
+    (tmp_path / "templates.py").write_text(TEMPLATE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        templates = importlib.import_module("templates")
+        before = code_version(templates.plate, root=tmp_path)
+        assert code_version(templates.plate, root=tmp_path) == before
+        # Only the helper changes, the template source stays the same
+        (tmp_path / "helpers.py").write_text(HELPER.format(thickness=8))
+        assert code_version(templates.plate, root=tmp_path) != before
+    finally:
+        sys.modules.pop("templates", None)
+        sys.modules.pop("helpers", None)
+
+
+def test_key_includes_export_settings(cache, monkeypatch):
+    calls = []
+
+    def plate(length=10):
+        calls.append(length)
+        return f"plate {length}"
+
+    template = cached_cad_function(version="1")(plate)
+    monkeypatch.delenv("CAD_TRIANGLE_BUDGET", raising=False)
+    template(10)
+    template(10)
+    monkeypatch.setenv("CAD_TRIANGLE_BUDGET", "5000")
+    template(10)
+    assert calls == [10, 10]
+    assert cache.key("plate", {}, "1", {"triangle_budget": 5000}) != cache.key("plate", {}, "1", {"triangle_budget": None})
+
+
+def test_hit_without_model_is_rebuilt(cache, tmp_path, monkeypatch):
+    import cadquery as cq
+
+    from artifact_store import ArtifactStore
+
+    monkeypatch.setattr("artifact_store._default_store", ArtifactStore(str(tmp_path / "out")))
+    calls = []
+
+    def block(size=5):
+        calls.append(size)
+        model = cq.Workplane("XY").box(size, size, size)
+        path = tmp_path / "block.step"
+        cq.exporters.export(model, str(path))
+        cad_cache.record_export(model, path)
+        return f"block written to {path}"
+
+    template = cached_cad_function(version="1")(block)
+    template(5)
+    (entry,) = [p for p in cache.root.iterdir() if not p.name.startswith(".")]
+    (entry / "shape.brep").unlink()
+    with cad_cache.recording_exports() as exports:
+        template(5)
+    assert calls == [5, 5]
+    assert exports and all(model is not None for model, _ in exports)
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+pytest.importorskip("cadquery")
+
+from checkpoint_exec import CheckpointStore, prefix_fingerprints, run_incremental, split_statements  # noqa: E402
+
+SCRIPT = """import cadquery as cq
+
+def plate(width):
+    return cq.Workplane("XY").box(width, 20, 5)
+
+part = plate(40).edges("|Z").fillet(2)
+volume = part.val().Volume()
+print("volume", round(volume))
+"""
+
+
+def test_fingerprints_ignore_formatting():
+    reformatted = SCRIPT.replace("(40)", "( 40 )").replace("import cadquery as cq\n", "import cadquery as cq  # cad\n")
+    assert prefix_fingerprints(split_statements(SCRIPT)) == prefix_fingerprints(split_statements(reformatted))
+    changed = prefix_fingerprints(split_statements(SCRIPT.replace("(40)", "(50)")))
+    assert changed[:2] == prefix_fingerprints(split_statements(SCRIPT))[:2]
+    assert changed[2] != prefix_fingerprints(split_statements(SCRIPT))[2]
+
+
+def test_resume_from_unchanged_prefix(tmp_path, capsys):
+    store = CheckpointStore(tmp_path)
+    first_namespace = {"__name__": "__main__"}
+    first = run_incremental(SCRIPT, store, namespace=first_namespace, min_seconds=0)
+    assert first["resumed_from"] == 0
+    assert first["checkpoints"] > 0
+    capsys.readouterr()
+
+    edited = SCRIPT.replace('print("volume", round(volume))', 'print("area", round(part.val().Area()))')
+    namespace = {"__name__": "__main__"}
+    second = run_incremental(edited, store, namespace=namespace, min_seconds=0)
+    assert second["resumed_from"] == 4
+    # Values restored from the checkpoint, the def is re-run
+    assert namespace["volume"] == pytest.approx(first_namespace["volume"])
+    assert callable(namespace["plate"])
+    assert capsys.readouterr().out.startswith("area ")
+
+
+def test_no_checkpoint_after_side_effects(tmp_path):
+    script = SCRIPT.replace("volume = part", 'cq.exporters.export(part, "part.step")\nvolume = part')
+    store = CheckpointStore(tmp_path / "store")
+    cwd = tmp_path / "run"
+    cwd.mkdir()
+    previous = os.getcwd()
+    os.chdir(cwd)
+    try:
+        run_incremental(script, store, min_seconds=0)
+        edited = script.replace("round(volume)", "volume")
+        report = run_incremental(edited, store, min_seconds=0)
+    finally:
+        os.chdir(previous)
+    # The export is re-run, only the statements before it are skipped
+    assert report["resumed_from"] == 3
+
+
+OCP_VSCODE_STUB = """import enum
+import threading
+
+DEFAULT_PORT = 3939
+viewer_lock = threading.Lock()
+
+
+class Camera(enum.Enum):
+    RESET = "reset"
+
+
+def show(*objects, **options):
+    pass
+"""
+
+
+def test_resume_with_the_writer_prompt_header(tmp_path, monkeypatch):
+    # The writer prompt makes every script star-import ocp_vscode, which is not installed here
+    (tmp_path / "ocp_vscode.py").write_text(OCP_VSCODE_STUB)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    script = ("# filename: plate.py\nimport cadquery as cq\nfrom ocp_vscode import * #never forget this line\n"
+              + SCRIPT.split("\n", 1)[1] + "show(part)\n")
+    store = CheckpointStore(tmp_path / "store")
+    first = run_incremental(script, store, min_seconds=0)
+    assert first["checkpoints"] == 3
+    edited = script.replace('print("volume", round(volume))', 'print("volume", volume)')
+    assert run_incremental(edited, store, min_seconds=0)["resumed_from"] == 5
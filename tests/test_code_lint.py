@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("cadquery")
+
+from code_lint import _introspect, has_errors, lint_code, lint_code_blocks, lint_message  # noqa: E402
+
+GOOD = """# filename: box.py
+import cadquery as cq
+from ocp_vscode import *
+
+box = cq.Workplane("XY").box(10, 20, 30).faces(">Z").workplane().hole(5)
+cq.exporters.export(box, "box.stl")
+show(box)
+"""
+
+
+@pytest.fixture(scope="module")
+def api():
+    return _introspect()
+
+
+def codes(diagnostics):
+    return sorted(d["code"] for d in diagnostics)
+
+
+def test_valid_script_is_clean(api):
+    assert lint_code(GOOD, api) == []
+
+
+@pytest.mark.parametrize("line, code", [
+    ('box = cq.Workplane("XY").box(10, 20, 30).filet(1)', "unknown-method"),
+    ('box = cq.Workplane("XZY").box(10, 20, 30)', "unknown-plane"),
+    ('box = cq.Workplane("XY").box(10, 20, 30, 1, 2, 3, 4)', "too-many-arguments"),
+    ('box = cq.Workplane("XY").box(10, 20, 30, center=True, size=3)', "unknown-keyword"),
+    ('box = cq.Workplane("XY").box(10, 20)', "missing-argument"),
+    ('box = cq.Workplane("XY").box(float(input()), 20, 30)', "blocking-input"),
+])
+def test_errors(api, line, code):
+    script = GOOD.replace('box = cq.Workplane("XY").box(10, 20, 30).faces(">Z").workplane().hole(5)', line)
+    diagnostics = lint_code(script, api)
+    assert code in codes(diagnostics)
+    assert has_errors(diagnostics)
+
+
+def test_suggestion_for_misspelled_method(api):
+    diagnostics = lint_code(GOOD.replace(".hole(5)", ".hol(5)"), api)
+    assert "hole" in diagnostics[0]["message"]
+
+
+def test_show_without_import(api):
+    assert codes(lint_code(GOOD.replace("from ocp_vscode import *\n", ""), api)) == ["missing-import"]
+
+
+def test_syntax_error(api):
+    assert codes(lint_code("import cadquery as cq\nbox = (", api)) == ["syntax-error"]
+
+
+def test_no_export_is_only_a_warning(api):
+    diagnostics = lint_code(GOOD.replace('cq.exporters.export(box, "box.stl")\n', ""), api)
+    assert codes(diagnostics) == ["no-export"]
+    assert not has_errors(diagnostics)
+
+
+def test_message_with_several_blocks(api):
+    message = f"```python\n{GOOD}```\nand\n```python\n{GOOD}```"
+    assert "multiple-blocks" in codes(lint_message(message, api))
+    assert lint_code_blocks([("python", GOOD)], api) == []
@@ -0,0 +1,112 @@
+import pytest
+
+import context_compaction
+from context_compaction import CompactHistory, compaction_stats, count_tokens
+
+
+class WhitespaceEncoding:
+    # tiktoken is not needed to check what is kept, one token per word
+    def encode(self, text):
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def encoding(monkeypatch):
+    monkeypatch.setattr(context_compaction, "_encoding", lambda model: WhitespaceEncoding())
+
+
+def code(name, body="box = cq.Workplane().box(1, 2, 3)"):
+    return f"Here is the code:\n```python\n# filename: {name}\nimport cadquery as cq\n{body}\n```"
+
+
+def result(exit_code, output):
+    status = "succeeded" if exit_code == 0 else "failed"
+    return f"exitcode: {exit_code} (execution {status})\nCode output: {output}"
+
+
+def design_chat():
+    return [
+        {"role": "user", "name": "Designer_Expert", "content": "Hello, I plan the designs."},
+        {"role": "user", "name": "User", "content": "Design a plate with a hole"},
+        {"role": "user", "name": "Designer_Expert", "content": "Plan 1: a 100 mm plate\nwith a 10 mm hole"},
+        {"role": "user", "name": "CadQuery_Code_Writer", "content": code("plate.py")},
+        {"role": "user", "name": "Executor", "content": result(1, "Traceback\nNameError: boxx")},
+        {"role": "user", "name": "Designer_Expert", "content": "Plan 2: a 120 mm plate\nwith a 12 mm hole"},
+        {"role": "user", "name": "CadQuery_Code_Writer", "content": code("plate.py", "box = cq.Workplane().box(4, 5, 6)")},
+        {"role": "user", "name": "Executor", "content": result(0, "built plate.stl")},
+        {"role": "user", "name": "Reviewer", "content": "The code ran successfully."},
+    ]
+
+
+def test_keeps_request_and_latest_plan_code_and_result():
+    messages = design_chat()
+    compacted = CompactHistory(max_tokens=10_000).apply_transform(messages)
+    contents = [m["content"] for m in compacted]
+    assert contents[:2] == [messages[0]["content"], messages[1]["content"]]
+    assert contents[5:] == [m["content"] for m in messages[5:]]
+    # The input is not modified, AutoGen keeps using it
+    assert messages == design_chat()
+
+
+def test_summarizes_superseded_plan_code_and_result():
+    compacted = CompactHistory(max_tokens=10_000).apply_transform(design_chat())
+    assert compacted[2]["content"] == "[superseded plan: Plan 1: a 100 mm plate]"
+    assert compacted[3]["content"].startswith("Here is the code:\n[superseded code: plate.py, 3 lines, sha1 ")
+    assert compacted[4]["content"] == "[earlier execution: exitcode: 1 (execution failed), last line: NameError: boxx]"
+
+
+def test_drops_oldest_unprotected_messages_over_budget():
+    messages = design_chat()
+    # 117 tokens after summarizing, dropping the superseded plan (12) is enough
+    compacted = CompactHistory(max_tokens=110).apply_transform(messages)
+    assert compacted[2]["content"] == "[1 earlier messages omitted to fit the context budget]"
+    assert compacted[3]["content"].startswith("Here is the code:\n[superseded code: plate.py")
+    assert len(compacted) == len(messages)
+
+
+def test_protected_messages_are_kept_over_budget():
+    messages = design_chat()
+    transform = CompactHistory(max_tokens=40)
+    compacted = transform.apply_transform(messages)
+    assert compacted[2]["content"] == "[3 earlier messages omitted to fit the context budget]"
+    assert [m["content"] for m in compacted[:2]] == [m["content"] for m in messages[:2]]
+    assert [m["content"] for m in compacted[3:]] == [m["content"] for m in messages[5:]]
+    before, after = transform.turns[-1]
+    assert (before, after) == (count_tokens(messages), count_tokens(compacted))
+    assert after < before
+
+
+def test_tool_call_and_response_are_dropped_together():
+    messages = [
+        {"role": "user", "name": "User", "content": "Design a plate"},
+        {"role": "assistant", "name": "Designer_Expert", "content": None,
+         "tool_calls": [{"id": "1", "type": "function",
+                         "function": {"name": "create_plate", "arguments": '{"length": 100, "width": 50}'}}]},
+        {"role": "tool", "tool_call_id": "1", "content": "plate.stl written " * 20},
+        {"role": "user", "name": "Designer_Expert", "content": "The plate is done"},
+        {"role": "user", "name": "User", "content": "Thanks"},
+    ]
+    compacted = CompactHistory(max_tokens=30).apply_transform(messages)
+    assert [m.get("role") for m in compacted] == ["user", "user", "user", "user"]
+    assert compacted[1]["content"] == "[2 earlier messages omitted to fit the context budget]"
+
+
+def test_stats_sum_turns():
+    transform = CompactHistory(max_tokens=10_000)
+    transform.apply_transform(design_chat())
+    stats = compaction_stats({"Reviewer": transform})
+    assert stats["Reviewer"]["turns"] == stats["total"]["turns"] == 1
+    assert stats["total"]["after"] < stats["total"]["before"]
+
+
+def test_writer_script_kept_when_a_snippet_follows():
+    messages = design_chat()
+    messages[-1] = {"role": "user", "name": "Reviewer",
+                    "content": "Use a fillet instead:\n```python\nbox = box.edges('|Z').fillet(1)\n```\n"
+                               "Please send the complete script again."}
+    messages.append({"role": "user", "name": "User", "content": "Go ahead"})
+    compacted = CompactHistory(max_tokens=10_000).apply_transform(messages)
+    # The writer's current script and the snippet after it are both verbatim, the earlier script is not
+    assert compacted[6]["content"] == messages[6]["content"]
+    assert compacted[8]["content"] == messages[8]["content"]
+    assert "[superseded code: plate.py" in compacted[3]["content"]
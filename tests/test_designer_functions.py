@@ -0,0 +1,44 @@
+import ast
+import os
+
+import pytest
+
+from conftest import MODULE_DIR
+
+designer_functions = pytest.importorskip("designer_functions")
+
+
+class FakeAgent:
+    def __init__(self):
+        self.function_map = {}
+        self.llm_functions = []
+
+    def register_function(self, function_map):
+        self.function_map.update(function_map)
+
+    def register_for_llm(self, description):
+        def decorator(func):
+            self.llm_functions.append((func.__name__, description))
+            return func
+        return decorator
+
+
+def test_templates_registered_with_both_agents():
+    user, caller = FakeAgent(), FakeAgent()
+
+    designer_functions.register_cad_templates(user, caller)
+
+    names = [func.__name__ for func, _ in designer_functions.CAD_TEMPLATES]
+    assert "create_box" in names
+    assert sorted(user.function_map) == sorted(names)
+    assert [name for name, _ in caller.llm_functions] == names
+
+
+def test_agent_team_registers_the_templates():
+    # build_agents needs autogen and an API key, so check the call is in it
+    with open(os.path.join(MODULE_DIR, "agents_v2.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    build = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == "build_agents")
+    calls = [node.func.id for node in ast.walk(build)
+             if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)]
+    assert "register_cad_templates" in calls
@@ -0,0 +1,70 @@
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+# engdrawingagents/ has its own langchain_rag module, loaded under another name
+spec = importlib.util.spec_from_file_location(
+    "engdrawing_langchain_rag",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "engdrawingagents", "langchain_rag.py"))
+engdrawing_rag = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(engdrawing_rag)
+MmapVectorIndex = engdrawing_rag.MmapVectorIndex
+
+WORDS = ["dimension", "tolerance", "section", "datum"]
+
+
+class FakeEmbeddings:
+    # One axis per keyword, enough to check the ranking
+    def embed_query(self, text):
+        return [float(text.lower().count(word)) for word in WORDS]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def splits(*texts):
+    return [Document(page_content=text, metadata={"page": i}) for i, text in enumerate(texts)]
+
+
+def test_build_load_search_round_trip(tmp_path):
+    MmapVectorIndex.write(str(tmp_path), splits("Dimension lines and dimension text", "Section views ∅ cut planes",
+                                                "Datum features"), FakeEmbeddings(), "drawing.pdf", "abc")
+    index = MmapVectorIndex(str(tmp_path))
+    assert index.metadata["source_hash"] == "abc"
+    assert index.matrix.shape == (3, len(WORDS))
+    assert index.text(1) == "Section views ∅ cut planes"
+    docs = index.similarity_search("How is a section drawn?", FakeEmbeddings(), k=2)
+    assert docs[0].page_content == "Section views ∅ cut planes"
+    assert docs[0].metadata["page"] == 1
+
+
+def test_rebuild_leaves_open_index_intact(tmp_path):
+    MmapVectorIndex.write(str(tmp_path), splits("Datum features", "Dimension text"), FakeEmbeddings())
+    old = MmapVectorIndex(str(tmp_path))
+    old_files = set(old.metadata["files"].values())
+    MmapVectorIndex.write(str(tmp_path), splits("Tolerance stack", "Section views", "Datum A"), FakeEmbeddings())
+
+    # The old mapping still reads the old build, new readers get the new one
+    assert old.text(1) == "Dimension text"
+    assert np.asarray(old.matrix).shape == (2, len(WORDS))
+    new = MmapVectorIndex(str(tmp_path))
+    assert new.text(0) == "Tolerance stack"
+    assert sorted(os.listdir(tmp_path)) == sorted(["metadata.json", *new.metadata["files"].values()])
+    assert not old_files & set(os.listdir(tmp_path))
+
+
+def test_empty_document_is_rejected(tmp_path):
+    MmapVectorIndex.write(str(tmp_path), splits("Datum features"), FakeEmbeddings())
+    with pytest.raises(ValueError):
+        MmapVectorIndex.write(str(tmp_path), splits("", ""), FakeEmbeddings(), "scanned.pdf")
+    # The previous build is still the index
+    with open(tmp_path / "metadata.json") as f:
+        assert len(json.load(f)["chunks"]) == 1
+    assert MmapVectorIndex(str(tmp_path)).text(0) == "Datum features"
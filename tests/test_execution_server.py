@@ -0,0 +1,111 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import MODULE_DIR
+
+pytest.importorskip("cadquery")
+
+BOX = """# filename: box.py
+import cadquery as cq
+box = cq.Workplane("XY").box(10, 20, 30)
+cq.exporters.export(box, "box.step")
+cq.exporters.export(box, "box.stl")
+print("built")
+"""
+
+
+def run_like_main(source: str, timeout=300) -> dict:
+    """
+    Run source the way `python main.py` runs the app: cwd mechdesignagents/, which is
+    also sys.path[0], and no package on the path. The last stdout line is parsed as JSON.
+    """
+    prelude = "import os, sys\nsys.path[0] = os.getcwd()\n"
+    env = {key: value for key, value in os.environ.items() if key not in ("PYTHONPATH", "CAD_EXEC_SOCKET")}
+    proc = subprocess.run([sys.executable, "-c", prelude + source], cwd=MODULE_DIR, env=env,
+                          capture_output=True, text=True, timeout=timeout)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_server_job_from_app_dir(tmp_path):
+    result = run_like_main(f"""
+import json
+from execution_server import CadExecutionServer
+server = CadExecutionServer({str(tmp_path)!r}, workers=1)
+result = server.run({BOX!r}, session_id="alice")
+server.close()
+print(json.dumps(result))
+""")
+    assert result["exit_code"] == 0, result["stderr"]
+    assert result["stdout"].strip() == "built"
+    assert result["geometry"].startswith("Geometry: valid"), result["geometry"]
+    # Outputs are published to the session directory under content-hashed names
+    names = sorted(os.path.basename(path) for path in result["artifacts"])
+    assert [name.split("-")[0] for name in names] == ["box", "box"]
+    assert [os.path.splitext(name)[1] for name in names] == [".step", ".stl"]
+    assert all(os.path.dirname(path) == str(tmp_path / "alice") for path in result["artifacts"])
+    assert all(os.path.exists(path) for path in result["artifacts"])
+
+
+def test_sessions_writing_the_same_name_do_not_collide(tmp_path):
+    small = BOX.replace("box(10, 20, 30)", "box(1, 2, 3)")
+    results = run_like_main(f"""
+import json
+from execution_server import CadExecutionServer
+server = CadExecutionServer({str(tmp_path)!r}, workers=1)
+results = [server.run({BOX!r}, session_id="alice"), server.run({small!r}, session_id="bob"), server.run({BOX!r})]
+server.close()
+print(json.dumps(results))
+""")
+    alice, bob, anonymous = (sorted(result["artifacts"]) for result in results)
+    assert all(path.startswith(str(tmp_path / "alice")) for path in alice)
+    assert all(path.startswith(str(tmp_path / "bob")) for path in bob)
+    # Without a session the job id keeps the files apart
+    assert not set(anonymous) & set(alice + bob)
+    stls = [paths[1] for paths in (alice, bob)]
+    with open(stls[0], "rb") as a, open(stls[1], "rb") as b:
+        assert a.read() != b.read()
+
+
+def test_incremental_job_from_app_dir(tmp_path):
+    # Slow statements get checkpoints, the edit is after them. The sleep keeps the
+    # build over CHECKPOINT_MIN_SECONDS on fast machines.
+    script = ('import time\n'
+              'import cadquery as cq\n'
+              'box = time.sleep(0.2) or cq.Workplane("XY").box(10, 20, 30).edges("|Z").fillet(2).faces(">Z").shell(-1)\n'
+              'print(round(box.val().Volume()))\n')
+    result = run_like_main(f"""
+import json
+from execution_server import CadExecutionServer
+server = CadExecutionServer({str(tmp_path)!r}, workers=1)
+first = server.run({script!r}, session_id="smoke")
+second = server.run({script.replace("Volume", "Area")!r}, session_id="smoke")
+server.close()
+print(json.dumps([first, second]))
+""")
+    first, second = result
+    assert first["exit_code"] == 0, first["stderr"]
+    assert second["exit_code"] == 0, second["stderr"]
+    assert first["incremental"]["resumed_from"] == 0
+    assert second["incremental"]["resumed_from"] == 3
+
+
+def test_code_executor_from_app_dir(tmp_path):
+    pytest.importorskip("autogen")
+    result = run_like_main(f"""
+import json
+from autogen.coding import CodeBlock
+from execution_server import CadExecutionServer, CadQueryCodeExecutor
+server = CadExecutionServer({str(tmp_path)!r}, workers=1)
+executor = CadQueryCodeExecutor(backend=server)
+result = executor.execute_code_blocks([CodeBlock(code={BOX!r}, language="python")])
+server.close()
+print(json.dumps({{"exit_code": result.exit_code, "output": result.output}}))
+""")
+    assert result["exit_code"] == 0, result["output"]
+    assert "Files written: " in result["output"]
+    assert "Geometry: valid" in result["output"]
@@ -0,0 +1,60 @@
+import pytest
+
+cq = pytest.importorskip("cadquery")
+
+import export_pipeline
+from export_pipeline import ADAPTIVE_TOLERANCE_LIMITS, tessellate_within_budget
+
+
+def test_reported_tolerance_is_the_one_used(monkeypatch):
+    calls = []
+    tessellate = export_pipeline.tessellate
+
+    def recording_tessellate(shape, tolerance, angular_tolerance):
+        calls.append({"tolerance": tolerance, "angular_tolerance": angular_tolerance})
+        return tessellate(shape, tolerance, angular_tolerance)
+
+    monkeypatch.setattr(export_pipeline, "tessellate", recording_tessellate)
+    box = cq.Workplane("XY").box(500, 500, 500).val()
+    # A box always has 12 triangles, the budget can never be met
+    vertices, triangles, used = tessellate_within_budget(
+        box, {"tolerance": 0.05, "angular_tolerance": 0.1}, triangle_budget=5)
+    assert len(triangles) == 12
+    assert used == calls[-1]
+    assert used["tolerance"] <= ADAPTIVE_TOLERANCE_LIMITS[1]
+
+
+def test_budget_met_on_the_first_pass():
+    sphere = cq.Workplane("XY").sphere(10).val()
+    settings = {"tolerance": 0.5, "angular_tolerance": 0.5}
+    _, triangles, used = tessellate_within_budget(sphere, settings, triangle_budget=100_000)
+    assert used == settings
+    assert len(triangles) > 0
+
+
+def test_brep_writers_start_after_meshing(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from artifact_store import ArtifactStore
+
+    events = []
+    tessellate = export_pipeline.tessellate_within_budget
+
+    def recording_tessellate(*args, **kwargs):
+        events.append("mesh start")
+        result = tessellate(*args, **kwargs)
+        events.append("mesh end")
+        return result
+
+    def recording_export(*args, **kwargs):
+        events.append(f"export {kwargs['exportType']}")
+        return cq.exporters.export(*args, **kwargs)
+
+    monkeypatch.setattr(export_pipeline, "tessellate_within_budget", recording_tessellate)
+    monkeypatch.setattr(export_pipeline, "exporters", SimpleNamespace(export=recording_export))
+    part = cq.Workplane("XY").box(20, 10, 5).faces(">Z").hole(3)
+    report = export_pipeline.export_formats(part, tmp_path / "part.stl", formats=("step", "stl", "dxf", "glb"),
+                                            store=ArtifactStore(str(tmp_path / "store")))
+    assert events == ["mesh start", "mesh end", "export STEP", "export DXF"]
+    assert list(report["formats"]) == ["step", "stl", "dxf", "glb"]
+    assert all(info["path"].exists() and info["bytes"] > 0 for info in report["formats"].values())
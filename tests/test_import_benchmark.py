@@ -0,0 +1,25 @@
+from import_benchmark import import_time, unresolved_imports
+
+
+def test_app_imports_resolve_from_main_path():
+    assert unresolved_imports() == []
+
+
+def test_lazy_package_import_is_reported(tmp_path):
+    app = tmp_path / "app"
+    app.mkdir()
+    (app / "helpers.py").write_text("VALUE = 1\n")
+    (app / "main.py").write_text(
+        "import helpers\n"
+        "\n"
+        "def run():\n"
+        "    from app.helpers import VALUE\n"
+        "    return VALUE\n"
+    )
+    assert unresolved_imports(str(app)) == [("main.py", 4, "app.helpers")]
+
+
+def test_import_time_uses_main_path():
+    result = import_time("artifact_store")
+    assert result["error"] is None
+    assert result["import_seconds"] > 0
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_chroma")
+
+import langchain_rag  # noqa: E402
+from langchain_rag import RAGEngine, console_sink, stop_after_code_block, streaming_to  # noqa: E402
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+class FakeDoc:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+def test_semantic_cache_is_per_retrieval_variant(tmp_path, monkeypatch):
+    engine = RAGEngine(persist_directory=str(tmp_path), use_cache=False)
+    engine.embeddings = FakeEmbeddings()
+    monkeypatch.setattr(engine, "retrieve", lambda question, vector, mode, rerank: [FakeDoc("a")])
+
+    response, vector, chunk_ids, _ = engine._prepare("extrude a circle", mode="hybrid", rerank=True)
+    assert response is None
+    engine._store("extrude a circle", vector, chunk_ids, "hybrid answer", mode="hybrid", rerank=True)
+
+    assert engine._prepare("extrude a circle", mode="hybrid", rerank=True)[0] == "hybrid answer"
+    assert engine._prepare("extrude a circle", mode="dense", rerank=False)[0] is None
+
+
+def test_stream_sinks_are_per_thread():
+    seen = {}
+
+    def session(name):
+        def sink(token, done):
+            pass
+        with streaming_to(sink):
+            barrier.wait()
+            seen[name] = langchain_rag._stream_sinks.get()
+            barrier.wait()
+
+    barrier = threading.Barrier(2)
+    threads = [threading.Thread(target=session, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seen["a"]) == len(seen["b"]) == 2
+    assert seen["a"][1] is not seen["b"][1]
+    assert langchain_rag._stream_sinks.get() == (console_sink,)
+
+
+def test_stop_after_code_block():
+    assert not stop_after_code_block("Use this:\n```python\nimport cadquery")
+    assert stop_after_code_block("Use this:\n```python\nimport cadquery\n```")
+
+
+class FakeChain:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def stream(self, inputs):
+        yield from self.tokens
+
+
+def stream_engine(tmp_path, monkeypatch, tokens):
+    engine = RAGEngine(persist_directory=str(tmp_path), use_cache=False)
+    engine.embeddings = FakeEmbeddings()
+    engine.answer_chain = FakeChain(tokens)
+    monkeypatch.setattr(engine, "warm_up", lambda: 0.0)
+    monkeypatch.setattr(engine, "retrieve", lambda question, vector, mode, rerank: [FakeDoc("a")])
+    return engine
+
+
+def test_answer_stopped_after_code_block_is_cached(tmp_path, monkeypatch):
+    tokens = ["Use:\n```python\n", "box = cq.Workplane().box(1, 1, 1)\n", "```", "\nMore text"]
+    engine = stream_engine(tmp_path, monkeypatch, tokens)
+    answer = "".join(engine.stream("make a box", should_stop=stop_after_code_block))
+    assert answer == "".join(tokens[:3])
+    assert engine.metrics["cancelled"] == 1
+    assert engine._prepare("make a box")[0] == answer
+    assert engine.stats()["cold_calls"] + engine.stats()["warm_calls"] == 1
+
+
+def test_abandoned_stream_is_recorded_not_cached(tmp_path, monkeypatch):
+    engine = stream_engine(tmp_path, monkeypatch, ["Use:\n", "```python\n", "box = 1\n", "```"])
+    stream = engine.stream("make a box")
+    next(stream)
+    stream.close()
+    assert engine._prepare("make a box")[0] is None
+    assert engine.stats()["cold_calls"] + engine.stats()["warm_calls"] == 1
@@ -0,0 +1,71 @@
+import numpy as np
+
+from rag_cache import RAGQueryCache, SemanticAnswerCache, normalize_query
+
+
+def test_normalize_query_ignores_wording():
+    assert normalize_query("How to extrude a circle?") == normalize_query("extrude circle cadquery")
+    assert normalize_query("Fillet the edges") != normalize_query("Chamfer the edges")
+
+
+def test_normalize_query_keeps_word_order():
+    assert normalize_query("How do I convert STEP to STL?") == "convert step stl"
+    assert normalize_query("convert step to stl") != normalize_query("convert stl to step")
+    assert normalize_query("hole in a hole") == "hole hole"
+
+
+def test_order_dependent_questions_do_not_share_entries(tmp_path):
+    cache = RAGQueryCache(str(tmp_path / "cache.sqlite"))
+    cache.set_index_version("v1")
+    cache.put_chunk_ids("convert step to stl", ["step_import", "stl_export"])
+    cache.put_answer(["step_import", "stl_export"], "convert step to stl", "importStep, then export stl")
+    assert cache.get_chunk_ids("convert stl to step") is None
+    assert cache.get_answer(["step_import", "stl_export"], "convert stl to step") is None
+
+
+def test_query_cache_round_trip(tmp_path):
+    cache = RAGQueryCache(str(tmp_path / "cache.sqlite"))
+    cache.set_index_version("v1")
+    cache.put_chunk_ids("How do I extrude a circle?", ["a", "b"], variant="hybrid")
+    cache.put_answer(["a", "b"], "How do I extrude a circle?", "answer")
+
+    assert cache.get_chunk_ids("extrude circle", variant="hybrid") == ["a", "b"]
+    assert cache.get_chunk_ids("extrude circle", variant="dense") is None
+    assert cache.get_answer(["a", "b"], "extrude circle") == "answer"
+    assert cache.get_answer(["a", "c"], "extrude circle") is None
+
+
+def test_query_cache_invalidated_by_index_version(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = RAGQueryCache(path)
+    cache.set_index_version("v1")
+    cache.put_chunk_ids("extrude circle", ["a"])
+    cache.put_answer(["a"], "extrude circle", "answer")
+
+    # Same version after a restart keeps the entries
+    reopened = RAGQueryCache(path)
+    reopened.set_index_version("v1")
+    assert reopened.get_chunk_ids("extrude circle") == ["a"]
+
+    reopened.set_index_version("v2")
+    assert reopened.get_chunk_ids("extrude circle") is None
+    assert reopened.get_answer(["a"], "extrude circle") is None
+
+
+def test_query_cache_ttl(tmp_path):
+    cache = RAGQueryCache(str(tmp_path / "cache.sqlite"), ttl=-1)
+    cache.set_index_version("v1")
+    cache.put_chunk_ids("extrude circle", ["a"])
+    assert cache.get_chunk_ids("extrude circle") is None
+
+
+def test_semantic_cache_threshold():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=2)
+    cache.add([1.0, 0.0], "x answer")
+    assert cache.lookup([0.99, 0.05])[0] == "x answer"
+    assert cache.lookup([0.0, 1.0])[0] is None
+    # Full, the oldest entry is overwritten
+    cache.add([0.0, 1.0], "y answer")
+    cache.add(np.array([-1.0, 0.0]), "-x answer")
+    assert cache.lookup([1.0, 0.0])[0] is None
+    assert cache.lookup([0.0, 1.0])[0] == "y answer"
@@ -0,0 +1,78 @@
+import os
+
+from rag_ingest import load_manifest, manifest_version, save_manifest, sha256_file, update_index
+
+
+class FakeCollection:
+    def __init__(self, ids):
+        self.ids = set(ids)
+
+    def count(self):
+        return len(self.ids)
+
+
+class FakeVectorStore:
+    """Just the parts of the Chroma store that update_index touches when nothing is embedded."""
+
+    def __init__(self, ids=()):
+        self._collection = FakeCollection(ids)
+        self.deleted = []
+        self.delete_calls = 0
+
+    def delete(self, ids):
+        self.delete_calls += 1
+        self.deleted.extend(ids)
+        self._collection.ids.difference_update(ids)
+
+
+def _indexed(tmp_path, sources):
+    manifest = {"version": None, "sources": {}}
+    for name, path in sources.items():
+        manifest["sources"][name] = {"path": str(path), "file_hash": sha256_file(path) if os.path.exists(path) else None, "pages": {
+            "0": {"hash": f"{name}-0", "chunk_ids": [f"{name}:0:0", f"{name}:0:1"]},
+            "1": {"hash": f"{name}-1", "chunk_ids": [f"{name}:1:0"]},
+        }}
+    manifest["version"] = manifest_version(manifest)
+    save_manifest(str(tmp_path), manifest)
+    return [cid for entry in manifest["sources"].values() for page in entry["pages"].values()
+            for cid in page["chunk_ids"]]
+
+
+def test_missing_file_drops_its_chunks(tmp_path):
+    docs = tmp_path / "docs.pdf"
+    ids = _indexed(tmp_path, {"docs": docs})
+    store = FakeVectorStore(ids)
+
+    report = update_index(store, str(tmp_path), sources={"docs": str(docs)})
+
+    assert sorted(store.deleted) == sorted(ids)
+    assert report["pages_deleted"] == 2
+    assert load_manifest(str(tmp_path))["sources"] == {}
+
+
+def test_removed_source_drops_only_its_chunks(tmp_path):
+    # Both files exist, docs is dropped because it left the mapping. examples is unchanged,
+    # so nothing is re-embedded
+    (tmp_path / "docs.pdf").write_bytes(b"%PDF-1.4 docs")
+    (tmp_path / "examples.pdf").write_bytes(b"%PDF-1.4")
+    ids = _indexed(tmp_path, {"docs": tmp_path / "docs.pdf", "examples": tmp_path / "examples.pdf"})
+    store = FakeVectorStore(ids)
+
+    update_index(store, str(tmp_path), sources={"examples": str(tmp_path / "examples.pdf")})
+
+    assert sorted(store.deleted) == ["docs:0:0", "docs:0:1", "docs:1:0"]
+    assert list(load_manifest(str(tmp_path))["sources"]) == ["examples"]
+
+
+def test_pages_without_chunks_are_not_deleted(tmp_path):
+    _indexed(tmp_path, {"docs": tmp_path / "docs.pdf"})
+    manifest = load_manifest(str(tmp_path))
+    # A page with no text, split into no chunks
+    manifest["sources"]["docs"]["pages"]["2"] = {"hash": "docs-2", "chunk_ids": []}
+    save_manifest(str(tmp_path), manifest)
+    store = FakeVectorStore(["docs:0:0", "docs:0:1", "docs:1:0"])
+
+    update_index(store, str(tmp_path), sources={})
+
+    assert sorted(store.deleted) == ["docs:0:0", "docs:0:1", "docs:1:0"]
+    assert store.delete_calls == 2
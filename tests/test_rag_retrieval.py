@@ -0,0 +1,80 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from rag_retrieval import BM25Index, HybridRetriever, reciprocal_rank_fusion, tokenize
+
+CHUNKS = {
+    "a": "Use cboreHole to add a counterbored hole to a face.",
+    "b": "A workplane is created with cq.Workplane and a plane name.",
+    "c": "The fillet method rounds the selected edges.",
+    "d": "Holes are cut through the solid with hole or cboreHole.",
+}
+
+
+class FakeCollection:
+    def get(self, include=None):
+        return {"ids": list(CHUNKS), "documents": list(CHUNKS.values()), "metadatas": [{} for _ in CHUNKS]}
+
+
+class FakeVectorStore:
+    # Dense results in a fixed order, the query vector is ignored
+    def __init__(self, order):
+        self.order = order
+        self._collection = FakeCollection()
+
+    def similarity_search_by_vector(self, vector, k=4):
+        return [Document(id=doc_id, page_content=CHUNKS[doc_id]) for doc_id in self.order[:k]]
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [0.0]
+
+
+class ReverseReranker:
+    def __init__(self):
+        self.calls = 0
+
+    def rerank(self, question, docs, k):
+        self.calls += 1
+        return list(reversed(docs))[:k]
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("cboreHole(2.5)") == ["cborehole", "cbore", "hole", "2", "5"]
+
+
+def test_bm25_ranks_exact_api_names_first():
+    index = BM25Index(list(CHUNKS), list(CHUNKS.values()))
+    ranked = [index.ids[i] for i, _ in index.search("cboreHole", k=4)]
+    assert set(ranked[:2]) == {"a", "d"}
+    assert "b" not in ranked
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    # Second in both lists beats first in only one
+    assert reciprocal_rank_fusion([["a", "b"], ["c", "b"]]) == ["b", "a", "c"]
+    assert reciprocal_rank_fusion([["a", "b"], ["b", "c"]]) == ["b", "a", "c"]
+
+
+def test_rerank_is_optional():
+    retriever = HybridRetriever(FakeVectorStore(["b", "c", "a", "d"]), FakeEmbeddings(), candidates=4)
+    reranker = retriever.reranker = ReverseReranker()
+    dense = retriever.retrieve("How do I add a counterbored hole?", k=2)
+    assert [doc.id for doc in dense] == ["b", "c"]
+    hybrid = retriever.retrieve("cboreHole", k=4, mode="hybrid")
+    assert {doc.id for doc in hybrid[:2]} & {"a", "d"}
+    assert reranker.calls == 0
+    reranked = retriever.retrieve("cboreHole", k=2, rerank=True)
+    assert [doc.id for doc in reranked] == ["d", "a"]
+    assert reranker.calls == 1
+    assert set(retriever.latency) == {"dense", "hybrid", "dense+rerank"}
+
+
+def test_unknown_mode_is_rejected():
+    retriever = HybridRetriever(FakeVectorStore(list(CHUNKS)), FakeEmbeddings())
+    with pytest.raises(ValueError):
+        retriever.retrieve("fillet", mode="sparse")
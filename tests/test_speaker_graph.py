@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import pytest
+
+from speaker_graph import SpeakerRouter, format_routing_stats
+
+
+class Agent:
+    def __init__(self, name, functions=()):
+        self.name = name
+        self.functions = set(functions)
+
+    def can_execute_function(self, name):
+        return name in self.functions
+
+
+def make_chat(*names, messages=(), functions=None):
+    functions = functions or {}
+    agents = [Agent(name, functions.get(name, ())) for name in names]
+    return SimpleNamespace(agents=agents, messages=list(messages))
+
+
+RAG_CHAT = ("User", "CAD_coder_assistant", "Designer_Expert", "CadQuery_Code_Writer", "Executor", "Reviewer")
+
+
+def route(router, speaker, groupchat):
+    agents = {agent.name: agent for agent in groupchat.agents}
+    return router._route(speaker, groupchat.messages[-1], groupchat, agents)
+
+
+def test_successors_skip_absent_agents():
+    router = SpeakerRouter()
+    assert router.successors("User", {"User", "Designer_Expert", "CadQuery_Code_Writer"}) == ["Designer_Expert"]
+    assert router.successors("Designer_Expert", {"User", "Designer_Expert", "CadQuery_Code_Writer"}) \
+        == ["CadQuery_Code_Writer"]
+    assert router.successors("Reviewer", set(RAG_CHAT)) == ["User", "CadQuery_Code_Writer"]
+
+
+def test_single_successor_follows_the_graph():
+    chat = make_chat(*RAG_CHAT, messages=[{"name": "User", "content": "Design a bracket"}])
+    assert route(SpeakerRouter(), "User", chat) == ("Designer_Expert", "graph")
+
+
+def test_tool_call_goes_to_its_executor_and_result_back():
+    call = {"name": "Designer_Expert", "content": None,
+            "tool_calls": [{"id": "1", "function": {"name": "create_plate", "arguments": "{}"}}]}
+    chat = make_chat(*RAG_CHAT, messages=[call], functions={"User": {"create_plate"}})
+    assert route(SpeakerRouter(), "Designer_Expert", chat) == ("User", "tool")
+    chat.messages.append({"name": "User", "role": "tool", "content": "plate.stl written",
+                          "tool_responses": [{"tool_call_id": "1", "content": "plate.stl written"}]})
+    assert route(SpeakerRouter(), "User", chat) == ("Designer_Expert", "rule")
+
+
+def test_handoff_names_the_next_speaker():
+    chat = make_chat(*RAG_CHAT, messages=[{"name": "Reviewer", "content": "Passing this to the code writer."}])
+    assert route(SpeakerRouter(), "Reviewer", chat) == ("CadQuery_Code_Writer", "handoff")
+
+
+def test_static_check_failure_goes_back_to_the_writer():
+    message = {"name": "Executor",
+               "content": "exitcode: 1 (execution failed)\nCode output: Static check failed\nunknown-method: boxx"}
+    chat = make_chat(*RAG_CHAT, messages=[message])
+    assert route(SpeakerRouter(), "Executor", chat) == ("CadQuery_Code_Writer", "rule")
+    message["content"] = "exitcode: 0 (execution succeeded)\nCode output: built"
+    assert route(SpeakerRouter(), "Executor", chat) == ("Reviewer", "rule")
+
+
+def test_reviewer_markers():
+    chat = make_chat(*RAG_CHAT, messages=[{"name": "Reviewer", "content": "The code ran successfully."}])
+    assert route(SpeakerRouter(), "Reviewer", chat) == ("User", "rule")
+    chat.messages[-1]["content"] = "Please fix the fillet radius."
+    assert route(SpeakerRouter(), "Reviewer", chat) == ("CadQuery_Code_Writer", "rule")
+
+
+@pytest.mark.parametrize("fallback, expected", [("auto", (None, "llm")), ("round_robin", ("User", "round_robin"))])
+def test_ambiguous_reviewer_uses_the_fallback(fallback, expected):
+    chat = make_chat(*RAG_CHAT, messages=[{"name": "Reviewer", "content": "Looks good to me."}])
+    assert route(SpeakerRouter(fallback=fallback), "Reviewer", chat) == expected
+
+
+def test_round_robin_follows_the_chat_order():
+    # Both rules match, the next agent in the chat's order is picked
+    chat = make_chat(*RAG_CHAT, messages=[{"name": "Reviewer", "content": "It ran successfully, but fix the hole."}])
+    router = SpeakerRouter(fallback="round_robin")
+    assert route(router, "Reviewer", chat) == ("User", "round_robin")
+    chat.messages[-1] = {"name": "CAD_coder_assistant", "content": "Here is an example from the docs."}
+    router.workflow = {"CAD_coder_assistant": ["CadQuery_Code_Writer", "Reviewer"]}
+    assert route(router, "CAD_coder_assistant", chat) == ("Designer_Expert", "round_robin")
+
+
+def test_call_counts_selections():
+    chat = make_chat(*RAG_CHAT, messages=[{"name": "Reviewer", "content": "Looks good to me."}])
+    router = SpeakerRouter(fallback="round_robin")
+    reviewer = chat.agents[-1]
+    assert router(reviewer, chat) is chat.agents[0]
+    chat.messages.append({"name": "User", "content": "Make it taller"})
+    assert router(chat.agents[0], chat).name == "Designer_Expert"
+    stats = router.stats()
+    assert (stats["selections"], stats["round_robin"], stats["graph"], stats["llm"], stats["saved"]) == (2, 1, 1, 0, 2)
+    assert "1 round robin" in format_routing_stats(stats)
+
+
+def test_call_returns_auto_for_the_llm():
+    chat = make_chat(*RAG_CHAT, messages=[{"name": "Reviewer", "content": "Looks good to me."}])
+    router = SpeakerRouter()
+    assert router(chat.agents[-1], chat) == "auto"
+    assert router.stats()["llm"] == 1
+    assert router.stats()["saved"] == 0
+
+
+def test_unknown_fallback_is_rejected():
+    with pytest.raises(ValueError):
+        SpeakerRouter(fallback="random")